@@ -0,0 +1,26 @@
+# gunicorn settings for the site, picked up automatically when gunicorn is started from the repo root
+# Everything can be changed through environment variables, so the host (Render) can be tuned without editing this file
+import os
+
+# The app and its data files are all addressed relative to src
+chdir = "src"
+bind = "0.0.0.0:" + os.environ.get("PORT", "10000")
+
+# Render sets WEB_CONCURRENCY to suit the instance size, the free instance only has room for a couple of workers
+workers = int(os.environ.get("WEB_CONCURRENCY", "2"))
+# Callbacks spend most of their time in pandas and plotly, a few threads per worker keep a slow one from blocking the rest
+threads = int(os.environ.get("TF2_THREADS", "4"))
+timeout = int(os.environ.get("TF2_TIMEOUT", "60"))
+
+# With preload the app is imported once in the master and the workers are forked from it
+# The charts data is loaded (and built, if the cache is missing) before the fork, so the workers share it
+# instead of every one of them loading its own copy, set TF2_PRELOAD=0 to have each worker load the app itself
+preload_app = os.environ.get("TF2_PRELOAD", "1") == "1"
+wsgi_app = "app:CreateServer(warm=True)" if preload_app else "app:CreateServer()"
+
+
+# Check for new source data every TF2_RELOAD_INTERVAL seconds and swap it in without restarting, see src/chartData.py
+# Each worker runs its own check, a thread started in the master before the fork wouldn't carry over to the workers
+def post_fork(server, worker):
+    import chartData
+    chartData.StartRefresher()
@@ -1,55 +1,101 @@
 # Add Needed Libraries
-# For creating and managing datasets
-import numpy as np
-import pandas as pd
-
-# For getting data from websites, so they can be put into a dataframe
-from bs4 import BeautifulSoup
-import requests
-from io import StringIO
+# The data and scraping libraries used to be imported here too, they are only needed by mapData.py now
+# (and loading them in every worker just slowed down start up)
 
 # For creating the visualizations for this project
 # import matplotlib.pyplot as plt
 import dash
-from dash import Dash, dcc, html, Input, Output
-import plotly.graph_objects as go
-import plotly.express as px
+from dash import Dash, dcc, html
+from flask import jsonify
+
+import chartData
+import exportData
+import figureCache
+import metrics
+import profiling
+import responseLayer
 
 
 # Create the website to show all of these graphs
 # First we create the dash app for everything to go into
-app = Dash(__name__, use_pages=True)
+def CreateApp():
+    # The charts page builds its layout (and loads its data) only when it is opened, see chartData.py
+    # Dash would otherwise call every page layout on the first request to check the callbacks against, which loads the data
+    # for every visitor, so that check is turned off (the ids are still checked in the browser when the page is shown)
+    app = Dash(__name__, use_pages=True, suppress_callback_exceptions=True)
+    app.title = "TF2 Map Analysis"
+    app._favicon = ("favicon.ico")
+
+    # Set the layout for the header bar of the site and create the links to the other pages
+    app.layout = html.Div(
+        children=[
+            # Create the header part of the page
+            html.Div(
+                className="headerBanner",
+                children=[
+                    html.Img(className="headerLogo", src=responseLayer.AssetUrl(app, "TF2Logo.png")),
+                    html.P(),
+                    html.Div(
+                        className="headerLinksParent",
+                        children=[
+                            html.Div(
+                                className="headerLink",
+                                children=[dcc.Link(f"{page['name']}", href=page["relative_path"])]
+                            ) for page in dash.page_registry.values()
+                        ]
+                    )
+                    # html.A("Charts ", href=""),
+                    # html.A("Findings Overview", href="assets/findings.html"),
+                    # html.A("Sources", href="assets/sources.html")
+                ]
+            ),
+
+            dash.page_container
+        ]
+    )
+
+    # Every request reads one dataset snapshot from start to end, even if a reload swaps in a new one meanwhile
+    # (registered first, so the response cache below already keys on the pinned version), see chartData.py
+    @app.server.before_request
+    def PinChartData():
+        chartData.Pin()
+
+    @app.server.teardown_request
+    def UnpinChartData(error=None):
+        chartData.Unpin()
+
+    # Callback timings and sizes on /metrics, see metrics.py (installed first so it also times the cached answers)
+    metrics.Install(app)
+
+    # Sampled profiles of the callbacks, off unless turned on, see profiling.py
+    profiling.Install(app)
+
+    # Compression and cache headers for everything the server sends, see responseLayer.py
+    responseLayer.Install(app, chartData.Version)
+
+    # Hit and miss counters of the chart figure caches (this worker's, the disk and redis stores are shared), see figureCache.py
+    @app.server.route("/stats/figures")
+    def FigureStats():
+        return jsonify(figureCache.Stats())
+
+    # Filtered downloads of the map list, streamed as they are written, see exportData.py
+    exportData.Install(app)
+
+    return app
+
+
+# Importing this file builds the app but doesn't start a server, that is left to gunicorn (see gunicorn.conf.py)
+# or to devServer.py when working on the site locally
+app = CreateApp()
 server = app.server
-app.title = "TF2 Map Analysis"
-app._favicon = ("favicon.ico")
-
-# Set the layout for the header bar of the site and create the links to the other pages
-app.layout = html.Div(
-    children=[
-        # Create the header part of the page
-        html.Div(
-            className="headerBanner",
-            children=[
-                html.Img(className="headerLogo", src="assets/TF2Logo.png"),
-                html.P(),
-                html.Div(
-                    className="headerLinksParent",
-                    children=[
-                        html.Div(
-                            className="headerLink",
-                            children=[dcc.Link(f"{page['name']}", href=page["relative_path"])]
-                        ) for page in dash.page_registry.values()
-                    ]
-                )
-                # html.A("Charts ", href=""),
-                # html.A("Findings Overview", href="assets/findings.html"),
-                # html.A("Sources", href="assets/sources.html")
-            ]
-        ),
-
-        dash.page_container
-    ]
-)
-
-# Run the website
-app.run_server(host='0.0.0.0')
+
+
+# WSGI factory for gunicorn, used as app:CreateServer() in gunicorn.conf.py
+# With warm=True the charts data is loaded right away, with --preload that happens once in the master before the workers
+# are forked, so they all start with the data already in (shared) memory instead of each loading it on first use
+# The reload thread (TF2_RELOAD_INTERVAL) isn't started here, it wouldn't survive the fork, gunicorn.conf.py starts one in
+# each worker
+def CreateServer(warm=False):
+    if warm:
+        chartData.Warm()
+    return server
@@ -0,0 +1,127 @@
+// Browser-side versions of the filterable charts, used when the site is started with TF2_CLIENTSIDE_CHARTS=1
+// The charts page ships a compact copy of the data (the ClientChartData store) once, along with the trace and layout
+// skeletons plotly express made for it on the server, so changing a drop-down never has to go back to the server
+// Each function below mirrors the matching Build function in pages/charts.py and gives back the same figure
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    charts: {
+        // Chart 2, maps added per year split by Valve and community maps
+        mapsPerYear: function (mode, store) {
+            var data = store.mapsPerYear;
+            var modeCode = ModeCode(data, mode);
+            var counts = {};
+            for (var i = 0; i < data.year.length; i++) {
+                if (mode !== "All Game Modes" && data.mode[i] !== modeCode) {
+                    continue;
+                }
+                var year = data.year[i];
+                if (!(year in counts)) {
+                    counts[year] = [0, 0];
+                }
+                counts[year][data.community[i]] += 1;
+            }
+            // Same order the groupby gives on the server, years first and then Valve before community
+            var years = Object.keys(counts).map(Number).sort(function (a, b) { return a - b; });
+            var traces = [];
+            var traceFor = {};
+            years.forEach(function (year) {
+                [0, 1].forEach(function (community) {
+                    if (counts[year][community] === 0) {
+                        return;
+                    }
+                    var group = community ? "True" : "False";
+                    if (!(group in traceFor)) {
+                        traceFor[group] = Object.assign({}, data.traces[group], {x: [], y: []});
+                        traces.push(traceFor[group]);
+                    }
+                    traceFor[group].x.push(year);
+                    traceFor[group].y.push(counts[year][community]);
+                });
+            });
+            return {data: traces, layout: Object.assign({template: store.template}, data.layout)};
+        },
+
+        // Chart 5, maps per holiday event for a year and game mode
+        holidayCount: function (year, mode, store) {
+            var data = store.holiday;
+            var modeCode = ModeCode(data, mode);
+            var counts = {};
+            var total = 0;
+            for (var i = 0; i < data.event.length; i++) {
+                if (year !== "All Years" && data.year[i] !== parseInt(year, 10)) {
+                    continue;
+                }
+                if (mode !== "All Game Modes" && data.mode[i] !== modeCode) {
+                    continue;
+                }
+                var eventName = data.events[data.event[i]];
+                counts[eventName] = (counts[eventName] || 0) + 1;
+                total += 1;
+            }
+            var traces = Object.keys(counts).sort().map(function (eventName) {
+                var count = counts[eventName];
+                return Object.assign({}, data.traces[eventName], {
+                    text: [FormatPercent(count / total * 100)],
+                    x: [count],
+                    y: [eventName]
+                });
+            });
+            var layout = Object.assign({template: store.template}, data.layout);
+            // plotly express lists horizontal bar categories bottom to top, which is the reverse of the trace order
+            layout.yaxis = Object.assign({}, layout.yaxis, {
+                categoryarray: traces.map(function (trace) { return trace.name; }).reverse()
+            });
+            // With nothing to show there is no legend, and plotly express leaves its title out too
+            if (traces.length === 0) {
+                layout.legend = Object.assign({}, layout.legend);
+                delete layout.legend.title;
+            }
+            return {data: traces, layout: layout};
+        },
+
+        // Chart 6, the size of every map in a game mode
+        mapSize: function (mode, developers, sizeType, store) {
+            var data = store.mapSize;
+            var modeCode = ModeCode(data, mode);
+            var rows = [];
+            for (var i = 0; i < data.map.length; i++) {
+                if (data.mode[i] !== modeCode) {
+                    continue;
+                }
+                if ((developers === "Valve Maps" && !data.valve[i]) || (developers === "Community Maps" && data.valve[i])) {
+                    continue;
+                }
+                rows.push(i);
+            }
+            // Array sort is stable, same as the stable sort used on the server
+            rows.sort(function (a, b) { return data.kHu[a] - data.kHu[b]; });
+            var sizes = sizeType === "Kilo Hammer Units Squared" ? data.kHu : data.km;
+            var skeleton = data.traces[sizeType];
+            var trace = Object.assign({}, skeleton, {
+                // A code per map (1 for Valve's) on the two color scale the server's trace carries, same as the server
+                marker: Object.assign({}, skeleton.marker, {
+                    color: rows.map(function (i) { return data.valve[i]; })
+                }),
+                x: rows.map(function (i) { return sizes[i]; }),
+                y: rows.map(function (i) { return data.map[i]; })
+            });
+            return {data: [trace], layout: Object.assign({template: store.template}, data.layouts[sizeType])};
+        }
+    }
+});
+
+// Position of a game mode in the store's list, maps with no game mode are stored as -1 so an unknown mode must not match them
+function ModeCode(data, mode) {
+    var code = data.gameModes.indexOf(mode);
+    return code < 0 ? null : code;
+}
+
+// Matches pandas round(2) followed by str() + "%", numpy rounds halves to even and Python always keeps a decimal place
+function FormatPercent(value) {
+    var scaled = value * 100;
+    var rounded = Math.round(scaled);
+    if (Math.abs(scaled % 1) === 0.5 && rounded % 2 !== 0) {
+        rounded -= 1;
+    }
+    var result = rounded / 100;
+    return (Number.isInteger(result) ? result.toFixed(1) : String(result)) + "%";
+}
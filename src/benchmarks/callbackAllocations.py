@@ -0,0 +1,159 @@
+# Memory allocated by the chart callbacks that filter a frame, before and after the frameQuery views
+# Run from the src folder: python -m benchmarks.callbackAllocations --scale 100 --combinations 10
+# "before" swaps the queries for ones that copy the whole frame and filter the copy with boolean masks, like the callbacks used to
+# Each chart's input combinations (or an even spread of --combinations of them) are run with tracemalloc on, the figure
+# cache is bypassed so every call does the work, and every chart is built once first so plotly's own first-use setup isn't counted
+# Reported per callback: the peak memory allocated while filtering and while building the whole figure, averaged over the
+# combinations, plus the largest single one
+import argparse
+import gc
+import importlib
+import itertools
+import tracemalloc
+
+import dash
+import pandas as pd
+
+import chartData
+import mapData
+
+
+# The old way, copy the frame and then keep the rows matching each filter
+class CopyingQuery:
+    def __init__(self, frame, masks):
+        self.frame = frame
+        self.masks = masks
+
+    def Select(self, **filters):
+        temp = self.frame.copy()
+        for name, value in filters.items():
+            temp = temp.loc[self.masks[name](temp, value)]
+        return temp
+
+
+def CopyingQueries(data):
+    def Valve(frame):
+        return frame["Developers"].str.contains("Valve", na=False)
+
+    return {
+        "MapPerYearQuery": CopyingQuery(data.MapPerYearData, {"mode": lambda frame, mode: frame["Game mode"] == mode}),
+        "EventQuery": CopyingQuery(data.EventFrame, {"mode": lambda frame, mode: frame["Game mode"] == mode,
+                                                     "year": lambda frame, year: frame["Date added"].dt.year == year}),
+        "MapCompQuery": CopyingQuery(data.MapComp, {
+            "mode": lambda frame, mode: frame["Game mode"] == mode,
+            "developers": lambda frame, developers: Valve(frame) if developers == "Valve" else ~Valve(frame)})
+    }
+
+
+# The filters each callback asks for, for the filtering stage on its own
+def MapPerYearFilters(mode):
+    return {} if mode == "All Game Modes" else {"mode": mode}
+
+
+def HolidayFilters(year, mode):
+    filters = {}
+    if year != "All Years":
+        filters["year"] = int(year)
+    if mode != "All Game Modes":
+        filters["mode"] = mode
+    return filters
+
+
+def MapSizeFilters(mode, developers, sizeType):
+    filters = {"mode": mode}
+    if developers != "All Maps":
+        filters["developers"] = {"Valve Maps": "Valve", "Community Maps": "Community"}[developers]
+    return filters
+
+
+# The query each chart reads and how its inputs turn into filters
+charts = {
+    "MapPerYearGraph": ("MapPerYearQuery", MapPerYearFilters),
+    "HolidayCountGraph": ("EventQuery", HolidayFilters),
+    "MapSizeGraph2": ("MapCompQuery", MapSizeFilters)
+}
+
+
+# Peak memory allocated while running function, on top of what was allocated before it started
+def PeakAllocated(function):
+    gc.collect()
+    start = tracemalloc.get_traced_memory()[0]
+    tracemalloc.reset_peak()
+    function()
+    return tracemalloc.get_traced_memory()[1] - start
+
+
+# The real data repeated scale times, loaded through ChartData so the queries are built the same way the site builds them
+def LoadScaled(scale):
+    frames, key = mapData.LoadFrames(mmap=False)
+    if scale > 1:
+        frames = {name: pd.concat([frame] * scale, ignore_index=True) for name, frame in frames.items()
+                  if name not in mapData.indexFrameNames}
+        frames.update(mapData.IndexFrames(frames))
+        key = key + "x" + str(scale)
+    loadFrames = mapData.LoadFrames
+    mapData.LoadFrames = lambda: (frames, key)
+    try:
+        data = chartData.ChartData()
+    finally:
+        mapData.LoadFrames = loadFrames
+    chartData._current = data
+    return data
+
+
+# At most limit of the chart's input combinations, spread evenly over all of them
+def Combinations(figures, name, limit):
+    combinations = list(itertools.product(*figures.builders[name][1]))
+    if limit is None or limit >= len(combinations):
+        return combinations
+    return [combinations[index * len(combinations) // limit] for index in range(limit)]
+
+
+def Run(data, charts, figures, limit):
+    results = {}
+    for name, (queryName, Filters) in charts.items():
+        build = figures.builders[name][0]
+        query = getattr(data, queryName)
+        filterPeaks = []
+        buildPeaks = []
+        for args in Combinations(figures, name, limit):
+            filterPeaks.append(PeakAllocated(lambda: query.Select(**Filters(*args))))
+            buildPeaks.append(PeakAllocated(lambda: build(*args)))
+        results[name] = (filterPeaks, buildPeaks)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Allocations of the filtering chart callbacks")
+    parser.add_argument("--scale", type=int, default=1, help="Repeat the dataset this many times")
+    parser.add_argument("--combinations", type=int, default=None, help="Input combinations to run per chart (default all)")
+    args = parser.parse_args()
+
+    # The charts page registers itself with Dash, so it needs an app to exist first
+    dash.Dash(__name__, use_pages=True, pages_folder="", suppress_callback_exceptions=True)
+    figures = importlib.import_module("pages.charts").figures
+
+    data = LoadScaled(args.scale)
+    print("Dataset x" + str(args.scale) + ", " + str(len(data.MapComp)) + " maps")
+    for name in charts:
+        figures.builders[name][0](*Combinations(figures, name, 1)[0])
+    tracemalloc.start()
+    after = Run(data, charts, figures, args.combinations)
+    queries = {name: getattr(data, name) for name in ("MapPerYearQuery", "EventQuery", "MapCompQuery")}
+    for name, query in CopyingQueries(data).items():
+        setattr(data, name, query)
+    before = Run(data, charts, figures, args.combinations)
+    for name, query in queries.items():
+        setattr(data, name, query)
+    tracemalloc.stop()
+
+    print("Peak allocated per call (kB), average / largest")
+    print("  " + "callback".ljust(18) + "filter before".rjust(22) + "filter after".rjust(22)
+          + "callback before".rjust(22) + "callback after".rjust(22))
+    for name in charts:
+        cells = []
+        for stage in (0, 1):
+            for results in (before, after):
+                values = results[name][stage]
+                cells.append("{:9.1f} / {:9.1f}".format(sum(values) / len(values) / 1024, max(values) / 1024))
+        print("  " + name.ljust(18) + "".join(cell.rjust(22) for cell in cells))
@@ -0,0 +1,81 @@
+# Build time of the charts made by figureFactory.py against the plotly express code they replace, and a check that both
+# give exactly the same figure
+# Run from the src folder: python -m benchmarks.figureFactory --scale 10 --combinations 20
+# Every input combination of each chart (or an even spread of --combinations of them) is built both ways, with the figure
+# cache bypassed, and the two figures are serialized with the json module, with orjson (when installed) and as the
+# compact payload the figure cache stores, all three have to match byte for byte
+# Reported per callback: the median build time over the combinations, px against the factory, and any combination whose
+# figures differ (the exit status is 1 if there is one)
+import argparse
+import importlib
+import statistics
+import sys
+import time
+
+import dash
+from plotly.io.json import to_json_plotly
+
+import figureFactory
+import figurePayload
+from benchmarks.callbackAllocations import Combinations, LoadScaled
+
+charts = ["MapPerYearGraph", "GMPerGraphChangeMode", "GMSizeGraph", "HolidayCountGraph"]
+
+
+def Serialized(figure):
+    engines = ["json"] + (["orjson"] if figurePayload.orjson is not None else [])
+    return [to_json_plotly(figure, engine=engine) for engine in engines] + [figurePayload.ToJson(figure)]
+
+
+def Build(builder, args, factory):
+    figureFactory.enabled = factory
+    startTime = time.perf_counter()
+    figure = builder(*args)
+    return figure, time.perf_counter() - startTime
+
+
+def Run(figures, limit, repeat):
+    results = {}
+    for name in charts:
+        builder = figures.builders[name][0]
+        times = {"px": [], "factory": []}
+        different = []
+        for args in Combinations(figures, name, limit):
+            for path, factory in (("px", False), ("factory", True)):
+                times[path].append(min(Build(builder, args, factory)[1] for _ in range(repeat)))
+            if Serialized(Build(builder, args, False)[0]) != Serialized(Build(builder, args, True)[0]):
+                different.append(args)
+        results[name] = ({path: statistics.median(values) for path, values in times.items()}, different)
+    figureFactory.enabled = True
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Chart build time, plotly express against figureFactory.py")
+    parser.add_argument("--scale", type=int, default=1, help="Repeat the dataset this many times")
+    parser.add_argument("--combinations", type=int, default=None, help="Input combinations to run per chart (default all)")
+    parser.add_argument("--repeat", type=int, default=3, help="Builds of each combination each way, the fastest is kept")
+    args = parser.parse_args()
+
+    # The charts page registers itself with Dash, so it needs an app to exist first
+    dash.Dash(__name__, use_pages=True, pages_folder="", suppress_callback_exceptions=True)
+    figures = importlib.import_module("pages.charts").figures
+
+    data = LoadScaled(args.scale)
+    print("Dataset x" + str(args.scale) + ", " + str(len(data.MapComp)) + " maps")
+    # One build of each first, so plotly's own first-use setup isn't put down to the first chart
+    for name in charts:
+        for factory in (False, True):
+            Build(figures.builders[name][0], Combinations(figures, name, 1)[0], factory)
+    results = Run(figures, args.combinations, args.repeat)
+
+    print("Median build time per callback (ms)")
+    print("  " + "callback".ljust(22) + "px".rjust(10) + "factory".rjust(10) + "speedup".rjust(10) + "   figures")
+    failed = False
+    for name, (times, different) in results.items():
+        print("  " + name.ljust(22) + "{:10.2f}{:10.2f}{:9.1f}x".format(times["px"] * 1000, times["factory"] * 1000,
+                                                                       times["px"] / times["factory"])
+              + ("   identical" if not different else "   " + str(len(different)) + " differ, e.g. " + repr(different[0])))
+        failed = failed or bool(different)
+    if failed:
+        sys.exit(1)
@@ -0,0 +1,149 @@
+# Response size and time of the charts that answer a drop-down change with a Patch (see figurePatch.py), against sending
+# the whole figure, plus a check that every response is right
+# Run from the src folder: python -m benchmarks.figurePatches --repeat 5
+# Every combination of each patched chart is asked for through the Flask test client, the callback response cache off
+# and the figures and patch fields already in their caches (as they are on a running site):
+# - the way the first render asks (nothing shown yet), the whole figure has to come back
+# - with the browser showing the figure of every other combination that differs in patching drop-downs only (one or
+#   more of them), a patch has to come back that turns the shown figure into the figure for the new values
+# - with the browser showing a figure that differs in another drop-down too, the whole figure has to come back
+# Reported per chart and set of changed drop-downs: the average response size (plain and gzipped) and median time, whole
+# figure against patch, and per chart any combination that came back wrong (the exit status is 1 if there is one)
+import argparse
+import gzip
+import itertools
+import json
+import statistics
+import sys
+import time
+
+import figurePatch
+import figurePayload
+import responseLayer
+
+# The graph of each patched chart, the chart it shows and the drop-downs that patch it
+charts = {"MapSizeGMMode": ("GMSizeGraph", ["MapSizeDistanceType"]),
+          "MapSizeChart2": ("MapSizeGraph2", ["MapSizeDistanceType2", "CommunityMapDropDown2"])}
+
+
+def Apply(figure, patch):
+    for operation in patch["operations"]:
+        if operation["operation"] != "Assign":
+            raise ValueError("Unexpected patch operation " + operation["operation"])
+        target = figure
+        for key in operation["location"][:-1]:
+            target = target[key]
+        target[operation["location"][-1]] = operation["params"]["value"]
+    return figure
+
+
+def Output(graph):
+    return ".." + graph + ".figure..." + figurePatch.StoreId(graph) + ".data.."
+
+
+# shown is what the graph's store holds, the values of the figure the browser shows (None before the first render)
+def Post(client, graph, inputs, args, shown):
+    store = figurePatch.StoreId(graph)
+    changed = inputs if shown is None else [inputId for inputId, old, new in zip(inputs, shown, args) if old != new]
+    body = {"output": Output(graph),
+            "outputs": [{"id": graph, "property": "figure"}, {"id": store, "property": "data"}],
+            "inputs": [{"id": inputId, "property": "value", "value": value} for inputId, value in zip(inputs, args)],
+            "changedPropIds": [inputId + ".value" for inputId in changed],
+            "state": [{"id": store, "property": "data", "value": shown}]}
+    startTime = time.perf_counter()
+    response = client.post(responseLayer.callbackPath, json=body)
+    elapsed = time.perf_counter() - startTime
+    if response.status_code != 200:
+        raise RuntimeError(graph + " answered " + str(response.status_code))
+    return response.get_data(), elapsed
+
+
+# Sizes and time of the response, along with the figure (or patch) and store value it set
+def Measure(client, graph, inputs, args, shown, repeat):
+    runs = [Post(client, graph, inputs, args, shown) for _ in range(repeat)]
+    body = runs[0][0]
+    response = json.loads(body)["response"]
+    return ({"bytes": len(body), "gzip": len(gzip.compress(body, 6, mtime=0)),
+             "seconds": statistics.median(elapsed for _, elapsed in runs)},
+            response[graph]["figure"], response[figurePatch.StoreId(graph)]["data"])
+
+
+def Whole(figure, shown, expected, args):
+    return "__dash_patch_update" not in figure and figure == expected and shown == args
+
+
+def Run(app, figures, repeat):
+    client = app.server.test_client()
+    # Dash fills in its callback list on the first request
+    client.get("/_dash-dependencies")
+    timings = {}
+    wrong = {}
+    for graph, (name, patching) in charts.items():
+        inputs = [item["id"] for item in app.callback_map[Output(graph)]["inputs"]]
+        optionLists = figures.builders[name][1]
+        positions = [inputs.index(inputId) for inputId in patching]
+        other = next(position for position in range(len(inputs)) if position not in positions)
+        wrong[name] = []
+        for args in itertools.product(*optionLists):
+            args = list(args)
+            expected = figurePayload.FromJson(figures.GetJson(name, tuple(args)))
+            full, figure, shown = Measure(client, graph, inputs, args, None, repeat)
+            if not Whole(figure, shown, expected, args):
+                wrong[name].append((None, args))
+            # Every figure the browser can show that differs from this one in patching drop-downs only
+            for oldValues in itertools.product(*[optionLists[position] for position in positions]):
+                old = list(args)
+                for position, value in zip(positions, oldValues):
+                    old[position] = value
+                if old == args:
+                    continue
+                label = name + " / " + " + ".join(inputs[position] for position in positions
+                                                  if old[position] != args[position])
+                patched, patch, shown = Measure(client, graph, inputs, args, old, repeat)
+                labelRuns = timings.setdefault(label, {"figure": [], "patch": []})
+                labelRuns["figure"].append(full)
+                labelRuns["patch"].append(patched)
+                oldFigure = figurePayload.FromJson(figures.GetJson(name, tuple(old)))
+                if "__dash_patch_update" not in patch or Apply(oldFigure, patch) != expected or shown != args:
+                    wrong[name].append((old, args))
+            # A figure that differs in another drop-down as well (the response to it got lost) can't be patched
+            old = list(args)
+            for position in (other, positions[0]):
+                old[position] = next(value for value in optionLists[position] if value != args[position])
+            _, figure, shown = Measure(client, graph, inputs, args, old, 1)
+            if not Whole(figure, shown, expected, args):
+                wrong[name].append((old, args))
+    results = {label: {state: {measure: (statistics.median if measure == "seconds" else statistics.mean)(
+        run[measure] for run in stateRuns) for measure in stateRuns[0]} for state, stateRuns in labelRuns.items()}
+        for label, labelRuns in timings.items()}
+    return results, wrong
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Whole figure responses against patches for the drop-downs that patch")
+    parser.add_argument("--repeat", type=int, default=5, help="Requests of each combination each way")
+    args = parser.parse_args()
+
+    # Importing the app builds it, the figures and patch fields are built up front so every request is a cache hit
+    import app
+    chartsPage = sys.modules["pages.charts"]
+    chartsPage.figures.Prebuild()
+    chartsPage.patches.Prebuild()
+    responseLayer.cacheCallbacks = False
+
+    results, wrong = Run(app.app, chartsPage.figures, args.repeat)
+    print("Average per response, whole figure -> patch")
+    print("  " + "chart / changed drop-downs".ljust(64) + "bytes".rjust(20) + "gzip bytes".rjust(18)
+          + "time (ms)".rjust(18))
+    for label, result in results.items():
+        full, patch = result["figure"], result["patch"]
+        print("  " + label.ljust(64) + "{:>8.0f} -> {:<7.0f}".format(full["bytes"], patch["bytes"]).rjust(20)
+              + "{:>7.0f} -> {:<6.0f}".format(full["gzip"], patch["gzip"]).rjust(18)
+              + "{:>6.2f} -> {:<6.2f}".format(full["seconds"] * 1000, patch["seconds"] * 1000).rjust(18))
+    failed = False
+    for name, cases in wrong.items():
+        print("  " + name + ": " + ("every response right" if not cases else
+                                     str(len(cases)) + " wrong (shown -> asked for), e.g. " + repr(cases[0])))
+        failed = failed or bool(cases)
+    if failed:
+        sys.exit(1)
@@ -0,0 +1,95 @@
+# Size and serialization time of the chart figures, written the way plotly writes them against figurePayload.py's compact form
+# Run from the src folder: python -m benchmarks.figurePayloads --scale 10 --combinations 20
+# "before" is plain plotly JSON written and read with the standard json module, "after" is the compact payload (typed arrays,
+# trimmed template) written and read with orjson, the way the figure cache does it now
+# Every chart's input combinations (or an even spread of --combinations of them) are built once, then for each figure:
+# - bytes, the payload as sent, and gzipped the way responseLayer.py compresses a callback response
+# - write, serializing the built figure, paid once per figure when it goes into the figure cache
+# - respond, reading the cached payload back and Dash writing out the callback response around it, paid on every request
+# Reported per callback, as the average over its combinations
+import argparse
+import gzip
+import importlib
+import json
+import statistics
+import time
+
+import dash
+from plotly.io.json import to_json_plotly
+
+import figurePayload
+from benchmarks.callbackAllocations import Combinations, LoadScaled
+
+
+def Seconds(function, repeat):
+    times = []
+    for _ in range(repeat):
+        startTime = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - startTime)
+    return statistics.median(times)
+
+
+# The callback response body Dash writes around a figure
+def Respond(figure, engine):
+    return to_json_plotly({"multi": True, "response": {"graph": {"figure": figure}}}, engine=engine)
+
+
+def Before(figure, repeat):
+    payload = to_json_plotly(figure, engine="json")
+    return {"bytes": len(payload.encode("utf-8")), "gzip": len(gzip.compress(payload.encode("utf-8"), 6, mtime=0)),
+            "write": Seconds(lambda: to_json_plotly(figure, engine="json"), repeat),
+            "respond": Seconds(lambda: Respond(json.loads(payload), "json"), repeat)}
+
+
+def After(figure, repeat):
+    payload = figurePayload.ToJson(figure)
+    return {"bytes": len(payload.encode("utf-8")), "gzip": len(gzip.compress(payload.encode("utf-8"), 6, mtime=0)),
+            "write": Seconds(lambda: figurePayload.ToJson(figure), repeat),
+            "respond": Seconds(lambda: Respond(figurePayload.FromJson(payload), "orjson"), repeat)}
+
+
+def Run(figures, limit, repeat):
+    results = {}
+    for name, (builder, optionLists) in figures.builders.items():
+        runs = {"before": [], "after": []}
+        for args in Combinations(figures, name, limit):
+            figure = builder(*args)
+            runs["before"].append(Before(figure, repeat))
+            runs["after"].append(After(figure, repeat))
+        results[name] = {state: {measure: statistics.mean(run[measure] for run in stateRuns) for measure in stateRuns[0]}
+                         for state, stateRuns in runs.items()}
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Figure payload sizes and serialization times, plain against compact")
+    parser.add_argument("--scale", type=int, default=1, help="Repeat the dataset this many times")
+    parser.add_argument("--combinations", type=int, default=None, help="Input combinations to run per chart (default all)")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs of each serialization, the median is kept")
+    args = parser.parse_args()
+    if figurePayload.orjson is None:
+        print("orjson isn't installed, the after column is written with the json module too")
+
+    # The charts page registers itself with Dash, so it needs an app to exist first
+    dash.Dash(__name__, use_pages=True, pages_folder="", suppress_callback_exceptions=True)
+    figures = importlib.import_module("pages.charts").figures
+
+    data = LoadScaled(args.scale)
+    print("Dataset x" + str(args.scale) + ", " + str(len(data.MapComp)) + " maps")
+    # One build and serialization first, so plotly's own first-use setup isn't put down to the first chart
+    warmUp = figures.builders["MapSizeGraph2"][0](*Combinations(figures, "MapSizeGraph2", 1)[0])
+    Before(warmUp, 1)
+    After(warmUp, 1)
+    results = Run(figures, args.combinations, args.repeat)
+
+    print("Average per figure, before -> after")
+    print("  " + "callback".ljust(22) + "bytes".rjust(22) + "gzip bytes".rjust(20) + "write (ms)".rjust(18)
+          + "respond (ms)".rjust(18))
+    for name, result in results.items():
+        before, after = result["before"], result["after"]
+        print("  " + name.ljust(22)
+              + "{:>10.0f} -> {:<8.0f}".format(before["bytes"], after["bytes"]).rjust(22)
+              + "{:>8.0f} -> {:<7.0f}".format(before["gzip"], after["gzip"]).rjust(20)
+              + "{:>6.2f} -> {:<6.2f}".format(before["write"] * 1000, after["write"] * 1000).rjust(18)
+              + "{:>6.2f} -> {:<6.2f}".format(before["respond"] * 1000, after["respond"] * 1000).rjust(18))
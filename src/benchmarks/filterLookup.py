@@ -0,0 +1,70 @@
+# How the cost of the chart filters grows with the size of the map catalog, boolean masks against the inverted indexes
+# Run from the src folder: python -m benchmarks.filterLookup --scales 1 10 100 1000
+# The dataset is repeated scale times, and then given scale times as many game modes (every copy of the catalog gets its
+# own renamed modes), which is what a much larger catalog looks like to a filter: more rows, not more rows per value
+# Each filter is the one a callback runs, the mask version is what the callbacks did before
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+import frameQuery
+import mapData
+
+
+def ScaledFrames(frames, scale):
+    scaled = {}
+    for name in ("EventFrame", "MapComp"):
+        copies = []
+        for copy in range(scale):
+            frame = frames[name].copy()
+            if copy > 0:
+                frame["Game mode"] = frame["Game mode"] + " " + str(copy)
+            copies.append(frame)
+        scaled[name] = pd.concat(copies, ignore_index=True)
+    return scaled
+
+
+def Timed(function, repeats):
+    startTime = time.perf_counter()
+    for _ in range(repeats):
+        function()
+    return (time.perf_counter() - startTime) / repeats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Filter cost against catalog size")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100, 1000])
+    parser.add_argument("--repeats", type=int, default=50)
+    args = parser.parse_args()
+
+    frames = mapData.LoadFrames(mmap=False)[0]
+    print("Time per filter (microseconds)")
+    print("  " + "maps".rjust(8) + "holiday mask".rjust(16) + "holiday index".rjust(16)
+          + "map size mask".rjust(16) + "map size index".rjust(16))
+    for scale in args.scales:
+        scaled = ScaledFrames(frames, scale)
+        EventFrame = scaled["EventFrame"]
+        MapComp = scaled["MapComp"]
+        eventQuery = frameQuery.FrameQuery(EventFrame, frameQuery.BuildPostings(
+            {"mode": EventFrame["Game mode"], "year": EventFrame["Date added"].dt.year}))
+        mapCompQuery = frameQuery.FrameQuery(MapComp, frameQuery.BuildPostings(
+            {"mode": MapComp["Game mode"],
+             "developers": np.where(MapComp["Community"] != "#B8383B", "Community", "Valve")}))
+
+        def HolidayMask():
+            return EventFrame.loc[(EventFrame["Date added"].dt.year == 2015) & (EventFrame["Game mode"] == "Payload")]
+
+        def HolidayIndex():
+            return eventQuery.Select(year=2015, mode="Payload")
+
+        def MapSizeMask():
+            temp = MapComp.loc[MapComp["Game mode"] == "Capture the Flag"]
+            return temp.loc[~temp["Developers"].str.contains("Valve", na=False)]
+
+        def MapSizeIndex():
+            return mapCompQuery.Select(mode="Capture the Flag", developers="Community")
+
+        timings = [Timed(function, args.repeats) * 1e6 for function in (HolidayMask, HolidayIndex, MapSizeMask, MapSizeIndex)]
+        print("  " + str(len(MapComp)).rjust(8) + "".join("{:16.1f}".format(timing) for timing in timings))
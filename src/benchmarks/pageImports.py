@@ -0,0 +1,73 @@
+# Startup time report, how long each page module takes to import when the app starts
+# Run from the src folder: python -m benchmarks.pageImports --runs 5
+# Each run is a fresh interpreter that first imports the libraries every page shares (so no page gets blamed for them),
+# creates the Dash app and then imports the pages the same way Dash does, in the same order
+# The charts data is loaded last and reported on its own, that is what the first visitor of the charts page pays for
+import argparse
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import time
+
+
+def Timed(function):
+    startTime = time.perf_counter()
+    function()
+    return time.perf_counter() - startTime
+
+
+def SharedImports():
+    import numpy
+    import pandas
+    import dash
+    import plotly.express
+
+
+# Runs inside each fresh interpreter, prints the timings as JSON
+def WorkerMain():
+    timings = {"shared libraries": Timed(SharedImports)}
+    import dash
+
+    # No pages folder, so Dash doesn't import the pages itself and we can time them one at a time below
+    timings["Dash app"] = Timed(lambda: dash.Dash(__name__, use_pages=True, pages_folder="",
+                                                  suppress_callback_exceptions=True))
+    for root, dirs, files in os.walk("pages"):
+        dirs[:] = [d for d in dirs if not d.startswith(".") and not d.startswith("_")]
+        for file in files:
+            if file.startswith("_") or file.startswith(".") or not file.endswith(".py"):
+                continue
+            path = os.path.join(root, file)
+            moduleName = os.path.splitext(path)[0].replace(os.sep, ".")
+            spec = importlib.util.spec_from_file_location(moduleName, path)
+            module = importlib.util.module_from_spec(spec)
+            timings[path] = Timed(lambda: spec.loader.exec_module(module))
+            sys.modules[moduleName] = module
+
+    import chartData
+    timings["charts data (first use)"] = Timed(chartData.Warm)
+    print(json.dumps(timings))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--worker":
+        WorkerMain()
+        sys.exit(0)
+
+    parser = argparse.ArgumentParser(description="Import time of every page module")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters to average over")
+    args = parser.parse_args()
+
+    runs = [json.loads(subprocess.run([sys.executable, "-m", "benchmarks.pageImports", "--worker"], check=True,
+                                      stdout=subprocess.PIPE, text=True).stdout.strip().splitlines()[-1])
+            for _ in range(args.runs)]
+    print("Startup over " + str(args.runs) + " runs (ms)")
+    total = 0
+    for name in runs[0]:
+        values = sorted(run[name] * 1000 for run in runs)
+        if name != "charts data (first use)":
+            total += values[len(values) // 2]
+        print("  " + name.ljust(28) + " median " + "{:8.1f}".format(values[len(values) // 2])
+              + "   min " + "{:8.1f}".format(values[0]) + "   max " + "{:8.1f}".format(values[-1]))
+    print("  " + "worker boot (without data)".ljust(28) + " median " + "{:8.1f}".format(total))
@@ -0,0 +1,110 @@
+# Check that the dataset refresher (chartData.Reload) picks up an edited workbook while its SQLite copy exists
+# Run from the src folder: python -m benchmarks.sourceReload
+# Everything happens in a temporary folder holding a copy of the workbook and the saved wiki page, with
+# TF2_DATA_SOURCE=auto (the default):
+# - the workbook is imported into SQLite, so the SQLite copy is the newer file and the first load reads it
+# - a reload with nothing changed has to keep the loaded snapshot
+# - the size of one map is changed in the workbook, which makes the workbook the newer file, the next reload has to read
+#   the workbook and swap in a snapshot with the new size
+# Anything else is reported and the exit status is 1
+# Reported: the time of each reload
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import openpyxl
+
+import chartData
+import mapData
+import sourceStore
+
+# The map whose size is edited, and the size it gets
+editedMap = "ctf_2fort"
+editedSize = 99.5
+sizeColumn = "MapSize(kHu^2)"
+
+
+# Change the size of a map in the MainMapData sheet, and make the workbook newer than the SQLite copy
+def EditWorkbook(path, fileName, size):
+    workbook = openpyxl.load_workbook(path)
+    sheet = workbook["MainMapData"]
+    header = [cell.value for cell in sheet[1]]
+    fileColumn = header.index("MapFileName")
+    column = header.index(sizeColumn)
+    for row in sheet.iter_rows(min_row=2):
+        if row[fileColumn].value == fileName:
+            row[column].value = size
+    workbook.save(path)
+    newer = os.path.getmtime(sourceStore.sqlitePath) + 10
+    os.utime(path, (newer, newer))
+
+
+def Size(data, fileName):
+    rows = data.mainData[data.mainData["File name"] == fileName]
+    return float(rows[sizeColumn].iloc[0])
+
+
+def TimedReload():
+    startTime = time.perf_counter()
+    swapped = chartData.Reload()
+    return swapped, time.perf_counter() - startTime
+
+
+def Run():
+    # The SQLite copy is made from a workbook that is older than it
+    older = time.time() - 60
+    os.utime(sourceStore.excelPath, (older, older))
+    sourceStore.ImportWorkbook()
+    results = []
+    problems = []
+
+    swapped, seconds = TimedReload()
+    results.append(("first load", seconds))
+    data = chartData.Get()
+    if not isinstance(mapData.Source(), sourceStore.SQLiteSource):
+        problems.append("the first load didn't read the SQLite copy, it is newer than the workbook")
+    originalSize = Size(data, editedMap)
+
+    swapped, seconds = TimedReload()
+    results.append(("nothing changed", seconds))
+    if swapped or chartData.Get() is not data:
+        problems.append("a reload with nothing changed swapped in a new snapshot")
+
+    EditWorkbook(sourceStore.excelPath, editedMap, editedSize)
+    swapped, seconds = TimedReload()
+    results.append(("workbook edited", seconds))
+    if not isinstance(mapData.Source(), sourceStore.ExcelSource):
+        problems.append("the edited workbook didn't take over from the SQLite copy")
+    if not swapped:
+        problems.append("the edited workbook wasn't picked up, the snapshot wasn't swapped")
+    elif Size(chartData.Get(), editedMap) != editedSize:
+        problems.append("the new snapshot has " + str(Size(chartData.Get(), editedMap)) + " for " + editedMap
+                        + ", expected " + str(editedSize) + " (it was " + str(originalSize) + ")")
+    return results, problems
+
+
+if __name__ == "__main__":
+    originalFolder = os.getcwd()
+    workFolder = tempfile.mkdtemp(prefix="sourceReload-")
+    sourceStore.sourceType = "auto"
+    mapData.source = None
+    try:
+        os.makedirs(os.path.join(workFolder, "dataSource"))
+        shutil.copyfile(sourceStore.excelPath, os.path.join(workFolder, sourceStore.excelPath))
+        shutil.copyfile(mapData.wikiPath, os.path.join(workFolder, mapData.wikiPath))
+        os.chdir(workFolder)
+        results, problems = Run()
+    finally:
+        os.chdir(originalFolder)
+        shutil.rmtree(workFolder, ignore_errors=True)
+
+    print("Dataset reloads with TF2_DATA_SOURCE=auto")
+    for label, seconds in results:
+        print("  " + label.ljust(20) + "{:8.1f} ms".format(seconds * 1000))
+    if problems:
+        for problem in problems:
+            print("  FAILED: " + problem)
+        sys.exit(1)
+    print("  the edited workbook was picked up over the SQLite copy")
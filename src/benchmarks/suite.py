@@ -0,0 +1,260 @@
+# Benchmark suite for the whole site: the data pipeline one stage at a time, every chart callback for every drop-down
+# combination, and a full render of the charts page through the Flask test client, each at several catalog sizes
+# Run from the src folder:
+#   python -m benchmarks.suite --scales 1 10 100                 write the timings to benchmarkResults.json
+#   python -m benchmarks.suite --save-baseline                   same, and keep them as benchmarks/baseline.json
+#   python -m benchmarks.suite --baseline benchmarks/baseline.json   compare with the stored baseline
+# The larger catalogs are synthetic, the map list repeated scale times (see syntheticData.py), e.g. --scales 1 10 100 1000
+# for the whole scaling curve
+# Every measurement is saved under a name like "etl/merge/x10" with the median and fastest time of its runs in seconds
+# Against a baseline, anything whose median got slower by more than --threshold (and by more than a millisecond, so timer
+# noise on the tiny stages doesn't count) is listed as a regression and the exit status is 1, so a CI step can use it
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from io import StringIO
+
+import dash
+import pandas as pd
+from bs4 import BeautifulSoup
+import figureCache
+import figurePayload
+import mapData
+import responseLayer
+import sourceStore
+import tableExtract
+from benchmarks import syntheticData
+from benchmarks.callbackAllocations import Combinations
+
+defaultBaseline = "benchmarks/baseline.json"
+defaultOutput = "benchmarkResults.json"
+
+
+def Timed(function):
+    startTime = time.perf_counter()
+    function()
+    return time.perf_counter() - startTime
+
+
+# Run function repeat times, the result is what gets saved for one measurement
+def Measure(function, repeat):
+    times = [Timed(function) for _ in range(repeat)]
+    return {"seconds": statistics.median(times), "min": min(times), "runs": repeat}
+
+
+# Stage by stage timings of mapData's pipeline on the scaled sheets and page
+# The old BeautifulSoup + read_html path (still run by benchmarks.wikiParse) is timed too, up to oldPathLimit, past that
+# the whole page as a soup tree takes more memory than is sensible
+def EtlStages(scale, repeat, oldPathLimit):
+    results = {}
+    sheets = syntheticData.ScaledSheets(scale)
+    pageHtml = syntheticData.ScaledPage(scale)
+    workbookPath = syntheticData.WriteWorkbook(sheets)
+    source = mapData.source
+    try:
+        mapData.source = sourceStore.ExcelSource(workbookPath)
+        results["read source"] = Measure(mapData.ReadSource, repeat)
+        origData, eventData = mapData.ReadSource()
+    finally:
+        mapData.source = source
+        os.remove(workbookPath)
+
+    if scale <= oldPathLimit:
+        results["soup parse"] = Measure(lambda: BeautifulSoup(pageHtml, "html.parser"), repeat)
+        soupTable = str(BeautifulSoup(pageHtml, "html.parser").find("table", class_=syntheticData.tableClass))
+        results["read_html"] = Measure(lambda: pd.read_html(StringIO(soupTable)), repeat)
+    results["table extract"] = Measure(lambda: tableExtract.ReadTable(pageHtml, syntheticData.tableClass), repeat)
+    rawFrame = tableExtract.ReadTable(pageHtml, syntheticData.tableClass)
+    results["date cleanup"] = Measure(lambda: mapData.ParseDateAdded(rawFrame["Date added"], rawFrame["File name"]),
+                                      repeat)
+
+    soupFrame = mapData.ParseWikiTable(pageHtml)
+    eventData = mapData.ApplyEventPages(eventData, soupFrame["Map"])
+    results["merge"] = Measure(lambda: mapData.MergeFrames(origData, soupFrame), repeat)
+    mainData = mapData.MergeFrames(origData, soupFrame)
+    results["derive frames"] = Measure(lambda: mapData.DeriveFrames(mainData, eventData), repeat)
+    frames = mapData.DeriveFrames(mainData, eventData)
+    # The size statistics and filter lookups worked out once per dataset when the charts load it
+    key = "synthetic-x" + str(scale)
+    results["chart data"] = Measure(lambda: syntheticData.InstallFrames(frames, key), repeat)
+    return results, frames
+
+
+# Every chart built (and serialized, as the figure cache does) for every input combination, or an even spread of limit
+# of them, with the cache bypassed
+# Saved per chart: the median over the combinations, the slowest one, and the time of each combination
+def Callbacks(figures, limit):
+    results = {}
+    for name, (builder, optionLists) in figures.builders.items():
+        # One untimed build first, so plotly's own first-use setup isn't put down to whichever chart happens to go first
+        figurePayload.ToJson(builder(*Combinations(figures, name, 1)[0]))
+        times = {}
+        for args in Combinations(figures, name, limit):
+            times[" | ".join(str(arg) for arg in args) or "-"] = Timed(lambda: figurePayload.ToJson(builder(*args)))
+        values = list(times.values())
+        results[name] = {"seconds": statistics.median(values), "min": min(values), "max": max(values),
+                         "runs": len(values), "combinations": times}
+    return results
+
+
+# Ids and values of every component in a layout that has both, i.e. the drop-downs and their starting values
+def Values(node, found):
+    if isinstance(node, list):
+        for child in node:
+            Values(child, found)
+    elif isinstance(node, dict):
+        props = node.get("props")
+        if isinstance(props, dict):
+            if "id" in props and "value" in props:
+                found[props["id"]] = props["value"]
+            Values(props.get("children"), found)
+    return found
+
+
+def Post(client, body):
+    response = client.post(responseLayer.callbackPath, json=body, headers={"Accept-Encoding": "gzip"})
+    if response.status_code != 200:
+        raise RuntimeError("Callback " + body["output"] + " answered " + str(response.status_code))
+    return response
+
+
+# What a browser opening the charts page asks for: the page, the Dash layout and callback list, the page content
+# (Dash pages renders it in a callback) and then every chart callback with the drop-downs at their starting values
+# Returns the time of each step
+def RenderPage(client, path):
+    timings = {}
+    headers = {"Accept-Encoding": "gzip"}
+    timings["page"] = Timed(lambda: client.get(path, headers=headers))
+    timings["layout"] = Timed(lambda: client.get("/_dash-layout", headers=headers))
+    dependencies = client.get("/_dash-dependencies").get_json()
+    content = {}
+
+    def RenderContent():
+        content["response"] = Post(client, {
+            "output": next(dependency["output"] for dependency in dependencies
+                           if "_pages_content" in dependency["output"]),
+            "outputs": [{"id": "_pages_content", "property": "children"}, {"id": "_pages_store", "property": "data"}],
+            "inputs": [{"id": "_pages_location", "property": "pathname", "value": path},
+                       {"id": "_pages_location", "property": "search", "value": ""}],
+            "changedPropIds": ["_pages_location.pathname"], "state": []})
+
+    timings["page content"] = Timed(RenderContent)
+    values = Values(content["response"].get_json()["response"]["_pages_content"]["children"], {})
+    if not values:
+        raise RuntimeError(path + " has no drop-downs, it isn't the charts page")
+    for dependency in dependencies:
+        if dependency["clientside_function"] is not None or dependency["output"].startswith(".."):
+            continue
+        outputId, outputProperty = dependency["output"].rsplit(".", 1)
+        body = {"output": dependency["output"], "outputs": {"id": outputId, "property": outputProperty},
+                "inputs": [dict(item, value=values.get(item["id"])) for item in dependency["inputs"]],
+                "changedPropIds": [], "state": []}
+        timings[outputId] = Timed(lambda: Post(client, body))
+    return timings
+
+
+# The page rendered repeat times with an empty figure cache (the first visitor after a deploy) and again with the figures
+# already built, the callback response cache is off throughout so every callback request reaches its callback
+def Render(app, figures, repeat):
+    client = app.server.test_client()
+    path = next(page["relative_path"] for page in dash.page_registry.values() if page["module"] == "pages.charts")
+    results = {}
+    for state in ("cold", "warm"):
+        runs = []
+        for _ in range(repeat):
+            if state == "cold":
+                figures.store = figureCache.MemoryStore()
+            runs.append(RenderPage(client, path))
+        totals = [sum(run.values()) for run in runs]
+        results[state] = {"seconds": statistics.median(totals), "min": min(totals), "runs": repeat,
+                          "steps": {step: statistics.median(run[step] for run in runs) for step in runs[0]}}
+    return results
+
+
+def RunSuite(args):
+    # The page modules need the app, importing it builds it (and registers the chart callbacks) without loading any data
+    import app
+    figures = sys.modules["pages.charts"].figures
+    figures.store = figureCache.MemoryStore()
+    responseLayer.cacheCallbacks = False
+
+    results = {}
+    for scale in args.scales:
+        label = "/x" + str(scale)
+        print("Scale x" + str(scale), flush=True)
+        stages, frames = EtlStages(scale, args.repeat, args.old_path_limit)
+        for name, result in stages.items():
+            results["etl/" + name + label] = result
+        # The last chart data install left the scaled frames loaded, everything below runs on them
+        print("  " + str(len(frames["mainData"].index)) + " maps, ETL done", flush=True)
+        for name, result in Callbacks(figures, args.combinations).items():
+            results["callback/" + name + label] = result
+        print("  callbacks done", flush=True)
+        for state, result in Render(app.app, figures, args.repeat).items():
+            results["render/" + state + label] = result
+        print("  render done", flush=True)
+    return {"created": datetime.datetime.now().isoformat(timespec="seconds"), "python": platform.python_version(),
+            "platform": platform.platform(), "pandas": pd.__version__, "scales": args.scales,
+            "results": results}
+
+
+# Measurements slower than the baseline by more than threshold (a fraction) and by more than a millisecond
+def Compare(run, baseline, threshold):
+    rows = []
+    for name, result in run["results"].items():
+        before = baseline["results"].get(name)
+        if before is None:
+            continue
+        change = result["seconds"] / before["seconds"] - 1 if before["seconds"] > 0 else 0
+        regressed = change > threshold and result["seconds"] - before["seconds"] > 0.001
+        rows.append((name, before["seconds"], result["seconds"], change, regressed))
+    return rows
+
+
+def PrintResults(run):
+    print("Median time (ms)")
+    for name, result in run["results"].items():
+        print("  " + name.ljust(44) + "{:12.2f}".format(result["seconds"] * 1000))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ETL, callback and page render benchmarks")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100],
+                        help="Catalog sizes to run at, as multiples of the real map list")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs of each ETL stage and page render")
+    parser.add_argument("--combinations", type=int, default=None, help="Input combinations to run per chart (default all)")
+    parser.add_argument("--old-path-limit", type=int, default=100,
+                        help="Largest scale to time the BeautifulSoup + read_html stages at")
+    parser.add_argument("--output", default=defaultOutput, help="Where to write the results")
+    parser.add_argument("--baseline", default=None, help="Results file to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="Also write the results to " + defaultBaseline)
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="Slowdown (as a fraction) counted as a regression, default 0.25")
+    args = parser.parse_args()
+
+    run = RunSuite(args)
+    with open(args.output, "w", encoding="utf-8") as outputFile:
+        json.dump(run, outputFile, indent=1)
+    if args.save_baseline:
+        with open(defaultBaseline, "w", encoding="utf-8") as baselineFile:
+            json.dump(run, baselineFile, indent=1)
+    PrintResults(run)
+    print("Results written to " + args.output)
+
+    if args.baseline is not None:
+        with open(args.baseline, "r", encoding="utf-8") as baselineFile:
+            baseline = json.load(baselineFile)
+        rows = Compare(run, baseline, args.threshold)
+        print("Against the baseline from " + baseline["created"] + " (ms)")
+        for name, before, after, change, regressed in rows:
+            print("  " + name.ljust(44) + "{:12.2f}{:12.2f}{:+9.0%}".format(before * 1000, after * 1000, change)
+                  + ("   REGRESSION" if regressed else ""))
+        regressions = [row for row in rows if row[4]]
+        print(str(len(regressions)) + " regression(s) out of " + str(len(rows)) + " compared")
+        if regressions:
+            sys.exit(1)
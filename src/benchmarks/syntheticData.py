@@ -0,0 +1,102 @@
+# Synthetic versions of the raw data with the map list made scale times longer, for seeing how things grow with the catalog
+# Every copy of the list after the first gets its file names suffixed (ctf_2fort_2, ctf_2fort_3, ...) in both the sheet and
+# the wiki page, so the merge still pairs each sheet row with one wiki row and the dataset really has scale times the maps
+# Map names, game modes, dates and developers are repeated as they are, so every filter value matches scale times the rows
+# Used by benchmarks.suite, the helpers can also be used on their own:
+#   python -m benchmarks.syntheticData --scale 100     (prints the sizes of the scaled data)
+import argparse
+import os
+import re
+import tempfile
+
+import pandas as pd
+
+import chartData
+import mapData
+import sourceStore
+
+tableClass = "wikitable sortable grid"
+
+
+def _Suffix(copy):
+    return "" if copy == 0 else "_" + str(copy + 1)
+
+
+# The MainMapData and EventMapList sheets, with the map list repeated scale times
+def ScaledSheets(scale):
+    tables = mapData.Source().ReadTables(["MainMapData", "EventMapList"])
+    mainSheet = tables["MainMapData"]
+    copies = []
+    for copy in range(scale):
+        frame = mainSheet.copy()
+        frame["MapFileName"] = frame["MapFileName"] + _Suffix(copy)
+        copies.append(frame)
+    return {"MainMapData": pd.concat(copies, ignore_index=True), "EventMapList": tables["EventMapList"]}
+
+
+# The saved List_of_maps page, with every map row of its table repeated scale times
+def ScaledPage(scale):
+    with open(mapData.wikiPath, "r", encoding="utf-8") as pageFile:
+        pageHtml = pageFile.read()
+    start = pageHtml.index('<table class="' + tableClass + '"')
+    end = pageHtml.index("</table>", start)
+    rows = re.findall(r"<tr>.*?</tr>", pageHtml[start:end], re.S)
+    headerRow, mapRows = rows[0], rows[1:]
+    tableStart = pageHtml.index(headerRow, start) + len(headerRow)
+    copies = []
+    for copy in range(scale):
+        suffix = _Suffix(copy)
+        copies.extend(re.sub(r"<code>(.*?)</code>", lambda match: "<code>" + match.group(1) + suffix + "</code>", row)
+                      for row in mapRows)
+    return pageHtml[:tableStart] + "\n" + "\n".join(copies) + "\n</tbody>" + pageHtml[end:]
+
+
+# Write the scaled sheets to a workbook in a temporary folder, so reading it can be timed the same way as the real one
+# Gives back the path, the caller removes it
+def WriteWorkbook(sheets):
+    handle, path = tempfile.mkstemp(prefix="TF2MapData-", suffix=".xlsx")
+    os.close(handle)
+    with pd.ExcelWriter(path) as writer:
+        for name, frame in sheets.items():
+            frame.to_excel(writer, sheet_name=name, index=False)
+    return path
+
+
+# The whole pipeline (mapData.BuildFrames) run on the scaled sheets and page
+def BuildScaled(scale):
+    source = mapData.source
+    path = WriteWorkbook(ScaledSheets(scale))
+    try:
+        mapData.source = sourceStore.ExcelSource(path)
+        origData, eventData = mapData.ReadSource()
+    finally:
+        mapData.source = source
+        os.remove(path)
+    soupFrame = mapData.ParseWikiTable(ScaledPage(scale))
+    eventData = mapData.ApplyEventPages(eventData, soupFrame["Map"])
+    return mapData.DeriveFrames(mapData.MergeFrames(origData, soupFrame), eventData)
+
+
+# Make frames the data the charts read, as if they had been loaded from the cache under key
+# The load hooks run too, so the figure cache moves over to the new version
+def InstallFrames(frames, key):
+    loadFrames = mapData.LoadFrames
+    mapData.LoadFrames = lambda: (frames, key)
+    try:
+        data = chartData.ChartData()
+    finally:
+        mapData.LoadFrames = loadFrames
+    for hook in chartData._loadHooks:
+        hook(data)
+    chartData._current = data
+    return data
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sizes of the synthetic scaled dataset")
+    parser.add_argument("--scale", type=int, default=10)
+    args = parser.parse_args()
+
+    frames = BuildScaled(args.scale)
+    for name in mapData.frameNames:
+        print("  " + name.ljust(16) + str(len(frames[name].index)).rjust(10) + " rows")
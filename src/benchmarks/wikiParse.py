@@ -0,0 +1,72 @@
+# Compares the old way of reading the List_of_maps table (BeautifulSoup + pd.read_html) with tableExtract.ReadTable
+# Run from the src folder: python -m benchmarks.wikiParse --scale 100 --repeat 5
+# Runs on the saved page and on a synthetic page with the map rows repeated scale times
+# Reports the best time of each and the peak memory traced while parsing, and checks both give back the same frame
+import argparse
+import re
+import time
+import tracemalloc
+from io import StringIO
+
+import pandas as pd
+from bs4 import BeautifulSoup
+
+import mapData
+import tableExtract
+
+tableClass = "wikitable sortable grid"
+
+
+# What ParseWikiTable used to do, the whole page becomes a soup tree and the table then gets parsed a second time
+def SoupReadHtml(pageHtml):
+    soupTable = BeautifulSoup(pageHtml, "html.parser").find("table", class_=tableClass)
+    return pd.read_html(StringIO(str(soupTable)))[0]
+
+
+def Streaming(pageHtml):
+    return tableExtract.ReadTable(pageHtml, tableClass)
+
+
+# Same page, with every map row of the table repeated scale times
+def ScalePage(pageHtml, scale):
+    start = pageHtml.index('<table class="' + tableClass + '"')
+    end = pageHtml.index("</table>", start)
+    rows = re.findall(r"<tr>.*?</tr>", pageHtml[start:end], re.S)
+    headerRow, mapRows = rows[0], rows[1:]
+    tableStart = pageHtml.index(headerRow, start) + len(headerRow)
+    return pageHtml[:tableStart] + "\n" + "\n".join(mapRows * scale) + "\n</tbody>" + pageHtml[end:]
+
+
+def Measure(function, pageHtml, repeat):
+    times = []
+    for _ in range(repeat):
+        startTime = time.perf_counter()
+        frame = function(pageHtml)
+        times.append(time.perf_counter() - startTime)
+    tracemalloc.start()
+    function(pageHtml)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return frame, min(times), peak
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Wiki map table parsing, old path vs streaming extractor")
+    parser.add_argument("--scale", type=int, default=100, help="How many times to repeat the rows for the large page")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with open(mapData.wikiPath, "r", encoding="utf-8") as pageFile:
+        snapshot = pageFile.read()
+    for label, pageHtml in (("snapshot", snapshot), ("x" + str(args.scale), ScalePage(snapshot, args.scale))):
+        # The large page is slow on the old path, so it only gets timed once there
+        repeat = args.repeat if label == "snapshot" else 1
+        oldFrame, oldTime, oldPeak = Measure(SoupReadHtml, pageHtml, repeat)
+        newFrame, newTime, newPeak = Measure(Streaming, pageHtml, repeat)
+        pd.testing.assert_frame_equal(oldFrame, newFrame)
+        print(label + ": " + "{:.1f}".format(len(pageHtml) / 1024) + " kB page, " + str(len(newFrame.index)) + " rows")
+        print("  soup + read_html " + "{:8.1f}".format(oldTime * 1000) + " ms, peak "
+              + "{:8.1f}".format(oldPeak / 1024 / 1024) + " MB")
+        print("  streaming        " + "{:8.1f}".format(newTime * 1000) + " ms, peak "
+              + "{:8.1f}".format(newPeak / 1024 / 1024) + " MB")
+        print("  speedup " + "{:.1f}".format(oldTime / newTime) + "x, frames equal")
@@ -0,0 +1,142 @@
+# Offline run of wikiSync.py against the fixture pages in benchmarks/wikiFixtures, served by its local wiki stand-in
+# Run from the src folder: python -m benchmarks.wikiSyncOffline
+# Everything the sync writes (the saved pages, the sync state and the dataset cache) goes into a temporary folder, the map
+# sheets are read from the real data source
+# Three syncs are run, starting from a saved map list that is the same as the fixture:
+# - first, nothing has an ETag yet so every page is downloaded, the map list diff is empty and the event pages are applied
+# - again, every page answers 304 Not Modified and nothing is parsed
+# - after List_of_maps.html is swapped for List_of_maps.changed.html (Upward inserted, Camber changed to Valve and
+#   DeGroot Keep removed), only the map list is downloaded and the diff is applied to the cached dataset
+#   The Halloween page lists Upward from the start, so it only becomes a Halloween map once the map list has it
+# The dataset the last sync saved has to match a full rebuild from the same pages frame for frame, and the stand-in has to
+# have answered each sync as described, otherwise it is reported and the exit status is 1
+# Reported: the time of each sync and of the full rebuild
+import contextlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from http.server import ThreadingHTTPServer
+
+import pandas as pd
+
+import dataSchema
+import dataStore
+import mapData
+import wikiSync
+
+fixtureFolder = os.path.join(os.path.dirname(os.path.abspath(__file__)), "wikiFixtures")
+changedPage = "List_of_maps.changed.html"
+
+
+# The stand-in, noting down what it answered for every page
+class RecordingHandler(wikiSync.FixtureHandler):
+    answers = {}
+
+    def log_request(self, code="-", size="-"):
+        RecordingHandler.answers[self.path.strip("/")] = int(code)
+
+
+def Serve(folder):
+    RecordingHandler.folder = folder
+    server = ThreadingHTTPServer(("127.0.0.1", 0), RecordingHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# One sync, gives back what the stand-in answered, how long it took and what the sync printed
+def RunSync(baseUrl):
+    RecordingHandler.answers = {}
+    output = io.StringIO()
+    startTime = time.perf_counter()
+    with contextlib.redirect_stdout(output):
+        wikiSync.Sync(baseUrl)
+    return dict(RecordingHandler.answers), time.perf_counter() - startTime, output.getvalue()
+
+
+# Names of the frames that differ between the two datasets
+def Differences(frames, expected):
+    different = []
+    for name in mapData.frameNames + mapData.indexFrameNames + ["wikiData"]:
+        try:
+            pd.testing.assert_frame_equal(frames[name], expected[name])
+        except AssertionError:
+            different.append(name)
+    return different
+
+
+def Run(workFolder):
+    servedFolder = os.path.join(workFolder, "wiki")
+    os.makedirs(servedFolder)
+    for page in wikiSync.pages:
+        shutil.copyfile(os.path.join(fixtureFolder, page + ".html"), os.path.join(servedFolder, page + ".html"))
+    # The map list the dataset was last built from
+    shutil.copyfile(os.path.join(fixtureFolder, "List_of_maps.html"), os.path.join(workFolder, mapData.wikiPath))
+
+    server = Serve(servedFolder)
+    baseUrl = "http://127.0.0.1:" + str(server.server_address[1]) + "/"
+    everyPage = {page: 200 for page in wikiSync.pages}
+    syncs = [("first sync", everyPage, "Map list: 0 inserted, 0 changed, 0 removed"),
+             ("nothing changed", {page: 304 for page in wikiSync.pages}, "Everything is up to date"),
+             ("map list changed", dict({page: 304 for page in wikiSync.pages}, List_of_maps=200),
+              "Map list: 1 inserted, 1 changed, 1 removed")]
+    results = []
+    problems = []
+    try:
+        for label, expectedAnswers, expectedLine in syncs:
+            if label == "map list changed":
+                shutil.copyfile(os.path.join(fixtureFolder, changedPage),
+                                os.path.join(servedFolder, "List_of_maps.html"))
+            answers, seconds, printed = RunSync(baseUrl)
+            results.append((label, answers, seconds))
+            if answers != expectedAnswers:
+                problems.append(label + ": the stand-in answered " + repr(answers) + ", expected "
+                                + repr(expectedAnswers))
+            if expectedLine not in printed:
+                problems.append(label + ": the sync didn't report " + repr(expectedLine) + "\n" + printed)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    # What the last sync saved, under the key the saved pages give
+    synced = dataStore.LoadFrames(mapData.DatasetKey(), mmap=False)
+    startTime = time.perf_counter()
+    rebuilt = dataSchema.EnforceAll(mapData.BuildFrames())
+    results.append(("full rebuild", None, time.perf_counter() - startTime))
+    if synced is None:
+        problems.append("the last sync saved no dataset under the key of the new pages")
+    else:
+        different = Differences(dataSchema.EnforceAll(synced), rebuilt)
+        if different:
+            problems.append("the synced dataset differs from a full rebuild in " + ", ".join(different))
+    return results, problems
+
+
+if __name__ == "__main__":
+    # Only the sheets come from the real data source, every other path is relative to the work folder
+    source = mapData.Source()
+    mapData.source = type(source)(os.path.abspath(source.path))
+    originalFolder = os.getcwd()
+    workFolder = tempfile.mkdtemp(prefix="wikiSync-")
+    os.chdir(workFolder)
+    try:
+        results, problems = Run(workFolder)
+    finally:
+        os.chdir(originalFolder)
+        shutil.rmtree(workFolder, ignore_errors=True)
+
+    print("Wiki sync against " + fixtureFolder)
+    for label, answers, seconds in results:
+        status = ""
+        if answers is not None:
+            downloaded = sum(1 for code in answers.values() if code == 200)
+            status = str(downloaded) + " downloaded, " + str(len(answers) - downloaded) + " not modified"
+        print("  " + label.ljust(20) + "{:8.1f} ms   ".format(seconds * 1000) + status)
+    if problems:
+        for problem in problems:
+            print("  FAILED: " + problem)
+        sys.exit(1)
+    print("  the synced dataset matches a full rebuild")
@@ -0,0 +1,99 @@
+# Measures how much memory each worker spends on the map dataset, with and without TF2_DATA_MMAP
+# Run from the src folder: python -m benchmarks.workerMemory --workers 4 --scale 100
+# Every worker is a fresh interpreter that imports pandas, loads the frames and touches every column (like the callbacks do)
+# The numbers reported are the growth in Rss / Pss / private memory caused by loading the data, read from /proc/self/smaps_rollup
+# Pss is the useful one for "how many workers fit on the box", shared mapped pages are split between the workers using them
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+import dataStore
+import mapData
+
+
+def ReadMemory():
+    memory = {}
+    with open("/proc/self/smaps_rollup", "r") as rollup:
+        for line in rollup:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                memory[parts[0].rstrip(":")] = int(parts[1])
+    return {"Rss": memory["Rss"], "Pss": memory["Pss"],
+            "Private": memory["Private_Clean"] + memory["Private_Dirty"]}
+
+
+# Runs inside each worker process
+def WorkerMain(cacheRoot, key, mmap, holdFile):
+    dataStore.cacheRoot = cacheRoot
+    before = ReadMemory()
+    frames = dataStore.LoadFrames(key, mmap=mmap)
+    # Touch every column, the same way a callback filtering or grouping on it would
+    for frame in frames.values():
+        for name in frame.columns:
+            column = frame[name]
+            if isinstance(column.dtype, pd.CategoricalDtype):
+                column.cat.codes.sum()
+            elif column.dtype == object:
+                column.str.len().sum()
+            else:
+                column.to_numpy().view("u1").sum()
+    # Wait until every worker has loaded, so shared pages are counted against all of them at the same time
+    with open(holdFile + "." + str(os.getpid()), "w"):
+        pass
+    while not os.path.exists(holdFile):
+        time.sleep(0.01)
+    after = ReadMemory()
+    print(json.dumps({name: after[name] - before[name] for name in after}))
+
+
+# Build a synthetic copy of the cached dataset, repeated scale times, so the effect is visible beyond the 183 real maps
+def BuildScaledCache(cacheRoot, scale):
+    frames, key = mapData.LoadFrames(mmap=False)
+    scaled = {name: pd.concat([frame] * scale, ignore_index=True) for name, frame in frames.items()}
+    dataStore.cacheRoot = cacheRoot
+    scaledKey = key + "x" + str(scale)
+    dataStore.SaveFrames(scaled, scaledKey)
+    return scaledKey, sum(frame.memory_usage(deep=True).sum() for frame in scaled.values())
+
+
+def RunWorkers(cacheRoot, key, mmap, workerCount):
+    holdFile = os.path.join(cacheRoot, "hold-" + ("mmap" if mmap else "private"))
+    processes = [subprocess.Popen([sys.executable, "-m", "benchmarks.workerMemory", "--worker", cacheRoot, key,
+                                   "1" if mmap else "0", holdFile], stdout=subprocess.PIPE, text=True)
+                 for _ in range(workerCount)]
+    # Release the workers once they have all loaded the data
+    while len([name for name in os.listdir(cacheRoot) if name.startswith(os.path.basename(holdFile) + ".")]) < workerCount:
+        if any(process.poll() not in (None, 0) for process in processes):
+            raise RuntimeError("A worker process failed")
+        time.sleep(0.01)
+    open(holdFile, "w").close()
+    return [json.loads(process.communicate()[0]) for process in processes]
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--worker":
+        WorkerMain(sys.argv[2], sys.argv[3], sys.argv[4] == "1", sys.argv[5])
+        sys.exit(0)
+
+    parser = argparse.ArgumentParser(description="Per-worker memory used by the map dataset")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--scale", type=int, default=1, help="Repeat the dataset this many times")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tempRoot:
+        scaledKey, frameBytes = BuildScaledCache(tempRoot, args.scale)
+        print("Dataset x" + str(args.scale) + ": " + "{:.1f}".format(frameBytes / 1024) + " kB in pandas, "
+              + str(args.workers) + " workers")
+        for mmap in (False, True):
+            results = RunWorkers(tempRoot, scaledKey, mmap, args.workers)
+            label = "mmap   " if mmap else "private"
+            for name in ("Rss", "Pss", "Private"):
+                values = [result[name] for result in results]
+                print(label + " " + name.ljust(7) + " per worker (kB): avg " + str(sum(values) // len(values))
+                      + ", max " + str(max(values)))
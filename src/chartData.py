@@ -0,0 +1,185 @@
+# Data behind the charts page, loaded the first time something actually needs it
+# Dash imports every page when the app starts, so when this was loaded at the top of pages/charts.py every worker paid for
+# it before serving anything, even one only asked for the findings or sources pages
+# Get() loads it on first use (only one thread does the work, any others wait for it), Warm() loads it up front instead
+#
+# A loaded ChartData is a snapshot, nothing changes it after it is made
+# When the source data changes, Reload() builds a whole new snapshot and then swaps it in with a single assignment, so
+# a request either sees the old snapshot or the new one, never a mix, and the old one is freed once nothing uses it
+# StartRefresher() does that in a background thread, checking every TF2_RELOAD_INTERVAL seconds whether the dataset
+# key (the hash of the source files) changed, so a new workbook or wiki snapshot is picked up without restarting workers
+# A request can pin the snapshot it started with (Pin / Unpin, done for every request in app.py), everything it reads
+# through Get() then comes from that one snapshot even if a new one is swapped in half way through
+# Caches built from the data (figures, callback responses, the clientside store) are all keyed by the snapshot version
+import os
+import threading
+import time
+
+import dataStore
+import frameQuery
+import metrics
+
+# Set TF2_WARM_CHART_DATA=1 to load the data while the app starts, e.g. in the gunicorn master with --preload
+warmOnStart = os.environ.get("TF2_WARM_CHART_DATA", "0") == "1"
+# Set TF2_QUERY_PUSHDOWN=1 to have the charts that count maps do their filtering and counting as SQL queries on the
+# SQLite copy of the finished chart frames saved with the dataset cache (frames.sqlite, see dataStore.QueryFrames), instead
+# of in pandas, whichever data source the dataset was built from
+pushdown = os.environ.get("TF2_QUERY_PUSHDOWN", "0") == "1"
+# Seconds between checks for new source data in the refresher, 0 (the default) leaves it off
+reloadInterval = float(os.environ.get("TF2_RELOAD_INTERVAL", "0"))
+
+
+# Everything the charts read, loaded from the cached dataset (built first if needed) and worked out once per dataset version
+class ChartData:
+    def __init__(self):
+        # mapData (and the scraping libraries it brings in) is only imported here, starting the app doesn't need it
+        import mapData
+        frames, self.version = mapData.LoadFrames()
+        self.mainData = frames["mainData"]
+        self.MapPerYearData = frames["MapPerYearData"]
+        self.gameModeData = frames["gameModeData"]
+        self.mapSizeFrame = frames["mapSizeFrame"]
+        self.EventFrame = frames["EventFrame"]
+        self.MapComp = frames["MapComp"]
+
+        # Row lookups for the drop-down filters, through the inverted indexes saved with the dataset (see frameQuery.py)
+        # so the callbacks never copy or scan these frames
+        self.mainQuery = frameQuery.FrameQuery(self.mainData, frames["mainDataIndex"])
+        self.MapPerYearQuery = frameQuery.FrameQuery(self.MapPerYearData, frames["MapPerYearDataIndex"])
+        self.gameModeQuery = frameQuery.FrameQuery(self.gameModeData, frames["gameModeDataIndex"])
+        self.EventQuery = frameQuery.FrameQuery(self.EventFrame, frames["EventFrameIndex"])
+        self.MapCompQuery = frameQuery.FrameQuery(self.MapComp, frames["MapCompIndex"])
+
+        # Question 1, split the maps by who made them
+        self.valveMaps = self.mainQuery.Select(developers="Valve").reset_index()
+        self.communityMaps = self.mainQuery.Select(developers="Community").reset_index()
+
+        # Question 4, the game modes to show in the map size chart
+        gameModeList = self.mapSizeFrame["GameMode"]
+        gameModeList = gameModeList.drop_duplicates()
+        # There are a few game modes that don't really matter here (Mainly the training mode and test maps), so for the sake of making the chart easier to read, we shall remove them
+        gameModeList = gameModeList[gameModeList != "Test"]
+        gameModeList = gameModeList[gameModeList != "Training Mode"]
+        self.gameModeList = gameModeList.to_numpy()
+
+        # All three frames (average, min and max sizes) come out of one grouped pass over mapSizeFrame
+        # Each has the game modes as rows and the all / Valve / community sizes in both units as columns
+        # Note that if there are no developers of a type in a game mode (I.E. no community MVM maps have been added), the value is set to 0
+        sizeStats = mapData.SizeStats(self.mapSizeFrame, ["mean", "min", "max"], self.gameModeList)
+        self.MapAverageFrame = sizeStats["mean"]
+        self.MapMinFrame = sizeStats["min"]
+        self.MapMaxFrame = sizeStats["max"]
+
+    # Run SQL on the copy of this dataset version's frames saved with the cache, each frame is a table of the same name
+    def Query(self, sql, params=()):
+        return dataStore.QueryFrames(self.version, sql, params)
+
+
+_current = None
+_lock = threading.Lock()
+_loadHooks = []
+_swapHooks = []
+# The snapshot pinned by the request running on this thread, if any
+_local = threading.local()
+
+
+# Run hook(data) every time new data is loaded, e.g. to move a figure cache over to the new dataset version
+# It runs before the new data is handed out
+def OnLoad(hook):
+    _loadHooks.append(hook)
+
+
+# Run hook(data) after a reload has swapped new data in, e.g. to build the figures for it again
+def OnSwap(hook):
+    _swapHooks.append(hook)
+
+
+# Load a new snapshot, the load hooks run before anything can see it
+def _Load():
+    with metrics.Timed(metrics.etlSeconds, ("chart data",)):
+        data = ChartData()
+    for hook in _loadHooks:
+        hook(data)
+    return data
+
+
+def Get():
+    global _current
+    pinned = getattr(_local, "pinned", None)
+    if pinned is not None:
+        return pinned
+    data = _current
+    if data is None:
+        with _lock:
+            if _current is None:
+                _current = _Load()
+            data = _current
+    if getattr(_local, "pinning", False):
+        _local.pinned = data
+    return data
+
+
+def Warm():
+    Get()
+
+
+# Keep this thread on the snapshot that is current now (or the first one loaded, if nothing is yet) until Unpin()
+def Pin():
+    _local.pinning = True
+    _local.pinned = _current
+
+
+def Unpin():
+    _local.pinning = False
+    _local.pinned = None
+
+
+# Version of the data this thread sees, or None if nothing has been loaded yet (doesn't load anything itself)
+def Version():
+    data = getattr(_local, "pinned", None)
+    if data is None:
+        data = _current
+    return None if data is None else data.version
+
+
+def IsLoaded():
+    return _current is not None
+
+
+# Swap in a new snapshot if the source data changed since the current one was loaded (or always, with force)
+# The new snapshot is built completely before the swap, requests keep being answered from the old one meanwhile
+# Gives back whether anything was swapped
+def Reload(force=False):
+    global _current
+    import mapData
+    if not force and _current is not None and mapData.DatasetKey() == _current.version:
+        return False
+    data = _Load()
+    with _lock:
+        changed = _current is None or data.version != _current.version or force
+        _current = data
+    if changed:
+        print("Swapped in dataset " + str(data.version))
+        for hook in _swapHooks:
+            hook(data)
+    return changed
+
+
+def _Refresh(interval):
+    while True:
+        time.sleep(interval)
+        try:
+            Reload()
+        except Exception as error:
+            # A broken workbook or snapshot leaves the site on the data it has, the next check tries again
+            print("Dataset reload failed, keeping " + str(Version()) + ": " + repr(error))
+
+
+# Start the background refresher (in each worker, threads don't survive the fork from a preloading gunicorn master)
+def StartRefresher(interval=None):
+    interval = reloadInterval if interval is None else interval
+    if interval <= 0:
+        return None
+    thread = threading.Thread(target=_Refresh, args=(interval,), name="chartDataRefresher", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,109 @@
+# Column types of every frame in the finished dataset
+# The frames are cast to these types when they are built, so the cache stores the compact versions, and checked again
+# every time they are loaded, so a cache that doesn't match (or a change to the pipeline that breaks a column) fails loudly
+# instead of showing up as a wrong chart
+# - category: text with few distinct values (game modes, developers, events), stored once per value instead of once per row
+# - string: free text that is different on nearly every row (map and file names), left as plain Python strings
+#   (a memory-mapped cache hands these out as categoricals over the mapped codes, that is left alone too)
+# - bool, int16, int32, float32, datetime64[ns]: the numpy type of the same name
+# Map sizes are float32, the sheet gives them to at most 6 significant digits, which a float32 keeps, so Float64 gets back
+# exactly the values the sheet has
+# Anything worked out from them (the size averages, the km^2 sizes) and anything shown is worked out from those float64
+# values (MapSizes) and not from the float32 column, which would show as e.g. 13.948871612548828 instead of 13.948872
+import numpy as np
+import pandas as pd
+
+schema = {
+    "mainData": {"Map": "string", "File name": "string", "Game mode": "category", "Date added": "datetime64[ns]",
+                 "Developers": "category", "MapSize(kHu^2)": "float32", "NativeNavmesh": "bool"},
+    "MapPerYearData": {"Map": "string", "Game mode": "category", "Date added": "int16", "Developers": "category",
+                       "Community": "bool"},
+    "gameModeData": {"GameMode": "category", "Developers": "category", "Community": "bool"},
+    "mapSizeFrame": {"Map": "string", "GameMode": "category", "Developers": "category", "MapSize(kHu^2)": "float32",
+                     "Community": "bool", "MapSize(km^2)": "float32"},
+    "EventFrame": {"Map": "string", "Game mode": "category", "Date added": "datetime64[ns]", "Event": "category"},
+    "MapComp": {"Map": "string", "Game mode": "category", "Developers": "category", "MapSize(kHu^2)": "float32",
+                "Community": "category", "MapSize(km^2)": "float32"}
+}
+
+# The inverted indexes (see frameQuery.py) all share one layout
+postingsSchema = {"dimension": "category", "value": "category", "row": "int32"}
+schema.update({name + "Index": postingsSchema
+               for name in ["mainData", "MapPerYearData", "gameModeData", "EventFrame", "MapComp"]})
+
+
+# Cast one column to its schema type, raising a ValueError that says which column is wrong if it can't be
+def _Column(frameName, name, column, kind):
+    def Fail(reason):
+        raise ValueError(frameName + "[" + repr(name) + "] should be " + kind + ", " + reason)
+
+    if kind == "string":
+        if column.dtype != object and not isinstance(column.dtype, pd.CategoricalDtype):
+            Fail("got " + str(column.dtype))
+        return column
+    if kind == "category":
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            return column
+        if column.dtype != object:
+            Fail("got " + str(column.dtype))
+        return column.astype("category")
+    if kind == "bool":
+        if column.dtype == bool:
+            return column
+        if column.isna().any():
+            Fail("it has missing values")
+        if not column.isin([True, False]).all():
+            Fail("it has values other than True and False")
+        return column.astype(bool)
+    if kind == "datetime64[ns]":
+        if column.dtype != np.dtype("datetime64[ns]"):
+            Fail("got " + str(column.dtype))
+        return column
+    # The numeric types
+    if column.dtype == np.dtype(kind):
+        return column
+    if not pd.api.types.is_numeric_dtype(column.dtype) or pd.api.types.is_bool_dtype(column.dtype):
+        Fail("got " + str(column.dtype))
+    if np.issubdtype(np.dtype(kind), np.integer):
+        if column.isna().any():
+            Fail("it has missing values")
+        limits = np.iinfo(kind)
+        if len(column) and (column.min() < limits.min or column.max() > limits.max):
+            Fail("its values don't fit")
+    return column.astype(kind)
+
+
+# Cast the frame's columns to the schema and check it has exactly the columns the schema lists, in the same order
+# Columns that are already the right type are passed through as they are, so a memory-mapped frame isn't copied
+def Enforce(frameName, frame):
+    columns = schema[frameName]
+    if list(frame.columns) != list(columns):
+        raise ValueError(frameName + " has columns " + str(list(frame.columns)) + ", expected " + str(list(columns)))
+    cast = {}
+    changed = False
+    for name, kind in columns.items():
+        column = frame[name]
+        cast[name] = _Column(frameName, name, column, kind)
+        changed = changed or cast[name] is not column
+    if not changed:
+        return frame
+    return pd.DataFrame(cast, index=frame.index, copy=False)
+
+
+# Enforce the schema on every frame it covers, the cleaned up source frames aren't part of it and are left alone
+def EnforceAll(frames):
+    return {name: Enforce(name, frame) if name in schema else frame for name, frame in frames.items()}
+
+
+# A float32 column as float64, with the values it was cast from as long as those had no more significant digits than a
+# float32 keeps, the shortest text that reads back as the same float32 is that value (11.5889, not 11.588899612426758)
+def Float64(column):
+    values = column.to_numpy().astype(str).astype(np.float64)
+    return pd.Series(values, index=column.index, name=column.name)
+
+
+# The map sizes of mapSizeFrame or MapComp as float64, the km^2 ones converted again from the kHu^2 ones as the build
+# did (their float32 copies are rounded)
+def MapSizes(frame):
+    kHu = Float64(frame["MapSize(kHu^2)"])
+    return pd.DataFrame({"MapSize(kHu^2)": kHu, "MapSize(km^2)": kHu / 27.5926}, index=frame.index)
@@ -0,0 +1,155 @@
+# Small column store used to cache the finished map dataset between runs
+# Each frame is written as one .npy file per column plus a meta.json describing how to put the frame back together
+# This keeps loading down to a handful of numpy reads instead of re-running the whole Excel + wiki pipeline
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+# Bump this whenever the on-disk layout changes, so old caches are ignored instead of misread
+storeVersion = 2
+
+# All cached datasets live under this folder (relative to src, same as the other data files)
+cacheRoot = "dataCache"
+
+# How many old cache folders to keep around after writing a new one
+keepCaches = 2
+
+# SQLite copy of some of the frames, written along with the columns so filters and aggregates can run in SQLite (QueryFrames)
+tablesFile = "frames.sqlite"
+
+
+# Work out a short content hash for the given files, so the cache is rebuilt only when one of them changes
+def HashFiles(paths, salt=""):
+    digest = hashlib.sha256()
+    digest.update(("store-" + str(storeVersion) + salt).encode("utf-8"))
+    for path in paths:
+        digest.update(os.path.basename(path).encode("utf-8"))
+        with open(path, "rb") as sourceFile:
+            for chunk in iter(lambda: sourceFile.read(1 << 20), b""):
+                digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+def CachePath(key):
+    return os.path.join(cacheRoot, key)
+
+
+# Write a single frame into its own folder, one file per column
+def _SaveFrame(frame, folder):
+    os.makedirs(folder)
+    columns = []
+    for position, name in enumerate(frame.columns):
+        column = frame[name]
+        fileName = "c" + str(position) + ".npy"
+        if column.dtype == object or isinstance(column.dtype, pd.CategoricalDtype):
+            # Text columns are dictionary encoded, the codes go to disk and the unique values go in the meta file
+            # Missing values get the code -1, and the codes use the same small int type pandas picks for categoricals
+            # That way a memory-mapped column can be wrapped in a Categorical without pandas copying the codes
+            # Columns that already were categoricals keep their categories (and come back as categoricals)
+            encoded = pd.Categorical(column)
+            np.save(os.path.join(folder, fileName), encoded.codes)
+            columns.append({"name": name, "file": fileName, "kind": "string" if column.dtype == object else "category",
+                            "values": encoded.categories.tolist()})
+        else:
+            np.save(os.path.join(folder, fileName), column.to_numpy())
+            columns.append({"name": name, "file": fileName, "kind": "array"})
+    np.save(os.path.join(folder, "index.npy"), frame.index.to_numpy())
+    with open(os.path.join(folder, "meta.json"), "w", encoding="utf-8") as metaFile:
+        json.dump({"columns": columns, "rows": len(frame.index)}, metaFile)
+
+
+# With mmap set, the columns are mapped read-only straight from the files instead of being read into memory
+# Text columns then stay as Categoricals over the mapped codes, since turning them back into Python strings would copy them
+def _LoadFrame(folder, mmap=False):
+    with open(os.path.join(folder, "meta.json"), "r", encoding="utf-8") as metaFile:
+        meta = json.load(metaFile)
+    mmapMode = "r" if mmap else None
+    data = {}
+    for column in meta["columns"]:
+        values = np.load(os.path.join(folder, column["file"]), mmap_mode=mmapMode)
+        if column["kind"] == "category":
+            values = pd.Categorical.from_codes(values, categories=column["values"], validate=False)
+        elif column["kind"] == "string":
+            if mmap:
+                values = pd.Categorical.from_codes(values, categories=column["values"], validate=False)
+            else:
+                # Turn the codes back into the original text, -1 codes become missing values again
+                lookup = np.array(column["values"] + [np.nan], dtype=object)
+                values = lookup[values]
+        data[column["name"]] = values
+    index = pd.Index(np.load(os.path.join(folder, "index.npy"), mmap_mode=mmapMode))
+    if index.equals(pd.RangeIndex(len(index))):
+        index = pd.RangeIndex(len(index))
+    # copy=False keeps every column in its own block, so pandas doesn't consolidate (and copy) the mapped arrays
+    return pd.DataFrame(data, index=index, columns=[column["name"] for column in meta["columns"]], copy=False)
+
+
+# Save every frame in the dictionary under the given key, the frames named in tables are also written to the SQLite copy
+# The files are written to a temporary folder first and then renamed, so a half written cache is never picked up
+def SaveFrames(frames, key, tables=()):
+    os.makedirs(cacheRoot, exist_ok=True)
+    target = CachePath(key)
+    if os.path.isdir(target):
+        return target
+    workFolder = tempfile.mkdtemp(prefix="." + key + "-", dir=cacheRoot)
+    try:
+        for name, frame in frames.items():
+            _SaveFrame(frame, os.path.join(workFolder, name))
+        with open(os.path.join(workFolder, "frames.json"), "w", encoding="utf-8") as listFile:
+            json.dump({"key": key, "frames": list(frames)}, listFile)
+        if tables:
+            connection = sqlite3.connect(os.path.join(workFolder, tablesFile))
+            try:
+                for name in tables:
+                    frames[name].to_sql(name, connection, index=False)
+                connection.commit()
+            finally:
+                connection.close()
+        try:
+            os.rename(workFolder, target)
+        except OSError:
+            # Another worker got there first, theirs is just as good as ours
+            shutil.rmtree(workFolder, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(workFolder, ignore_errors=True)
+        raise
+    PruneCaches(key)
+    return target
+
+
+# Load every frame saved under the key, or None if there is no finished cache for it yet
+def LoadFrames(key, mmap=False):
+    folder = CachePath(key)
+    listPath = os.path.join(folder, "frames.json")
+    if not os.path.isfile(listPath):
+        return None
+    with open(listPath, "r", encoding="utf-8") as listFile:
+        frameNames = json.load(listFile)["frames"]
+    return {name: _LoadFrame(os.path.join(folder, name), mmap=mmap) for name in frameNames}
+
+
+# Run a query on the SQLite copy of the frames saved under the key, only the result is read into pandas
+# Dates come back as text, bools as 0 and 1
+def QueryFrames(key, sql, params=()):
+    connection = sqlite3.connect("file:" + os.path.join(CachePath(key), tablesFile) + "?mode=ro", uri=True)
+    try:
+        return pd.read_sql_query(sql, connection, params=params)
+    finally:
+        connection.close()
+
+
+# Remove older cache folders so the cache doesn't keep growing with every data update
+def PruneCaches(currentKey):
+    if not os.path.isdir(cacheRoot):
+        return
+    folders = [entry for entry in os.scandir(cacheRoot)
+               if entry.is_dir() and not entry.name.startswith(".") and entry.name != currentKey]
+    folders.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+    for entry in folders[keepCaches - 1:]:
+        shutil.rmtree(entry.path, ignore_errors=True)
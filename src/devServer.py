@@ -0,0 +1,17 @@
+# Runs the site on Flask's development server, for working on it locally
+# Run from the src folder: python devServer.py --debug
+# The live site runs under gunicorn instead (see gunicorn.conf.py in the repo root), which never starts this server
+import argparse
+
+import chartData
+from app import app
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the site locally")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8050)
+    parser.add_argument("--debug", action="store_true", help="Reload on code changes and show Dash's dev tools")
+    args = parser.parse_args()
+    # Pick up new source data while running when TF2_RELOAD_INTERVAL is set, see chartData.py
+    chartData.StartRefresher()
+    app.run(host=args.host, port=args.port, debug=args.debug)
@@ -0,0 +1,132 @@
+# Download of the merged map list (mainData) as CSV, JSON Lines or Parquet, filtered the same way as the chart drop-downs
+#   /export/maps.csv?mode=Payload&year=2015&developers=Community%20Maps
+# mode, year and developers take the same values as the drop-downs (the "All ..." entries, or leaving one out, don't filter)
+# The rows are found through the mainData inverted index (see frameQuery.py) and written out a chunk at a time as the
+# response is sent, so neither the filtered frame nor the file is ever held in memory as a whole, the response goes out
+# with chunked transfer instead of a Content-Length
+# Parquet needs the pyarrow package, without it that format answers 501
+import io
+
+from flask import Response, abort, request, stream_with_context
+
+import chartData
+import dataSchema
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# Rows serialized per chunk of the response (and per row group of a Parquet file)
+chunkSize = 1000
+
+allModes = "All Game Modes"
+allYears = "All Years"
+allDevelopers = "All Maps"
+developerClasses = {"Valve Maps": "Valve", "Community Maps": "Community"}
+
+
+# The index filters asked for in the query string, a value that isn't one of the drop-down's gives a 400
+def _Filters(args):
+    filters = {}
+    mode = args.get("mode", allModes)
+    if mode != allModes:
+        filters["mode"] = mode
+    year = args.get("year", allYears)
+    if year != allYears:
+        try:
+            filters["year"] = int(year)
+        except ValueError:
+            abort(400, "year should be a year or " + allYears)
+    developers = args.get("developers", allDevelopers)
+    if developers != allDevelopers:
+        if developers not in developerClasses:
+            abort(400, "developers should be one of " + ", ".join([allDevelopers] + list(developerClasses)))
+        filters["developers"] = developerClasses[developers]
+    return filters
+
+
+# The matching rows of the frame, chunkSize at a time
+def _Chunks(frame, rows):
+    count = len(frame) if rows is None else len(rows)
+    for start in range(0, count, chunkSize):
+        if rows is None:
+            yield frame.iloc[start:start + chunkSize]
+        else:
+            yield frame.take(rows[start:start + chunkSize])
+
+
+def _Csv(frame, rows):
+    yield frame.iloc[:0].to_csv(index=False)
+    for chunk in _Chunks(frame, rows):
+        yield chunk.to_csv(header=False, index=False, date_format="%Y-%m-%d")
+
+
+def _JsonLines(frame, rows):
+    for chunk in _Chunks(frame, rows):
+        if len(chunk):
+            # The sizes as the sheet gives them, to_json would write out the float32 values' float64 noise
+            chunk = chunk.assign(**{"MapSize(kHu^2)": dataSchema.Float64(chunk["MapSize(kHu^2)"])})
+            yield chunk.to_json(orient="records", lines=True, date_format="iso")
+
+
+# File object the Parquet writer writes into, the bytes are taken back out after every row group
+class _Sink(io.RawIOBase):
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def Drain(self):
+        data = b"".join(self.parts)
+        self.parts = []
+        return data
+
+
+def _Parquet(frame, rows):
+    sink = _Sink()
+    schema = pyarrow.Schema.from_pandas(frame, preserve_index=False)
+    writer = pyarrow.parquet.ParquetWriter(sink, schema)
+    for chunk in _Chunks(frame, rows):
+        writer.write_table(pyarrow.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+        yield sink.Drain()
+    writer.close()
+    yield sink.Drain()
+
+
+# Serializer and mimetype of each format, by file extension
+formats = {
+    "csv": (_Csv, "text/csv"),
+    "jsonl": (_JsonLines, "application/x-ndjson"),
+    "parquet": (_Parquet, "application/vnd.apache.parquet")
+}
+
+
+# Add the export route to the Dash app's Flask server
+def Install(app):
+    @app.server.route("/export/maps.<fileType>")
+    def ExportMaps(fileType):
+        if fileType not in formats:
+            abort(404)
+        if fileType == "parquet" and pyarrow is None:
+            abort(501, "Parquet export needs the pyarrow package")
+        filters = _Filters(request.args)
+        data = chartData.Get()
+        rows = data.mainQuery.Rows(**filters)
+        Serialize, mimetype = formats[fileType]
+        response = Response(stream_with_context(Serialize(data.mainData, rows)), mimetype=mimetype)
+        response.headers["Content-Disposition"] = "attachment; filename=TF2Maps." + fileType
+        # Which dataset the file was cut from, so two downloads can be told apart
+        response.headers["X-Dataset-Version"] = str(data.version)
+        return response
@@ -0,0 +1,356 @@
+# Cache of finished chart figures, so a drop-down change is a lookup instead of a fresh plotly express build
+# Every chart callback is wrapped with Memoize, which registers the function that builds it and the drop-down options it takes
+# Figures are stored as serialized figure JSON (compacted, see figurePayload.py), keyed by chart name, drop-down values and the dataset version (a hash of its contents)
+# plus the code version (a hash of the files that build the figures), so after a deploy the shared stores don't hand out figures the old code built
+# Only drop-down values from the chart's option lists are cached, anything else a client posts is built but never stored
+# (otherwise every made-up value would add a figure to the store, and the disk and Redis stores have no size limit)
+# The dictionaries handed to Dash are also kept in each worker's memory (parsed once), so a hit costs no JSON parsing
+# Where they are stored is up to the store, set with TF2_FIGURE_STORE:
+# - memory (default), a least recently used cache inside each worker
+# - disk, files under figureStore shared by every worker on the box, with a memory cache in front of it
+# - redis, a Redis server (TF2_REDIS_URL, a local one by default) shared by every worker that can reach it, also with a memory cache in front
+import functools
+import hashlib
+import itertools
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+import figurePayload
+import metrics
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+# How many figures to keep before the least recently used ones get dropped (all current combinations come to 298)
+defaultSize = int(os.environ.get("TF2_FIGURE_CACHE_SIZE", "512"))
+
+# Set TF2_PREBUILD_FIGURES=1 to render every combination up front instead of on first use
+# Under gunicorn --preload this happens once in the master, and the workers inherit the finished cache
+prebuildFigures = os.environ.get("TF2_PREBUILD_FIGURES", "0") == "1"
+
+storeType = os.environ.get("TF2_FIGURE_STORE", "memory")
+# Folder for the disk store, relative to src like the other data files
+diskFolder = os.environ.get("TF2_FIGURE_STORE_PATH", "figureStore")
+redisUrl = os.environ.get("TF2_REDIS_URL", "redis://localhost:6379/0")
+# Figures in Redis expire after a week, a new dataset version never reads the old ones anyway
+redisExpiry = 7 * 24 * 3600
+
+# Every cache made, so their hit and miss counters can be reported together
+caches = []
+
+
+# Least recently used figures kept in the worker's own memory
+class MemoryStore:
+    def __init__(self, maxEntries=defaultSize):
+        self.maxEntries = maxEntries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def Get(self, version, key):
+        with self.lock:
+            payload = self.entries.get((version, key))
+            if payload is not None:
+                self.entries.move_to_end((version, key))
+            return payload
+
+    def Put(self, version, key, payload):
+        with self.lock:
+            self.entries[(version, key)] = payload
+            self.entries.move_to_end((version, key))
+            while len(self.entries) > self.maxEntries:
+                self.entries.popitem(last=False)
+
+    # Everything built from the old data is dropped
+    def SetVersion(self, version):
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+
+# Figures saved as files, one folder per dataset version, so every worker on the box builds each figure only once
+class DiskStore:
+    def __init__(self, folder=diskFolder):
+        self.folder = folder
+
+    def _Path(self, version, key):
+        return os.path.join(self.folder, str(version), key + ".json")
+
+    def Get(self, version, key):
+        try:
+            with open(self._Path(version, key), "r", encoding="utf-8") as figureFile:
+                return figureFile.read()
+        except FileNotFoundError:
+            return None
+
+    # Written to a temporary file first and then renamed, so another worker never reads half a figure
+    def Put(self, version, key, payload):
+        path = self._Path(version, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        handle, workPath = tempfile.mkstemp(prefix="." + key + "-", dir=os.path.dirname(path))
+        try:
+            with os.fdopen(handle, "w", encoding="utf-8") as figureFile:
+                figureFile.write(payload)
+            os.replace(workPath, path)
+        except BaseException:
+            os.remove(workPath)
+            raise
+
+    # Remove the folders of older dataset versions
+    def SetVersion(self, version):
+        if not os.path.isdir(self.folder):
+            return
+        for entry in os.scandir(self.folder):
+            if entry.is_dir() and entry.name != str(version):
+                shutil.rmtree(entry.path, ignore_errors=True)
+
+    def __len__(self):
+        if not os.path.isdir(self.folder):
+            return 0
+        return sum(len(files) for root, dirs, files in os.walk(self.folder))
+
+
+# Figures kept in Redis, needs the redis package and a running server
+# If the server can't be reached the figures are just built as if nothing was cached
+class RedisStore:
+    def __init__(self, url=redisUrl):
+        if redis is None:
+            raise ImportError("TF2_FIGURE_STORE=redis needs the redis package (pip install redis)")
+        self.client = redis.Redis.from_url(url)
+
+    def _Key(self, version, key):
+        return "tf2:figures:" + str(version) + ":" + key
+
+    def Get(self, version, key):
+        try:
+            payload = self.client.get(self._Key(version, key))
+        except redis.RedisError:
+            return None
+        return None if payload is None else payload.decode("utf-8")
+
+    def Put(self, version, key, payload):
+        try:
+            self.client.set(self._Key(version, key), payload.encode("utf-8"), ex=redisExpiry)
+        except redis.RedisError:
+            pass
+
+    # Keys carry the version, the old ones are left to expire
+    def SetVersion(self, version):
+        pass
+
+    def __len__(self):
+        try:
+            return sum(1 for _ in self.client.scan_iter("tf2:figures:*"))
+        except redis.RedisError:
+            return 0
+
+
+# A fast store in front of a shared one, figures found in the shared store are copied into the front one
+class LayeredStore:
+    def __init__(self, front, back):
+        self.front = front
+        self.back = back
+
+    def Get(self, version, key):
+        payload = self.front.Get(version, key)
+        if payload is None:
+            payload = self.back.Get(version, key)
+            if payload is not None:
+                self.front.Put(version, key, payload)
+        return payload
+
+    def Put(self, version, key, payload):
+        self.front.Put(version, key, payload)
+        self.back.Put(version, key, payload)
+
+    def SetVersion(self, version):
+        self.front.SetVersion(version)
+        self.back.SetVersion(version)
+
+    def __len__(self):
+        return len(self.back)
+
+
+# The store picked with TF2_FIGURE_STORE
+def MakeStore(kind=None, maxEntries=defaultSize):
+    kind = storeType if kind is None else kind
+    if kind == "memory":
+        return MemoryStore(maxEntries)
+    if kind == "disk":
+        return LayeredStore(MemoryStore(maxEntries), DiskStore())
+    if kind == "redis":
+        return LayeredStore(MemoryStore(maxEntries), RedisStore())
+    raise ValueError("Unknown figure store " + repr(kind) + ", expected memory, disk or redis")
+
+
+# Hash of the files that decide what a figure looks like, for the code version of a FigureCache
+def CodeVersion(paths):
+    digest = hashlib.sha1()
+    for path in paths:
+        with open(path, "rb") as codeFile:
+            digest.update(codeFile.read())
+    # The figures are written differently with TF2_COMPACT_FIGURES=0 too
+    return digest.hexdigest()[:12] + ("c" if figurePayload.compactFigures else "p")
+
+
+# load is called before a lookup while the version isn't known yet, it should load the data (which sets the version)
+# current, if given, says which version the data the builders will read belongs to, e.g. the snapshot a request pinned
+# while the cache itself has already moved on to a newer one, figures for an older version are built but never stored
+# code, if given, is the code version (see CodeVersion) the stores see along with the dataset version
+class FigureCache:
+    def __init__(self, version, store=None, load=None, current=None, code=None):
+        self.version = version
+        self.store = MakeStore() if store is None else store
+        self.load = load
+        self.current = current
+        self.code = code
+        self.builders = {}
+        # The figures Get read back, kept as dictionaries in the worker's own memory whatever the store is
+        self.figures = MemoryStore()
+        # Hits and misses per chart, a miss is a figure that had to be built
+        self.counts = {}
+        self.lock = threading.Lock()
+        caches.append(self)
+
+    # Tell the cache about a chart, optionLists holds the possible values of each of the chart's inputs in order
+    def Register(self, name, builder, optionLists):
+        self.builders[name] = (builder, optionLists)
+        self.counts[name] = {"hits": 0, "misses": 0}
+
+    # Decorator for a function that builds a figure, calling it afterwards goes through the cache
+    # The chart is registered under the function's name, the plain function is still there as .Build
+    def Memoize(self, optionLists, name=None):
+        def Wrap(builder):
+            chartName = builder.__name__ if name is None else name
+            self.Register(chartName, builder, optionLists)
+
+            @functools.wraps(builder)
+            def Cached(*args):
+                return self.Get(chartName, args)
+
+            Cached.Build = builder
+            return Cached
+        return Wrap
+
+    # Switch to a new dataset version, everything built from the old data is dropped
+    def SetVersion(self, version):
+        with self.lock:
+            if version != self.version:
+                self.version = version
+                self.store.SetVersion(self.StoreVersion(version))
+                self.figures.SetVersion(self.StoreVersion(version))
+
+    # The version the figures are stored under, the dataset version and the code version together
+    def StoreVersion(self, version):
+        return version if self.code is None else str(version) + "-" + self.code
+
+    # Whether args are drop-down values the chart offers, the only ones worth keeping a figure for
+    def Known(self, name, args):
+        optionLists = self.builders[name][1]
+        return len(args) == len(optionLists) and all(value in options for value, options in zip(args, optionLists))
+
+    # Short stable key for a chart and its inputs, the same in every worker
+    @staticmethod
+    def Key(name, args):
+        return name + "-" + hashlib.sha1(json.dumps(list(args), default=str).encode("utf-8")).hexdigest()[:16]
+
+    # The version of the data the builders will read, loading the data first if nothing is loaded yet
+    def _DataVersion(self):
+        if self.version is None and self.load is not None:
+            self.load()
+        return self.version if self.current is None else self.current()
+
+    def _Hit(self, name):
+        with self.lock:
+            self.counts[name]["hits"] += 1
+        metrics.figureLookups.Inc((name, "hit"))
+
+    # Serialized figure for the given inputs, building and storing it first if we don't have it yet
+    def GetJson(self, name, args):
+        key = self.Key(name, args)
+        version = self._DataVersion()
+        known = self.Known(name, args)
+        payload = self.store.Get(self.StoreVersion(version), key) if known else None
+        counts = self.counts[name]
+        if payload is not None:
+            self._Hit(name)
+            return payload
+        with self.lock:
+            counts["misses"] += 1
+        metrics.figureLookups.Inc((name, "miss" if known else "uncached"))
+        builder = self.builders[name][0]
+        # Build outside the lock, two requests racing for the same figure just build it twice
+        # The builders mark their data work with metrics.Phase("pandas"), the rest of the build is put down to plotly
+        startTime = time.perf_counter()
+        with metrics.Collect() as phases:
+            figure = builder(*args)
+        buildTime = time.perf_counter() - startTime
+        pandasTime = phases.get("pandas", 0)
+        metrics.Add("plotly", buildTime - pandasTime)
+        startTime = time.perf_counter()
+        payload = figurePayload.ToJson(figure)
+        jsonTime = time.perf_counter() - startTime
+        metrics.Add("json", jsonTime)
+        metrics.figureSeconds.Observe((name, "pandas"), pandasTime)
+        metrics.figureSeconds.Observe((name, "plotly"), buildTime - pandasTime)
+        metrics.figureSeconds.Observe((name, "json"), jsonTime)
+        # Don't store a figure built from data that was swapped out while we were building it
+        if known and version == self.version:
+            self.store.Put(self.StoreVersion(version), key, payload)
+        return payload
+
+    # What the callbacks return, a plain figure dictionary Dash can send as is
+    # The dictionary read back from the stored JSON is kept too, so a hit hands it out again without parsing anything
+    # (Dash only reads it to write the response, and so does everything else that gets a figure from here)
+    def Get(self, name, args):
+        key = self.Key(name, args)
+        version = self._DataVersion()
+        known = self.Known(name, args)
+        figure = self.figures.Get(self.StoreVersion(version), key) if known else None
+        if figure is not None:
+            self._Hit(name)
+            return figure
+        figure = figurePayload.FromJson(self.GetJson(name, args))
+        if known and version == self.version:
+            self.figures.Put(self.StoreVersion(version), key, figure)
+        return figure
+
+    # Every input combination of every registered chart
+    def Combinations(self):
+        for name, (builder, optionLists) in self.builders.items():
+            for args in itertools.product(*optionLists):
+                yield name, args
+
+    # Render every combination that isn't in the store yet, returns how many figures had to be built
+    def Prebuild(self):
+        built = 0
+        for name, args in self.Combinations():
+            misses = self.counts[name]["misses"]
+            self.GetJson(name, args)
+            built += self.counts[name]["misses"] - misses
+        return built
+
+    # Hit and miss counters per chart, plus how many figures the store holds
+    def Stats(self):
+        with self.lock:
+            charts = {name: dict(counts) for name, counts in self.counts.items()}
+        return {"version": self.version, "code": self.code, "store": type(self.store).__name__, "figures": len(self.store),
+                "hits": sum(counts["hits"] for counts in charts.values()),
+                "misses": sum(counts["misses"] for counts in charts.values()),
+                "charts": charts}
+
+    def __len__(self):
+        return len(self.store)
+
+
+# Counters of every cache, for the stats endpoint
+def Stats():
+    return [cache.Stats() for cache in caches]
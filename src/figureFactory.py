@@ -0,0 +1,144 @@
+# Plain figure dictionaries for the bar and pie charts, built the way plotly express lays them out but without going
+# through it
+# px.bar and px.pie reshape the data frame, look up the template and validate every property on every call, and each
+# update_layout / update_traces / for_each_trace afterwards validates again, which is most of the time a chart build takes
+# The figures here come out exactly as px writes them (the same JSON byte for byte, python -m benchmarks.figureFactory
+# checks every chart combination and times both), as dictionaries the figure cache serializes straight away
+# - the template is turned into a dictionary once and the same one goes into every figure, so nothing may change a
+#   figure's template in place (figurePayload.py makes a trimmed copy)
+# - layout and traces take the updates the charts used to make afterwards, applied the way plotly applies them
+#   (new properties in name order), so the property order and with it the JSON stays the same
+# Nothing is validated, set TF2_VALIDATE_FIGURES=1 while working on a chart to have each figure checked by plotly
+# Set TF2_FIGURE_FACTORY=0 to build the charts with plotly express again
+import copy
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import plotly.io as pio
+
+enabled = os.environ.get("TF2_FIGURE_FACTORY", "1") == "1"
+validateFigures = os.environ.get("TF2_VALIDATE_FIGURES", "0") == "1"
+
+_templates = {}
+_templateLock = threading.Lock()
+
+
+# The default template as a dictionary, the one plotly express would attach
+def Template():
+    name = pio.templates.default
+    template = _templates.get(name)
+    if template is None:
+        with _templateLock:
+            if name not in _templates:
+                _templates[name] = pio.templates[name].to_plotly_json()
+            template = _templates[name]
+    return template
+
+
+# Apply updates the way update_layout / update_traces do, objects are merged and anything new is added in name order
+def Update(target, updates):
+    for key in sorted(updates):
+        value = updates[key]
+        if isinstance(value, dict):
+            target[key] = Update(target[key] if isinstance(target.get(key), dict) else {}, value)
+        else:
+            target[key] = value
+    return target
+
+
+def _Finish(figure):
+    if validateFigures:
+        # plotly changes what it is given while checking it, so it gets a copy
+        go.Figure(copy.deepcopy(figure))
+    return figure
+
+
+# Row positions of each value of column, in the order the values first appear, the way px splits a frame into traces
+def _Groups(column):
+    codes, uniques = pd.factorize(column, sort=False)
+    return [(value, np.flatnonzero(codes == index)) for index, value in enumerate(uniques)]
+
+
+def _Axis(anchor, title):
+    return {"anchor": anchor, "domain": [0.0, 1.0], "title": {"text": title}}
+
+
+def _BarTrace(hovertemplate, group, color, orientation):
+    return {"alignmentgroup": "True", "hovertemplate": hovertemplate, "legendgroup": group,
+            "marker": {"color": color, "pattern": {"shape": ""}}, "name": group, "offsetgroup": group,
+            "orientation": orientation, "showlegend": True}
+
+
+# A figure without any traces (nothing left after the filters) has no legend title
+def _BarLayout(xaxis, yaxis, legendTitle, title):
+    legend = {"tracegroupgap": 0} if legendTitle is None else {"title": {"text": legendTitle}, "tracegroupgap": 0}
+    return {"template": Template(), "xaxis": xaxis, "yaxis": yaxis, "legend": legend, "title": {"text": title},
+            "barmode": "relative"}
+
+
+# px.bar(frame, x=x, y=y, color=color, color_discrete_map=colors, orientation=orientation, text=text, title=title)
+# names renames the legend entries (by the value's text), the way the charts did with for_each_trace
+def Bar(frame, x, y, color, colors, title, orientation="v", text=None, names=None, layout=None, traces=None):
+    names = {} if names is None else names
+    xValues = frame[x].to_numpy()
+    yValues = frame[y].to_numpy()
+    textValues = None if text is None else frame[text].to_numpy()
+    # Hover shows the color value as plain text, then the axes (y first on horizontal bars), then the text
+    # A column used for both the color and an axis is only shown once, as the axis
+    shown = [(y, "%{y}"), (x, "%{x}")] if orientation == "h" else [(x, "%{x}"), (y, "%{y}")]
+    if text is not None:
+        shown.append((text, "%{text}"))
+    groups = _Groups(frame[color])
+    data = []
+    for value, rows in groups:
+        group = names.get(str(value), str(value))
+        hover = [column + "=" + part for column, part in shown]
+        if color not in (x, y):
+            hover.insert(0, color + "=" + group)
+        trace = _BarTrace("<br>".join(hover) + "<extra></extra>", group, colors[value], orientation)
+        trace["offsetgroup"] = str(value)
+        if textValues is not None:
+            trace["text"] = textValues[rows]
+        trace.update({"textposition": "auto", "x": xValues[rows], "xaxis": "x", "y": yValues[rows], "yaxis": "y",
+                      "type": "bar"})
+        data.append(Update(trace, traces or {}))
+    xaxis = _Axis("y", x)
+    yaxis = _Axis("x", y)
+    # An axis showing the color column lists its categories in trace order, top down on the y axis
+    order = [value for value, rows in groups]
+    if color == x:
+        xaxis.update({"categoryorder": "array", "categoryarray": order})
+    elif color == y:
+        yaxis.update({"categoryorder": "array", "categoryarray": list(reversed(order))})
+    base = _BarLayout(xaxis, yaxis, color if data else None, title)
+    return _Finish({"data": data, "layout": Update(base, layout or {})})
+
+
+# px.bar(frame, x=x, y=columns, color_discrete_map=colors, title=title), a bar for each column at every x
+def WideBar(frame, x, columns, colors, title, layout=None, traces=None):
+    xValues = frame[x].to_numpy()
+    # All the columns in one array first, so they share a type the way they do when px stacks them into one column
+    values = frame[columns].to_numpy()
+    data = []
+    for index, column in enumerate(columns):
+        trace = _BarTrace("variable=" + column + "<br>" + x + "=%{x}<br>value=%{y}<extra></extra>", column,
+                          colors[column], "v")
+        trace.update({"textposition": "auto", "x": xValues, "xaxis": "x", "y": values[:, index], "yaxis": "y",
+                      "type": "bar"})
+        data.append(Update(trace, traces or {}))
+    layout = Update(_BarLayout(_Axis("y", x), _Axis("x", "value"), "variable", title), layout or {})
+    return _Finish({"data": data, "layout": layout})
+
+
+# px.pie(frame, values=values, names=names, color=names, color_discrete_map=colors, title=title)
+def Pie(frame, values, names, colors, title, layout=None, traces=None):
+    nameValues = frame[names].to_numpy()
+    trace = {"customdata": nameValues.reshape(-1, 1), "domain": {"x": [0.0, 1.0], "y": [0.0, 1.0]},
+             "hovertemplate": names + "=%{customdata[0]}<br>" + values + "=%{value}<extra></extra>",
+             "labels": nameValues, "legendgroup": "", "marker": {"colors": [colors[name] for name in nameValues]},
+             "name": "", "showlegend": True, "values": frame[values].to_numpy(), "type": "pie"}
+    base = {"template": Template(), "legend": {"tracegroupgap": 0}, "title": {"text": title}}
+    return _Finish({"data": [Update(trace, traces or {})], "layout": Update(base, layout or {})})
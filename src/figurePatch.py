@@ -0,0 +1,117 @@
+# Partial figure updates for the drop-downs that only change part of a chart
+# Switching the map size unit only swaps the size numbers and a few labels, and the developers drop-down of the map size
+# chart only changes which bars are shown, yet the callback used to send the whole figure again, template and all
+# Register() sets up a chart's Dash callback so that it can answer with a dash Patch that sets just the parts of the
+# figure those drop-downs change, and the browser keeps the rest
+# - The drop-down values the figure in the browser was built from are kept in a dcc.Store beside the graph (Store()),
+#   which every response sets along with the figure, and which the callback reads back as State
+#   A patch is only sent when those values differ from the new ones in patching drop-downs alone, every other drop-down
+#   has to be the same, otherwise (the first render, or another drop-down changed too) the whole figure is sent
+#   A response the browser never applies (it failed, or a newer request overtook it) doesn't set the store either, so
+#   the next request is compared with what the browser really shows and never patches a figure of a different state
+# - The fields the patching drop-downs can change are kept for every combination in a cache of their own (a FigureCache
+#   beside the chart's, as <chart>.patch), so a patch is a lookup of those fields alone, the whole figure is
+#   neither built nor read back for it (it is only read once, to fill in that combination's fields)
+# Paths are lists of keys from the top of the figure, "*" stands for every trace (or item of any list)
+# python -m benchmarks.figurePatches checks, for every combination and every state the browser can be in, that the
+# response turns the browser's figure into the figure of the new values, and compares the response sizes and times
+# Set TF2_PATCH_FIGURES=0 to always send whole figures
+import functools
+import os
+
+from dash import Output, Patch, State, callback, dcc
+
+import figurePayload
+
+patchFigures = os.environ.get("TF2_PATCH_FIGURES", "1") == "1"
+
+
+# Every (location, value) in figure the paths point at, with the "*" expanded to positions
+def Fields(figure, paths):
+    fields = []
+    for path in paths:
+        found = [([], figure)]
+        for key in path:
+            if key == "*":
+                found = [(location + [index], item) for location, value in found if isinstance(value, list)
+                         for index, item in enumerate(value)]
+            else:
+                found = [(location + [key], value[key]) for location, value in found
+                         if isinstance(value, dict) and key in value]
+        fields.extend(found)
+    return fields
+
+
+# Only the parts of value the paths point at, everything else left out (list items keep their positions)
+def Subset(value, paths):
+    if [] in paths:
+        return value
+    if isinstance(value, list):
+        rest = [path[1:] for path in paths if path[0] == "*"]
+        return [Subset(item, rest) for item in value] if rest else []
+    if isinstance(value, dict):
+        subset = {}
+        for key, item in value.items():
+            rest = [path[1:] for path in paths if path[0] == key]
+            # A path going further down than the figure does points at nothing
+            if rest and ([] in rest or isinstance(item, (list, dict))):
+                subset[key] = Subset(item, rest)
+        return subset
+    return value
+
+
+# The patch as Dash sends it, a plain dictionary rather than the Patch object, which Dash would write out through plotly's
+# slow path for objects it doesn't know (the browser only looks for the patch marker in the JSON, it is the same either way)
+# The assignments are written straight into it, going through Patch makes a new Patch object for every key on the way
+def Patched(figure, paths):
+    patch = Patch().to_plotly_json()
+    patch["operations"] = [{"operation": "Assign", "location": location, "params": {"value": value}}
+                           for location, value in Fields(figure, paths)]
+    return patch
+
+
+# The store beside a patched graph, holding the drop-down values of the figure it shows
+def StoreId(graph):
+    return graph + "Shown"
+
+
+def Store(graph):
+    return dcc.Store(id=StoreId(graph))
+
+
+# The ids of the inputs whose values differ from the shown ones, None when there is nothing to compare with
+def Changed(inputIds, shown, args):
+    if not isinstance(shown, list) or len(shown) != len(args):
+        return None
+    return [inputId for inputId, old, new in zip(inputIds, shown, args) if old != new]
+
+
+# The callback for a chart, patching when only drop-downs in paths (component id -> paths) changed since the shown figure
+# cache is the chart's figure cache, patches the cache the patched fields are kept in
+def Partial(cache, patches, chart, inputIds, paths):
+    name = chart.__name__
+    patchName = name + ".patch"
+    allPaths = [path for inputPaths in paths.values() for path in inputPaths]
+    # A combination's fields are cut out of its cached figure, read back the way the callback would send it
+    patches.Register(patchName, lambda *args: Subset(figurePayload.FromJson(cache.GetJson(name, args)), allPaths),
+                     cache.builders[name][1])
+
+    @functools.wraps(chart)
+    def Callback(*values):
+        args, shown = list(values[:-1]), values[-1]
+        changed = Changed(inputIds, shown, args)
+        if patchFigures and changed and all(inputId in paths for inputId in changed):
+            fieldPaths = []
+            for inputId in changed:
+                fieldPaths.extend(path for path in paths[inputId] if path not in fieldPaths)
+            return Patched(patches.Get(patchName, tuple(args)), fieldPaths), args
+        return chart(*args), args
+
+    return Callback
+
+
+# Register the Dash callback of a chart that can be patched, its graph needs a Store(graph) beside it in the layout
+def Register(cache, patches, chart, graph, inputs, paths):
+    inputIds = [item.component_id for item in inputs]
+    callback([Output(graph, "figure"), Output(StoreId(graph), "data")], inputs, State(StoreId(graph), "data"))(
+        Partial(cache, patches, chart, inputIds, paths))
@@ -0,0 +1,153 @@
+# Compact JSON for the chart figures, used for the figure cache (so for every callback response) and the static export
+# plotly writes a figure out as plain JSON, every number in every trace spelled out in decimal and the whole template plotly
+# express attaches to each figure, styles for every trace type there is, repeated in every response
+# - Numeric arrays in the traces are sent as plotly.js typed arrays, {"dtype": "u2", "bdata": <base64 of the raw values>},
+#   which plotly.js (2.28 and up, Dash 2.17 ships 2.32) reads straight into a typed array
+#   Whole numbers get the smallest integer type that holds them all, anything else stays a 64 bit float, so no value changes
+#   Short arrays are left as lists, below minimumLength the base64 wrapper is bigger than the numbers
+# - Only the template styles for the trace types in the figure are kept, along with the template layout settings the
+#   figure doesn't set itself
+# - The JSON is written with orjson (through plotly, which picks it up when it's installed), and read back with it
+# Set TF2_COMPACT_FIGURES=0 to send the figures the way plotly writes them
+# Expand() turns the typed arrays back into lists, for anything on the Python side that reads the figures
+# The payload sizes and serialization times before and after are compared by python -m benchmarks.figurePayloads
+import base64
+import json
+import os
+import re
+
+import numpy as np
+import plotly.io.json
+from plotly.io.json import to_json_plotly
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+compactFigures = os.environ.get("TF2_COMPACT_FIGURES", "1") == "1"
+minimumLength = 8
+
+if orjson is not None:
+    plotly.io.json.config.default_engine = "orjson"
+
+# Typed array types plotly.js knows, smallest first, always little endian (the byte order of every browser's platform)
+integerTypes = [("u1", np.dtype("<u1")), ("i1", np.dtype("<i1")), ("u2", np.dtype("<u2")), ("i2", np.dtype("<i2")),
+                ("u4", np.dtype("<u4")), ("i4", np.dtype("<i4"))]
+floatType = ("f8", np.dtype("<f8"))
+typesByCode = dict(integerTypes + [floatType])
+
+
+def _Encode(values, code, numpyType):
+    return {"dtype": code, "bdata": base64.b64encode(values.astype(numpyType).tobytes()).decode("ascii")}
+
+
+# The typed array for a one dimensional array of numbers
+def TypedArray(values):
+    wholeNumbers = values.dtype.kind in "iu"
+    if values.dtype.kind == "f":
+        wholeNumbers = bool(np.isfinite(values).all() and (values == np.trunc(values)).all())
+    if wholeNumbers and len(values) > 0:
+        low, high = values.min(), values.max()
+        for code, numpyType in integerTypes:
+            limits = np.iinfo(numpyType)
+            if limits.min <= low and high <= limits.max:
+                return _Encode(values, code, numpyType)
+    return _Encode(values, *floatType)
+
+
+# values as a numpy array if it is a long enough list or array of plain numbers, otherwise None
+def _Numbers(value):
+    if isinstance(value, np.ndarray):
+        if value.ndim != 1 or len(value) < minimumLength:
+            return None
+        if value.dtype.kind in "iuf":
+            return value
+        if value.dtype.kind != "O":
+            return None
+        value = value.tolist()
+    if not isinstance(value, (list, tuple)) or len(value) < minimumLength:
+        return None
+    for item in value:
+        # bool counts as an int to Python, but plotly treats True and False differently from 1 and 0
+        if isinstance(item, (bool, np.bool_)) or not isinstance(item, (int, float, np.integer, np.floating)):
+            return None
+    try:
+        return np.asarray(value, dtype=np.float64 if any(isinstance(item, (float, np.floating)) for item in value)
+                          else np.int64)
+    except OverflowError:
+        return None
+
+
+# A copy of a trace (or part of one) with its numeric arrays as typed arrays
+def _CompactValue(value):
+    if isinstance(value, dict):
+        return {key: _CompactValue(item) for key, item in value.items()}
+    numbers = _Numbers(value)
+    if numbers is not None:
+        return TypedArray(numbers)
+    return value
+
+
+# What of the template layout the figure's own layout leaves showing
+# A setting the layout has itself replaces the template's, settings that are objects (fonts, axes) are merged one level
+# down at a time, template lists of objects (annotations, shapes) are items added to the figure so they are always kept
+def _TemplateLayout(template, layout):
+    kept = {}
+    for key, value in template.items():
+        if key not in layout or (isinstance(value, list) and value and isinstance(value[0], dict)):
+            kept[key] = value
+        elif isinstance(value, dict) and isinstance(layout[key], dict):
+            inner = _TemplateLayout(value, layout[key])
+            if inner:
+                kept[key] = inner
+    return kept
+
+
+def _Template(template, traceTypes, layout):
+    compact = {}
+    if "data" in template:
+        compact["data"] = {kind: styles for kind, styles in template["data"].items() if kind in traceTypes}
+    if "layout" in template:
+        # The template's xaxis styles every x axis (xaxis2 and on too), so with more than one it is kept whole
+        numbered = {re.sub(r"\d+$", "", key) for key in layout if re.search(r"\d$", key)}
+        own = {key: value for key, value in layout.items() if key != "template" and key not in numbered}
+        compact["layout"] = _TemplateLayout(template["layout"], own)
+    return compact
+
+
+# The figure as a plain dictionary, with typed arrays and the template trimmed down
+def Compact(figure):
+    if hasattr(figure, "to_plotly_json"):
+        figure = figure.to_plotly_json()
+    traces = [_CompactValue(trace) for trace in figure.get("data", [])]
+    layout = dict(figure.get("layout", {}))
+    if isinstance(layout.get("template"), dict):
+        layout["template"] = _Template(layout["template"], {trace.get("type", "scatter") for trace in traces}, layout)
+    return dict(figure, data=traces, layout=layout)
+
+
+# Serialized figure, compact unless turned off
+def ToJson(figure):
+    return to_json_plotly(Compact(figure) if compactFigures else figure)
+
+
+def FromJson(payload):
+    return orjson.loads(payload) if orjson is not None else json.loads(payload)
+
+
+# The typed array as a list of numbers again
+def Decode(spec):
+    values = np.frombuffer(base64.b64decode(spec["bdata"]), dtype=typesByCode[spec["dtype"]])
+    return values.tolist()
+
+
+# A copy of a figure (or any part of one) with every typed array turned back into a list
+def Expand(value):
+    if isinstance(value, dict):
+        if set(value) == {"dtype", "bdata"} and value["dtype"] in typesByCode:
+            return Decode(value)
+        return {key: Expand(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [Expand(item) for item in value]
+    return value
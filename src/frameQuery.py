@@ -0,0 +1,95 @@
+# Filtered views of the chart frames without copying them first, resolved through inverted indexes
+# The chart callbacks used to copy a whole frame on every request and then filter the copy with boolean masks, which
+# scans every row (and with TF2_DATA_MMAP pulls the shared pages into the worker's private memory) just to keep a few of them
+# When the dataset is built, every frame the charts filter gets an inverted index (BuildPostings): for each value of each
+# filter column, the sorted positions of the rows holding it, saved in the dataset cache along with the frames
+# A FrameQuery loads that index, and Select() takes only the matching rows (with no filters it gives back the frame itself)
+# With several filters the shortest row list is checked against each of the others, so the cost depends on how many rows
+# match rather than on how many rows the frame has
+# Values found on lots of rows are checked through a bitmap (one bit per row of the frame), the rest with a binary search of
+# their row list, which keeps the bitmaps no bigger than the row lists they stand in for
+# The frames handed out are shared between requests, so callbacks must not change them in place
+import numpy as np
+import pandas as pd
+
+
+# Index values are stored as text, years end up the same whether they were stored as ints or as floats
+def _Label(value):
+    if isinstance(value, (float, np.floating)) and float(value).is_integer():
+        return str(int(value))
+    return str(value)
+
+
+# Inverted index of a frame as a frame of its own, one row per (filter, value, row position), sorted by all three
+# keys maps a filter name to the values to filter on, one per row (a column of the frame or something worked out from it)
+# Missing values aren't indexed, the same way a comparison never matches them
+def BuildPostings(keys):
+    dimensions = []
+    labels = []
+    rows = []
+    for name, values in keys.items():
+        values = np.asarray(values)
+        positions = pd.Series(np.arange(len(values), dtype=np.int32))
+        for value, valueRows in sorted(positions.groupby(values).indices.items(), key=lambda item: _Label(item[0])):
+            dimensions.append(np.full(len(valueRows), name, dtype=object))
+            labels.append(np.full(len(valueRows), _Label(value), dtype=object))
+            rows.append(valueRows.astype(np.int32))
+    if not rows:
+        return pd.DataFrame({"dimension": [], "value": [], "row": np.empty(0, dtype=np.int32)})
+    return pd.DataFrame({"dimension": np.concatenate(dimensions), "value": np.concatenate(labels),
+                         "row": np.concatenate(rows)})
+
+
+class FrameQuery:
+    # postings is the frame's inverted index, as made by BuildPostings
+    def __init__(self, frame, postings):
+        self.frame = frame
+        self.rows = {}
+        self.bitmaps = {}
+        dimensions = np.asarray(postings["dimension"], dtype=object)
+        labels = np.asarray(postings["value"], dtype=object)
+        rows = postings["row"].to_numpy()
+        # Each (filter, value) pair is one run of rows, split them into views of the row array
+        starts = np.flatnonzero(np.r_[True, (dimensions[1:] != dimensions[:-1]) | (labels[1:] != labels[:-1])])
+        stops = np.r_[starts[1:], len(rows)]
+        for start, stop in zip(starts, stops):
+            valueRows = rows[start:stop]
+            self.rows.setdefault(dimensions[start], {})[labels[start]] = valueRows
+            if len(valueRows) * 32 >= len(frame):
+                mask = np.zeros(len(frame), dtype=bool)
+                mask[valueRows] = True
+                self.bitmaps[(dimensions[start], labels[start])] = np.packbits(mask, bitorder="little")
+
+    # Positions of the rows matching every filter, or None when there are no filters (every row)
+    def Rows(self, **filters):
+        matches = []
+        for name, value in filters.items():
+            label = _Label(value)
+            valueRows = self.rows[name].get(label)
+            if valueRows is None:
+                return np.empty(0, dtype=np.int32)
+            matches.append((len(valueRows), name, label, valueRows))
+        if not matches:
+            return None
+        # Start from the filter with the fewest rows and keep the ones every other filter has too
+        matches.sort(key=lambda match: match[0])
+        matched = matches[0][3]
+        for count, name, label, valueRows in matches[1:]:
+            bitmap = self.bitmaps.get((name, label))
+            if bitmap is not None:
+                matched = matched[((bitmap[matched >> 3] >> (matched & 7)) & 1).astype(bool)]
+            else:
+                found = np.minimum(np.searchsorted(valueRows, matched), len(valueRows) - 1)
+                matched = matched[valueRows[found] == matched]
+        return matched
+
+    def Count(self, **filters):
+        rows = self.Rows(**filters)
+        return len(self.frame) if rows is None else len(rows)
+
+    # The matching rows, with the same index labels and in the same order a boolean mask would give
+    def Select(self, **filters):
+        rows = self.Rows(**filters)
+        if rows is None:
+            return self.frame
+        return self.frame.take(rows)
@@ -0,0 +1,380 @@
+# Builds the map dataset used by the charts page
+# This used to run at the top of pages/charts.py on every import, it now lives here so the finished frames can be cached
+# Run this file directly (python mapData.py from the src folder) to build the cache ahead of time
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+# For getting data from websites, so they can be put into a dataframe
+from bs4 import BeautifulSoup
+
+import dataSchema
+import dataStore
+import frameQuery
+import metrics
+import sourceStore
+import tableExtract
+
+# Where the raw data comes from
+# The map sheets are read through sourceStore, from the Excel workbook or its SQLite copy (TF2_DATA_SOURCE)
+# The source is picked again every time (see Source()), with TF2_DATA_SOURCE=auto an edited workbook is newer than the
+# SQLite copy and takes over from it, so the dataset key changes and a running refresher picks the edit up
+# Set source to use that one instead (the benchmarks do, to read another workbook)
+source = None
+wikiPath = "wikiHtmlText.txt"
+# Holiday event pages saved by wikiSync.py, these only exist once a sync has been run
+eventPages = {"Halloween": "wikiSnapshots/Halloween_map.html", "Christmas": "wikiSnapshots/Christmas_map.html"}
+
+# Bump this when the steps below change in a way that changes the output, so existing caches get rebuilt
+etlVersion = 7
+
+# The frames that make up the finished dataset, these are what the chart callbacks read from
+frameNames = ["mainData", "MapPerYearData", "gameModeData", "mapSizeFrame", "EventFrame", "MapComp"]
+# Cleaned up copies of the sources, kept in the cache so a wiki sync can update the dataset without a full rebuild
+sourceFrameNames = ["excelData", "wikiData", "eventData"]
+# Inverted indexes of the frames the charts filter on (see IndexFrames), each named after its frame with Index on the end
+indexFrameNames = ["mainDataIndex", "MapPerYearDataIndex", "gameModeDataIndex", "EventFrameIndex", "MapCompIndex"]
+
+# Set TF2_DATA_MMAP=1 to have every worker memory-map the cached columns instead of reading them into private memory
+# The cache files are read-only and shared through the page cache, so each extra worker only pays for what it changes
+useMmap = os.environ.get("TF2_DATA_MMAP", "0") == "1"
+
+
+# The data source to read the map sheets from
+def Source():
+    return sourceStore.Open() if source is None else source
+
+
+# Stage 1, read the sheets we need out of the data source and tidy them up
+def ReadSource():
+    # Import each sheet into its own frame
+    # The water sheet isn't used by any of the charts yet, so we skip reading it
+    tables = Source().ReadTables(["MainMapData", "EventMapList"])
+    origData = tables["MainMapData"]
+    eventData = tables["EventMapList"]
+
+    # print(origData.head())
+    # print(origData.info())
+
+    # Set the NativeNavmesh column to be a boolean and change the values as needed
+    # origData["NativeNavmesh"].replace("Yes", "True", inplace=True) # While this still works, Pandas is apparently trying to phase this out, use below method instead
+    origData["NativeNavmesh"] = origData["NativeNavmesh"].replace("Yes", True)
+    origData["NativeNavmesh"] = origData["NativeNavmesh"].replace("No", False)
+    # print(origData["NativeNavmesh"].head())
+    origData["NativeNavmesh"] = origData["NativeNavmesh"].astype(bool)
+    # print(origData["NativeNavmesh"].info())
+
+    # Realized that I kept a space in the column Map Name, so lets go ahead and remove that space for ease of use later
+    origData.rename(columns={"Map Name": "MapName"}, inplace=True)
+    return origData, eventData
+
+
+# The wiki lists the maps that shipped with the game as "Launch" instead of a date, those get the day TF2 came out
+launchDate = "October 10, 2007"
+# Every other entry is the name of the update that added the map, e.g. "July 12, 2023 Patch"
+dateAddedFormat = "%B %d, %Y"
+
+
+# Turn the wiki's "Date added" text into dates, for the whole column at once
+# Anything that still isn't a date in the format above is reported along with its map (labels, usually the file names)
+# With errors="raise" (the default) that stops the build, with errors="coerce" it is only printed and the date left empty
+def ParseDateAdded(dates, labels=None, errors="raise"):
+    cleaned = dates.str.replace(r"\s*Patch\s*$", "", regex=True).str.strip()
+    cleaned = cleaned.mask(cleaned == "Launch", launchDate)
+    parsed = pd.to_datetime(cleaned, format=dateAddedFormat, errors="coerce")
+    failed = parsed.isna() & dates.notna()
+    if failed.any():
+        labels = dates.index.to_series() if labels is None else labels
+        problems = ", ".join(str(label) + " (" + repr(value) + ")"
+                             for label, value in zip(labels[failed], dates[failed]))
+        message = str(int(failed.sum())) + " Date added value(s) could not be read: " + problems
+        if errors == "raise":
+            raise ValueError(message)
+        print(message)
+    return parsed
+
+
+# Stage 2, pull the map table out of the List_of_maps page and clean it up
+def ParseWikiTable(urlData):
+    # With the Excel sheet completed, now we shall extract the same data, but this time via web scraping
+    # urlData = requests.get("https://wiki.teamfortress.com/wiki/List_of_maps").text
+    # (wikiSync.py is what fetches the page now, this just gets the saved copy)
+
+    # print(urlData)
+    # mapSoup = BeautifulSoup(urlData, "html.parser")
+    # print(mapSoup)
+
+    # To avoid issues where the site is down, we will save the results of urlData to a text file and use this in future cases
+    # In other words, once this finishes, this will stay commented
+    # urlRawText = open("wikiHtmlText.txt", "w", encoding="utf-8")
+    # urlRawText.write(str(mapSoup))
+    # urlRawText.close()
+
+    # Get the table we need
+    # Page has 3 tables, table we need has the following class on the table object: wikitable sortable grid jquery-tablesorter
+    # Looking at the raw soup output, the class is actually just wikitable sortable grid
+    # This used to go through BeautifulSoup to find the table and then pd.read_html to parse it a second time
+    # soupTable = mapSoup.find("table", class_="wikitable sortable grid")
+    # soupFrame = pd.read_html(StringIO(str(soupTable)))[0]
+    # tableExtract reads the table straight out of the page in one pass and gives back the same frame
+    soupFrame = tableExtract.ReadTable(urlData, "wikitable sortable grid")
+    # Remove the extra column it added
+    soupFrame.drop(columns="Unnamed: 0", inplace=True)
+    # Rename the developers column to remove the ()
+    soupFrame.rename(columns={"Developer(s)": "Developers"}, inplace=True)
+
+    # Date Added is stored as an object data type, we need to change this
+    # This used to swap Launch for the launch date, strip the word Patch from every row in a Python loop and then
+    # leave it to astype to guess the date format, ParseDateAdded does all of that on the whole column at once
+    soupFrame["Date added"] = ParseDateAdded(soupFrame["Date added"], soupFrame["File name"])
+
+    # print(soupFrame.info())
+    # print(soupFrame.head())
+    return soupFrame
+
+
+# Stage 3, merge the sheet with the wiki table
+def MergeFrames(origData, soupFrame):
+    # To minimize the chance of there being a spelling mistake or incorrect data, we will append the Mapsize and Navmesh columns from the Excel sheet to the web dataframe, making a new main dataset to work with
+    # mainData = pd.concat([soupFrame, origData[["MapSize(kHu^2)", "NativeNavmesh"]]], axis=1)
+    # mainData = origData.set_index("MapFileName").join(soupFrame.set_index("File name"))
+    mainData = origData.merge(soupFrame, left_on="MapFileName", right_on="File name")
+
+    # To test and make sure the values are properly set and not out of order, show a specific section of the table
+    # print(mainData[mainData["Game mode"].isin(["Control Point"])])
+
+    # Merge worked, but now we have duplicate columns, so we need to remove that
+    # We'll remove the text and date columns from the origData set and then re-arrange the rest to be in a semi-logical fashion
+    # print(list(mainData.columns.values))
+    mainData.drop(columns=['MapName', "MapFileName", "GameMode", "DateAdded(MM/DD/YYYY)", "Developers_x"], inplace=True)
+    mainData.rename(columns={"Developers_y": "Developers"}, inplace=True)
+    mainData = mainData[["Map", "File name", "Game mode", "Date added", "Developers", "MapSize(kHu^2)", "NativeNavmesh"]]
+    # print(mainData.head())
+    # print(mainData.info())
+    return mainData
+
+
+# Stage 4, everything the charts read, worked out from the merged data and the event list
+def DeriveFrames(mainData, eventData):
+    # Every frame below has the same rows as mainData, so which maps Valve made is only worked out once
+    valveMade = mainData["Developers"].str.contains("Valve", na=False)
+
+    # Maps per year chart (question 2), the year is all we need from the date and the Community flag splits the bars
+    MapPerYearData = mainData[["Map", "Game mode", "Date added", "Developers"]].copy()
+    MapPerYearData["Date added"] = MapPerYearData["Date added"].dt.year
+    MapPerYearData["Community"] = True
+    MapPerYearData.loc[valveMade, "Community"] = False
+
+    # Game mode pie chart (question 3)
+    gameModeData = mainData[["Game mode", "Developers"]].copy()
+    gameModeData["Community"] = True
+    # TempFrame["Community"].loc[TempFrame["Developers"].str.contains("Valve", na=False)] = True #Works but throws a few errors in the console
+    gameModeData.loc[valveMade, "Community"] = False
+    gameModeData.rename(columns={"Game mode": "GameMode"}, inplace=True)
+
+    # Map size per game mode charts (question 4)
+    # We will need the map name, game mode, developers, and map size (in both hammer units and in a normal unit of measure)
+    mapSizeFrame = mainData[["Map", "Game mode", "Developers", "MapSize(kHu^2)"]].copy()
+    # Change the column name for Game mode to use no spaces
+    mapSizeFrame = mapSizeFrame.rename(columns={"Game mode": "GameMode"})
+    # Add a column to quickly tell if a map is community made or not
+    mapSizeFrame["Community"] = True
+    mapSizeFrame.loc[valveMade, "Community"] = False
+    # Add a column that converts the map size in hammer units to km
+    # First before we can do any calculations, we need to take care of the null values found here
+    # For the sake of ease, given how maps vary in size from game modes, we will opt to remove these maps for now
+    mapSizeFrame.dropna(inplace=True)
+    # According to the pastebin link left in Uncle Dane's video, the conversion rate appears to be Hu^2 / 27.5926 = km^2
+    mapSizeFrame["MapSize(km^2)"] = mapSizeFrame["MapSize(kHu^2)"] / 27.5926
+
+    # The holiday chart (question 5) joins the main data with the event sheet, based on the map name
+    # First we need to rename the column in event data to match with the column name in the main data sheet
+    eventData = eventData.rename(columns={"MapName": "Map"})
+    # Create a new frame that is a merge between the both
+    EventFrame = pd.merge(mainData, eventData, how="left", on="Map")
+    # Drop the columns we don't need and fill in the null values
+    EventFrame.drop(["File name", "MapSize(kHu^2)", "NativeNavmesh", "OriginalMap", "Developers"], axis=1, inplace=True)
+    EventFrame["Event"] = EventFrame["Event"].fillna("None")
+    EventFrame = EventFrame.dropna()
+
+    # The map size comparison chart (question 6) keeps the maps without a valid size, so those are set to 0 instead of dropped
+    MapComp = mainData[["Map", "Game mode", "Developers", "MapSize(kHu^2)"]].copy()
+    # replace all null values in the map size list with 0
+    MapComp["MapSize(kHu^2)"] = MapComp["MapSize(kHu^2)"].fillna(0)
+    MapComp["Community"] = "#5885A2"
+    MapComp.loc[valveMade, "Community"] = "#B8383B"
+    MapComp["MapSize(km^2)"] = MapComp["MapSize(kHu^2)"] / 27.5926
+
+    frames = {"mainData": mainData, "MapPerYearData": MapPerYearData, "gameModeData": gameModeData,
+              "mapSizeFrame": mapSizeFrame, "EventFrame": EventFrame, "MapComp": MapComp}
+    frames.update(IndexFrames(frames))
+    # Compact column types (categoricals, float32 sizes, ...) from here on, see dataSchema.py
+    return dataSchema.EnforceAll(frames)
+
+
+# Inverted indexes for the drop-down filters of the charts: game mode, year, holiday event and developer class
+# Developer classes use the same names as the map size statistics (Valve or Community), taken from the Community
+# columns worked out above instead of searching the developer names again
+def IndexFrames(frames):
+    def DeveloperClass(community):
+        return np.where(community, "Community", "Valve")
+
+    mainData = frames["mainData"]
+    MapPerYearData = frames["MapPerYearData"]
+    gameModeData = frames["gameModeData"]
+    EventFrame = frames["EventFrame"]
+    MapComp = frames["MapComp"]
+    keys = {
+        # MapComp has a row for every map in mainData, in the same order
+        "mainData": {"mode": mainData["Game mode"], "year": mainData["Date added"].dt.year,
+                     "developers": DeveloperClass(MapComp["Community"].to_numpy() != "#B8383B")},
+        "MapPerYearData": {"mode": MapPerYearData["Game mode"], "year": MapPerYearData["Date added"],
+                           "developers": DeveloperClass(MapPerYearData["Community"])},
+        "gameModeData": {"mode": gameModeData["GameMode"], "developers": DeveloperClass(gameModeData["Community"])},
+        "EventFrame": {"mode": EventFrame["Game mode"], "year": EventFrame["Date added"].dt.year,
+                       "event": EventFrame["Event"]},
+        "MapComp": {"mode": MapComp["Game mode"], "developers": DeveloperClass(MapComp["Community"] != "#B8383B")}
+    }
+    return {name + "Index": frameQuery.BuildPostings(frameKeys) for name, frameKeys in keys.items()}
+
+
+# Maps listed on a holiday event page of the wiki
+# We don't rely on the exact layout of those pages, instead we take the linked name at the start of every wikitable row
+# and keep the ones that are actual maps from the map list (knownMaps), which filters out everything else on the page
+def ParseEventPage(pageHtml, knownMaps):
+    knownMaps = set(knownMaps)
+    found = []
+    for table in BeautifulSoup(pageHtml, "html.parser").find_all("table", class_="wikitable"):
+        for row in table.find_all("tr"):
+            cell = row.find(["td", "th"])
+            link = cell.find("a") if cell is not None else None
+            if link is None:
+                continue
+            for name in (link.get("title"), link.get_text(" ", strip=True)):
+                if name in knownMaps and name not in found:
+                    found.append(name)
+                    break
+    return found
+
+
+# Add maps from a holiday event page that the event sheet doesn't know about yet
+# Maps that already have an event keep it, a map listed twice would otherwise show up twice in the holiday chart
+def AddEventMaps(eventData, event, mapNames):
+    missing = [name for name in mapNames if name not in set(eventData["MapName"])]
+    if not missing:
+        return eventData
+    newRows = pd.DataFrame({"MapName": missing, "OriginalMap": np.nan, "Event": event})
+    return pd.concat([eventData, newRows], ignore_index=True)
+
+
+# Saved holiday event pages (written by wikiSync.py) are applied on top of the event sheet
+def ApplyEventPages(eventData, knownMaps):
+    for event, path in eventPages.items():
+        if os.path.isfile(path):
+            with open(path, "r", encoding="utf-8") as pageFile:
+                eventData = AddEventMaps(eventData, event, ParseEventPage(pageFile.read(), knownMaps))
+    return eventData
+
+
+# Run the whole pipeline from the raw files
+# Along with the chart frames, the cleaned up sources are kept too (excelData, wikiData and eventData)
+# so that wikiSync.py can apply a changed wiki page without going back to the Excel workbook
+# Each stage is timed into the ETL metrics (see metrics.py)
+def BuildFrames():
+    with metrics.Timed(metrics.etlSeconds, ("read source",)):
+        origData, eventData = ReadSource()
+    # Since we saved the contents of the html file to a text file, we will load those now
+    with metrics.Timed(metrics.etlSeconds, ("parse wiki table",)):
+        with open(wikiPath, "r", encoding="utf-8") as urlRawText:
+            soupFrame = ParseWikiTable(urlRawText.read())
+    with metrics.Timed(metrics.etlSeconds, ("event pages",)):
+        eventData = ApplyEventPages(eventData, soupFrame["Map"])
+    with metrics.Timed(metrics.etlSeconds, ("merge",)):
+        mainData = MergeFrames(origData, soupFrame)
+    with metrics.Timed(metrics.etlSeconds, ("derive frames",)):
+        frames = DeriveFrames(mainData, eventData)
+    frames.update({"excelData": origData, "wikiData": soupFrame, "eventData": eventData})
+    return frames
+
+
+# Size columns used for the map size statistics, along with the suffix their results get in the chart frames
+sizeColumns = {"MapSize(kHu^2)": "", "MapSize(km^2)": "K"}
+developerClasses = ["All", "Valve", "Community"]
+
+
+# Map size statistics per game mode, for all maps and split into Valve and community maps, in both units
+# Instead of filtering the frame once per game mode and statistic, every row is labelled with its developer class once
+# (plus a copy of every row labelled "All") and a single groupby works out every statistic for every group together
+# stats can hold any pandas groupby aggregation name (mean, min, max, median, count, ...) and percentiles written as p90
+# Gives back one frame per statistic, laid out the way the map size chart expects them, with empty groups set to 0
+def SizeStats(frame, stats, gameModes):
+    developerClass = pd.Categorical(frame["Community"].map({True: "Community", False: "Valve"}),
+                                    categories=developerClasses)
+    # In float64, from the sizes the sheet gives (see dataSchema.MapSizes)
+    sizes = dataSchema.MapSizes(frame)[list(sizeColumns)]
+    longFrame = pd.concat([sizes.assign(GameMode=frame["GameMode"], DeveloperClass=developerClass),
+                           sizes.assign(GameMode=frame["GameMode"],
+                                        DeveloperClass=pd.Categorical(["All"] * len(frame.index),
+                                                                      categories=developerClasses))],
+                          ignore_index=True)
+    grouped = longFrame.groupby(["GameMode", "DeveloperClass"], observed=False, sort=False)
+
+    percentiles = {stat: float(stat[1:]) / 100 for stat in stats if stat.startswith("p") and stat[1:].isdigit()}
+    plainStats = [stat for stat in stats if stat not in percentiles]
+    results = {}
+    if plainStats:
+        aggregated = grouped.agg(plainStats)
+        for stat in plainStats:
+            results[stat] = aggregated.xs(stat, axis=1, level=1)
+    if percentiles:
+        quantiles = grouped.quantile(list(percentiles.values()))
+        for stat, fraction in percentiles.items():
+            results[stat] = quantiles.xs(fraction, level=2)
+
+    # Spread each statistic out into the wide layout (one row per game mode) used by the charts
+    frames = {}
+    for stat in stats:
+        wide = pd.DataFrame({"GameMode": gameModes})
+        values = results[stat]
+        for column, suffix in sizeColumns.items():
+            table = values[column].unstack("DeveloperClass")
+            table = table.reindex(index=gameModes, columns=developerClasses)
+            for developer in developerClasses:
+                wide[developer + "MapsSize" + suffix] = table[developer].to_numpy()
+        frames[stat] = wide.fillna(0)
+    return frames
+
+
+# The cache key is a hash of the raw data files and this file itself, so any change to either means a rebuild
+def DatasetKey():
+    sourcePaths = Source().Paths() + [wikiPath] + [path for path in eventPages.values() if os.path.isfile(path)]
+    return dataStore.HashFiles(sourcePaths + [__file__], salt="-etl-" + str(etlVersion))
+
+
+# Load the finished frames from the cache, building (and caching) them first if the source data has changed
+# Returns the frames along with the key they were stored under, which doubles as the dataset version
+def LoadFrames(mmap=None):
+    if mmap is None:
+        mmap = useMmap
+    key = DatasetKey()
+    with metrics.Timed(metrics.etlSeconds, ("load cache",)):
+        frames = dataStore.LoadFrames(key, mmap=mmap)
+    if frames is None:
+        frames = BuildFrames()
+        with metrics.Timed(metrics.etlSeconds, ("save cache",)):
+            dataStore.SaveFrames(frames, key, tables=frameNames)
+        if mmap:
+            # Re-open what we just wrote, so this process maps the same files as everyone else
+            frames = dataStore.LoadFrames(key, mmap=True)
+    # Check every column is still the type the charts expect, this doesn't copy columns that already are
+    return dataSchema.EnforceAll(frames), key
+
+
+# Build step, used by the deploy so workers start up with the cache already in place
+if __name__ == "__main__":
+    startTime = time.perf_counter()
+    builtKey = DatasetKey()
+    dataStore.SaveFrames(BuildFrames(), builtKey, tables=frameNames)
+    print("Built dataset " + builtKey + " in " + "{:.2f}".format(time.perf_counter() - startTime) + "s")
@@ -0,0 +1,224 @@
+# Timing and size metrics for the chart callbacks and the data pipeline, served on /metrics in the Prometheus text format
+# - tf2_callback_seconds / tf2_callback_response_bytes: every Dash callback request, by output, as the server sent it
+#   (so a callback answered from the response cache counts too, and the size is after compression)
+# - tf2_figure_build_seconds: where the time of a figure build went, by chart and phase
+#   pandas is the time spent in the chart's Phase("pandas") blocks (filtering and grouping the data), plotly is the rest of
+#   the build (plotly express and the figure updates) and json is serializing the finished figure
+# - tf2_etl_stage_seconds: each stage of the data pipeline in mapData.py, and loading the data for the charts
+# - the figure cache and callback response cache hits and misses
+# Everything is kept in plain counters behind a lock, recording a value is a binary search and a few additions, so it is
+# left on all the time (TF2_METRICS=0 turns it off)
+# Each worker keeps its own numbers, so with several gunicorn workers a scrape sees whichever worker answered it
+# Set TF2_SERVER_TIMING=1 to also send a Server-Timing header with the pandas / plotly / json split of each callback request,
+# which the browser's developer tools show in the request's timing tab
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import request
+
+enabled = os.environ.get("TF2_METRICS", "1") == "1"
+serverTiming = os.environ.get("TF2_SERVER_TIMING", "0") == "1"
+
+latencyBuckets = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+sizeBuckets = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+callbackPath = "/_dash-update-component"
+
+
+def _Escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _Labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(name + '="' + _Escape(value) + '"' for name, value in pairs) + "}"
+
+
+def _Number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    def __init__(self, name, description, labelNames, buckets):
+        self.name = name
+        self.description = description
+        self.labelNames = labelNames
+        self.buckets = buckets
+        # Label values -> [count per bucket (the last one past the largest bucket), sum, count]
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def Observe(self, labels, value):
+        if not enabled:
+            return
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def Lines(self):
+        yield "# HELP " + self.name + " " + self.description
+        yield "# TYPE " + self.name + " histogram"
+        with self.lock:
+            series = [(labels, list(counts), total, count) for labels, (counts, total, count) in self.series.items()]
+        for labels, counts, total, count in sorted(series):
+            cumulative = 0
+            for bucket, bucketCount in zip(self.buckets + ("+Inf",), counts):
+                cumulative += bucketCount
+                yield (self.name + "_bucket" + _Labels(self.labelNames, labels, [("le", bucket)]) + " "
+                       + str(cumulative))
+            yield self.name + "_sum" + _Labels(self.labelNames, labels) + " " + _Number(total)
+            yield self.name + "_count" + _Labels(self.labelNames, labels) + " " + str(count)
+
+
+class Counter:
+    def __init__(self, name, description, labelNames):
+        self.name = name
+        self.description = description
+        self.labelNames = labelNames
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def Inc(self, labels, amount=1):
+        if not enabled:
+            return
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def Lines(self):
+        yield "# HELP " + self.name + " " + self.description
+        yield "# TYPE " + self.name + " counter"
+        with self.lock:
+            values = sorted(self.values.items())
+        for labels, value in values:
+            yield self.name + _Labels(self.labelNames, labels) + " " + _Number(value)
+
+
+callbackSeconds = Histogram("tf2_callback_seconds", "Time to answer a Dash callback request", ("output",),
+                            latencyBuckets)
+callbackBytes = Histogram("tf2_callback_response_bytes", "Size of a Dash callback response as sent", ("output",),
+                          sizeBuckets)
+callbackCache = Counter("tf2_callback_cache_total", "Callback requests answered from the response cache or not",
+                        ("result",))
+figureSeconds = Histogram("tf2_figure_build_seconds", "Time spent building a chart figure, by phase",
+                          ("chart", "phase"), latencyBuckets)
+figureLookups = Counter("tf2_figure_cache_total",
+                        "Figure cache lookups, uncached for drop-down values the chart doesn't offer", ("chart", "result"))
+etlSeconds = Histogram("tf2_etl_stage_seconds", "Time taken by each stage of the data pipeline", ("stage",),
+                       latencyBuckets)
+registry = [callbackSeconds, callbackBytes, callbackCache, figureSeconds, figureLookups, etlSeconds]
+
+
+# Phase times are added to every collection open on the thread, the request's own (for Server-Timing) and any
+# Collect() around them, e.g. a figure build
+_local = threading.local()
+
+
+def _Open():
+    if not hasattr(_local, "open"):
+        _local.open = []
+    return _local.open
+
+
+# Stop adding to a collection (compared by identity, two collections holding the same times are still different ones)
+def _Close(phases):
+    _local.open = [openPhases for openPhases in _Open() if openPhases is not phases]
+
+
+def Add(name, seconds):
+    for phases in _Open():
+        phases[name] = phases.get(name, 0) + seconds
+
+
+# Time a block of code as part of the named phase
+@contextmanager
+def Phase(name):
+    if not enabled:
+        yield
+        return
+    startTime = time.perf_counter()
+    try:
+        yield
+    finally:
+        Add(name, time.perf_counter() - startTime)
+
+
+# Gather the phase times of everything run inside the block, the dictionary it gives is filled in as they finish
+@contextmanager
+def Collect():
+    phases = {}
+    _Open().append(phases)
+    try:
+        yield phases
+    finally:
+        _Close(phases)
+
+
+# Time a block of code into a histogram
+@contextmanager
+def Timed(histogram, labels):
+    startTime = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.Observe(labels, time.perf_counter() - startTime)
+
+
+def Render():
+    return "\n".join(line for metric in registry for line in metric.Lines()) + "\n"
+
+
+# Hook the callback timing into the Dash app's Flask server and add the /metrics route
+# This has to be installed before responseLayer, so the timing starts before a cached answer can be sent and the size is
+# read after the response has been compressed
+def Install(app):
+    if not enabled:
+        return
+    server = app.server
+
+    @server.before_request
+    def StartTiming():
+        if request.path == callbackPath:
+            # Anything still open here was left behind by a request that failed part way, so it is dropped
+            phases = {}
+            _local.open = [phases]
+            request.environ["tf2.metrics"] = (time.perf_counter(), phases)
+
+    @server.after_request
+    def RecordTiming(response):
+        started = request.environ.pop("tf2.metrics", None)
+        if started is None:
+            return response
+        startTime, phases = started
+        _Close(phases)
+        elapsed = time.perf_counter() - startTime
+        body = request.get_json(silent=True, cache=True)
+        output = body.get("output") if isinstance(body, dict) else None
+        # The label is only ever one of the app's own callback outputs, anything else a client sends goes under unknown
+        # (every made-up output would otherwise be a new series kept forever)
+        if not isinstance(output, str) or output not in app.callback_map:
+            output = "unknown"
+        callbackSeconds.Observe((output,), elapsed)
+        if not response.is_streamed:
+            callbackBytes.Observe((output,), response.calculate_content_length() or 0)
+        cacheResult = response.headers.get("X-Callback-Cache")
+        if cacheResult is not None:
+            callbackCache.Inc((cacheResult,))
+        if serverTiming:
+            parts = [name + ";dur=" + "{:.2f}".format(seconds * 1000) for name, seconds in sorted(phases.items())]
+            parts.append("total;dur=" + "{:.2f}".format(elapsed * 1000))
+            response.headers["Server-Timing"] = ", ".join(parts)
+        return response
+
+    @server.route("/metrics")
+    def Metrics():
+        return server.response_class(Render(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -1,17 +1,24 @@
 # Add Needed Libraries
 # For creating and managing datasets
+import json
+import os
+
 import numpy as np
 import pandas as pd
 
-# For getting data from websites, so they can be put into a dataframe
-from bs4 import BeautifulSoup
-import requests
-from io import StringIO
-
 import dash
-from dash import Dash, dcc, html, Input, Output, callback
-import plotly.graph_objects as go
+from dash import dcc, html, Input, Output, State, callback, clientside_callback, ClientsideFunction
 import plotly.express as px
+from plotly.io.json import to_json_plotly
+
+import chartData
+import dataSchema
+import figureCache
+import figureFactory
+import figurePatch
+import figurePayload
+import frameQuery
+import metrics
 
 dash.register_page(__name__, path='/')
 
@@ -21,88 +28,29 @@ pd.options.display.max_columns = None
 pd.set_option('display.max_rows', 3000)
 pd.set_option('display.max_columns', 3000)
 
-# Import Excel sheet into dataframe, separating each sheet into its own frame
-excelFile = pd.ExcelFile(r"dataSource/TF2MapData.xlsx")
-origData = pd.read_excel(excelFile, "MainMapData")
-waterData = pd.read_excel(excelFile, "WaterMapData")
-eventData = pd.read_excel(excelFile, "EventMapList")
-
-# print(origData.head())
-# print(origData.info())
-
-# Set the NativeNavmesh column to be a boolean and change the values as needed
-# origData["NativeNavmesh"].replace("Yes", "True", inplace=True) # While this still works, Pandas is apparently trying to phase this out, use below method instead
-origData["NativeNavmesh"] = origData["NativeNavmesh"].replace("Yes", True)
-origData["NativeNavmesh"] = origData["NativeNavmesh"].replace("No", False)
-# print(origData["NativeNavmesh"].head())
-origData["NativeNavmesh"] = origData["NativeNavmesh"].astype(bool)
-# print(origData["NativeNavmesh"].info())
-
-# Realized that I kept a space in the column Map Name, so lets go ahead and remove that space for ease of use later
-origData.rename(columns={"Map Name": "MapName"}, inplace=True)
-
-# With the Excel sheet completed, now we shall extract the same data, but this time via web scraping
-# urlData = requests.get("https://wiki.teamfortress.com/wiki/List_of_maps").text
-
-# Since we saved the contents of the html file to a text file, we will load those now
-urlRawText = open("wikiHtmlText.txt", "r", encoding="utf-8")
-urlData = urlRawText
-
-# print(urlData)
-mapSoup = BeautifulSoup(urlData, "html.parser")
-# print(mapSoup)
-
-# To avoid issues where the site is down, we will save the results of urlData to a text file and use this in future cases
-# In other words, once this finishes, this will stay commented
-# urlRawText = open("wikiHtmlText.txt", "w", encoding="utf-8")
-# urlRawText.write(str(mapSoup))
-# urlRawText.close()
-
-# Get the table we need
-# Page has 3 tables, table we need has the following class on the table object: wikitable sortable grid jquery-tablesorter
-# Looking at the raw soup output, the class is actually just wikitable sortable grid
-# soupTable = mapSoup.find("table", {"class" : "wikitable sortable grid jquery-tablesorter"})
-soupTable = mapSoup.find("table", class_="wikitable sortable grid")
-# print(soupTable)
-# print(type(soupTable))
-
-# Convert the soup into a dataframe
-soupFrame = pd.read_html(StringIO(str(soupTable)))[
-    0]  # On its own, this command will give a deprecation warning, so we need to add and use StringIO to this as well
-# Remove the extra column it added
-soupFrame.drop(columns="Unnamed: 0", inplace=True)
-# Rename the developers column to remove the ()
-soupFrame.rename(columns={"Developer(s)": "Developers"}, inplace=True)
-
-# Date Added is stored as an object data type, we need to change this
-# First we need to change all instance of Launch to the actual launch date (October 10, 2007)
-soupFrame["Date added"] = soupFrame["Date added"].replace("Launch", "October 10, 2007")
-# We also need to remove the word patch from each row
-for x in soupFrame.index:
-    # soupFrame["Date added"][x] = soupFrame["Date added"][x].replace("Patch", "")  # works but throws a warning error
-    soupFrame.loc[x, "Date added"] = soupFrame.loc[x, "Date added"].replace("Patch", "")
-
-# Now we convert the column to the date data type
-soupFrame["Date added"] = soupFrame["Date added"].astype('datetime64[ns]')
-# print(soupFrame.info())
-# print(soupFrame.head())
-
-# To minimize the chance of there being a spelling mistake or incorrect data, we will append the Mapsize and Navmesh columns from the Excel sheet to the web dataframe, making a new main dataset to work with
-# mainData = pd.concat([soupFrame, origData[["MapSize(kHu^2)", "NativeNavmesh"]]], axis=1)
-# mainData = origData.set_index("MapFileName").join(soupFrame.set_index("File name"))
-mainData = origData.merge(soupFrame, left_on="MapFileName", right_on="File name")
-
-# To test and make sure the values are properly set and not out of order, show a specific section of the table
-# print(mainData[mainData["Game mode"].isin(["Control Point"])])
-
-# Merge worked, but now we have duplicate columns, so we need to remove that
-# We'll remove the text and date columns from the origData set and then re-arrange the rest to be in a semi-logical fashion
-# print(list(mainData.columns.values))
-mainData.drop(columns=['MapName', "MapFileName", "GameMode", "DateAdded(MM/DD/YYYY)", "Developers_x"], inplace=True)
-mainData.rename(columns={"Developers_y": "Developers"}, inplace=True)
-mainData = mainData[["Map", "File name", "Game mode", "Date added", "Developers", "MapSize(kHu^2)", "NativeNavmesh"]]
-# print(mainData.head())
-# print(mainData.info())
+# The finished dataset
+# The Excel sheets and the wiki table are merged in mapData.py, which caches the result
+# It isn't loaded here though, chartData.Get() loads it the first time the page or one of its charts is asked for
+# so starting the app (which imports every page) doesn't cost anything for workers that only serve the other pages
+
+# Finished figures are cached per drop-down combination, tied to the dataset version they were built from
+# The version is only known once the data is loaded, the cache is moved over to it from there
+# (a lookup before that loads the data first, otherwise the figure would be built from data with no version to store it under)
+# A request still on an older snapshot after a reload builds its figures from that snapshot, they just aren't stored
+# The code that builds the figures is part of the version too, the disk and Redis stores outlive a deploy
+figureCode = [__file__, chartData.__file__, dataSchema.__file__, frameQuery.__file__, figureFactory.__file__,
+              figurePayload.__file__]
+figures = figureCache.FigureCache(None, load=chartData.Warm, current=chartData.Version,
+                                  code=figureCache.CodeVersion(figureCode))
+chartData.OnLoad(lambda data: figures.SetVersion(data.version))
+# The parts of the figures a drop-down change can patch, cached the same way, see figurePatch.py
+patches = figureCache.FigureCache(None, load=chartData.Warm, current=chartData.Version, code=figures.code)
+chartData.OnLoad(lambda data: patches.SetVersion(data.version))
+
+# Set TF2_CLIENTSIDE_CHARTS=1 to filter the maps per year, holiday and map size charts in the browser (assets/clientCharts.js)
+# The page then ships a small copy of the data once, and changing those drop-downs never reaches the server
+useClientside = os.environ.get("TF2_CLIENTSIDE_CHARTS", "0") == "1"
+
 
 
 # With the data nice and set up now, we can actually begin the analysis process
@@ -114,10 +62,7 @@ mainData = mainData[["Map", "File name", "Game mode", "Date added", "Developers"
 # valveMaps = mainData[mainData["Developers"].isin(["Valve", "Valve Bad Robot Escalation Studios"])]  # Works, but hard-coded way of going about this
 # s = df.stack().str.contains('<',na=False)
 # output_indices = s[s].index
-valveMaps = mainData[mainData["Developers"].str.contains("Valve", na=False)]
-valveMaps = valveMaps.reset_index()
-communityMaps = mainData[~mainData["Developers"].str.contains("Valve", na=False)]
-communityMaps = communityMaps.reset_index()
+# valveMaps and communityMaps are made in chartData.py when the data is loaded
 
 # print("Since the launch of the game Valve has created " + str(len(valveMaps.index)) + " maps while the community has created " + str(len(communityMaps.index)) + " maps (Not including maps that have yet to be added in a official capacity)")
 # print("Meaning that out of the current 183 maps, valve has made " + "{:.2f}".format(len(valveMaps.index) / len(mainData.index) * 100) + "% of the total maps, while the community made " + "{:.2f}".format(len(communityMaps.index) / len(mainData.index) * 100) + "% of the total maps")
@@ -139,23 +84,30 @@ communityMaps = communityMaps.reset_index()
 # ax[0, 0].set(title="% Of Maps Made By Valve And The Community")
 
 # Creating the chart in plotly since that is what I'll be making the dashboard on
-# First store the data for the chart
-totalCountData = {"MapCount": [str(len(valveMaps.index)), str(len(communityMaps.index))],
-                  "Type": ["Valve Maps", "Community Maps"]}
-totalMapFrame = pd.DataFrame(data=totalCountData)
-# print(totalMapFrame.head())
-
-# Then make the chart itself
-chart1 = px.pie(totalMapFrame,
-                values="MapCount",
-                names="Type",
-                title="% of Maps Made by the Community and Valve",
-                color="Type",
-                color_discrete_map={"Valve Maps": "#B8383B", "Community Maps": "#5885A2"})
-chart1.update_traces(textposition="inside", textinfo="percent+label")
-# chart1.update_layout({"plot_bgcolor": "rgba(51, 51, 51, 255)", "plot_bgcolor": "rgba(51, 51, 51, 255)"})
-chart1.update_layout(paper_bgcolor="rgba(0,0,0,0)", font=dict(color="white"), font_family="TF2")
-# chart1.show()
+# This chart has no drop-downs, but it is built the same way as the others so it waits for the data to be loaded too
+@figures.Memoize([])
+def TotalMapGraph():
+    with metrics.Phase("pandas"):
+        data = chartData.Get()
+        # First store the data for the chart
+        totalCountData = {"MapCount": [len(data.valveMaps.index), len(data.communityMaps.index)],
+                          "Type": ["Valve Maps", "Community Maps"]}
+        totalMapFrame = pd.DataFrame(data=totalCountData)
+        # print(totalMapFrame.head())
+
+    # Then make the chart itself
+    chart1 = px.pie(totalMapFrame,
+                    values="MapCount",
+                    names="Type",
+                    title="% of Maps Made by the Community and Valve",
+                    color="Type",
+                    color_discrete_map={"Valve Maps": "#B8383B", "Community Maps": "#5885A2"})
+    chart1.update_traces(textposition="inside", textinfo="percent+label")
+    # chart1.update_layout({"plot_bgcolor": "rgba(51, 51, 51, 255)", "plot_bgcolor": "rgba(51, 51, 51, 255)"})
+    chart1.update_layout(paper_bgcolor="rgba(0,0,0,0)", font=dict(color="white"), font_family="TF2")
+    # chart1.show()
+    return chart1
+
 
 
 # Question 2: how many maps were added per year? How many of those maps are community made
@@ -245,11 +197,7 @@ chart1.update_layout(paper_bgcolor="rgba(0,0,0,0)", font=dict(color="white"), fo
 
 # Wanted to create a newer version of this chart using what I have learned from later charts, with the goal of allowing the user to filter this chart by game mode
 # Will still keep the process of this older chart here, for documentation and in case I mess up really badly
-# Get the data we need
-MapPerYearData = mainData[["Map", "Game mode", "Date added", "Developers"]].copy()
-MapPerYearData["Date added"] = MapPerYearData["Date added"].dt.year
-MapPerYearData["Community"] = True
-MapPerYearData.loc[MapPerYearData["Developers"].str.contains("Valve", na=False), "Community"] = False
+# The data we need (MapPerYearData) is built in mapData.py with the rest of the dataset
 
 # This will be moved to the callback section, so we can freely tamper with it
 # GroupedData = MapPerYearData.copy()
@@ -284,11 +232,7 @@ MapPerYearData.loc[MapPerYearData["Developers"].str.contains("Valve", na=False),
 # For this chart, we'll attempt to make it using Plotly and Dash
 
 # For the sake of testing, I'll also be making a chart in locally just to make sure I have the logic down
-gameModeData = mainData[["Game mode", "Developers"]].copy()
-gameModeData["Community"] = True
-# TempFrame["Community"].loc[TempFrame["Developers"].str.contains("Valve", na=False)] = True #Works but throws a few errors in the console
-gameModeData.loc[gameModeData["Developers"].str.contains("Valve", na=False), "Community"] = False
-gameModeData.rename(columns={"Game mode": "GameMode"}, inplace=True)
+# gameModeData is built in mapData.py with the rest of the dataset
 # print(gameModeData.head())
 # print([gameModeData[gameModeData.Community == True].shape[0], gameModeData[gameModeData.Community == False].shape[0]])
 # Valve has 4 ctf maps while comm has 11 maps (15)
@@ -325,18 +269,7 @@ gameModeData.rename(columns={"Game mode": "GameMode"}, inplace=True)
 
 # First grab the data we require
 # We will need the map name, game mode, developers, and map size (in both hammer units and in a normal unit of measure)
-mapSizeFrame = mainData[["Map", "Game mode", "Developers", "MapSize(kHu^2)"]].copy()
-# Change the column name for Game mode to use no spaces
-mapSizeFrame = mapSizeFrame.rename(columns={"Game mode": "GameMode"})
-# Add a column to quickly tell if a map is community made or not
-mapSizeFrame["Community"] = True
-mapSizeFrame.loc[gameModeData["Developers"].str.contains("Valve", na=False), "Community"] = False
-# Add a column that converts the map size in hammer units to km
-# First before we can do any calculations, we need to take care of the null values found here
-# For the sake of ease, given how maps vary in size from game modes, we will opt to remove these maps for now
-mapSizeFrame.dropna(inplace=True)
-# According to the pastebin link left in Uncle Dane's video, the conversion rate appears to be Hu^2 / 27.5926 = km^2
-mapSizeFrame["MapSize(km^2)"] = mapSizeFrame["MapSize(kHu^2)"] / 27.5926
+# mapSizeFrame is built in mapData.py with the rest of the dataset, maps without a valid size are already removed there
 # print(mapSizeFrame.head())
 # print(mapSizeFrame.info())
 # print(mapSizeFrame["MapSize(kHu^2)"].mean())
@@ -347,14 +280,7 @@ mapSizeFrame["MapSize(km^2)"] = mapSizeFrame["MapSize(kHu^2)"] / 27.5926
 # Chart will be a grouped bar chart, with the game modes on the x-axis, and the average map size on the y-axis
 # We will create a new data frame to store all the values into
 # This new frame will have the different game modes at the primary key, with the other 3 columns being the average, max value, and min value
-# First we will get a list of all game modes to check
-gameModeList = mapSizeFrame["GameMode"]
-gameModeList.drop_duplicates(inplace=True)
-# There are a few game modes that don't really matter here (Mainly the training mode and test maps), so for the sake of making the chart easier to read, we shall remove them
-gameModeList = gameModeList[gameModeList != "Test"]
-gameModeList = gameModeList[gameModeList != "Training Mode"]
-# gameModeList = gameModeList.reset_index()
-gameModeList = gameModeList.to_numpy()
+# First we will get a list of all game modes to check (gameModeList, made in chartData.py without the test and training modes)
 # print(gameModeList)
 
 # To test to make sure we have the proper method down, print out a few average values, start with getting all maps of a game mode, then start filtering by developers
@@ -362,120 +288,11 @@ gameModeList = gameModeList.to_numpy()
 # print(mapSizeFrame["MapSize(kHu^2)"].loc[(mapSizeFrame["GameMode"] == "Capture the Flag") & (~mapSizeFrame["Developers"].str.contains("Valve", na=False))].mean())  # Average size of all community of this game mode
 # print(mapSizeFrame["MapSize(kHu^2)"].loc[(mapSizeFrame["GameMode"] == "Capture the Flag") & (mapSizeFrame["Developers"].str.contains("Valve", na=False))].mean())  # Average size of all valve of this game mode
 
-# Initialize the row names for the dataframe
-GameModeName = []
-AllMap = []
-ValveMap = []
-CommMap = []
-AllMapK = []
-ValveMapK = []
-CommMapK = []
-
-# Loop through game modes calculating the average size of all maps per game mode
-for x in gameModeList:
-    # gameMode = gameModeList[x]
-    # print(gameModeList[x])
-    GameModeName.append(x)
-    AllMap.append(mapSizeFrame["MapSize(kHu^2)"].loc[mapSizeFrame["GameMode"] == x].mean())
-    ValveMap.append(mapSizeFrame["MapSize(kHu^2)"].loc[(mapSizeFrame["GameMode"] == x) & (
-        mapSizeFrame["Developers"].str.contains("Valve", na=False))].mean())
-    CommMap.append(mapSizeFrame["MapSize(kHu^2)"].loc[(mapSizeFrame["GameMode"] == x) & (
-        ~mapSizeFrame["Developers"].str.contains("Valve", na=False))].mean())
-    AllMapK.append(mapSizeFrame["MapSize(km^2)"].loc[mapSizeFrame["GameMode"] == x].mean())
-    ValveMapK.append(mapSizeFrame["MapSize(km^2)"].loc[(mapSizeFrame["GameMode"] == x) & (
-        mapSizeFrame["Developers"].str.contains("Valve", na=False))].mean())
-    CommMapK.append(mapSizeFrame["MapSize(km^2)"].loc[(mapSizeFrame["GameMode"] == x) & (
-        ~mapSizeFrame["Developers"].str.contains("Valve", na=False))].mean())
-    # Note that if there are no developers of a type in a game mode (I.E. no community MVM maps have been added), the value will be nan, we will need to address that before making the chart
-
-# Store the results in a dictionary, that way we can easily add them to a dataframe
-GameModeDictionary = {"GameMode": GameModeName,
-                      "AllMapsSize": AllMap,
-                      "ValveMapsSize": ValveMap,
-                      "CommunityMapsSize": CommMap,
-                      "AllMapsSizeK": AllMapK,
-                      "ValveMapsSizeK": ValveMapK,
-                      "CommunityMapsSizeK": CommMapK}
-# Create and clean the dataframe, removing all null values and replacing them with 0s
-MapAverageFrame = pd.DataFrame(GameModeDictionary)
-MapAverageFrame = MapAverageFrame.fillna(0)
+# All three frames (MapAverageFrame, MapMinFrame and MapMaxFrame) come out of one grouped pass over mapSizeFrame in chartData.py
+# Each has the game modes as rows and the all / Valve / community sizes in both units as columns
+# Note that if there are no developers of a type in a game mode (I.E. no community MVM maps have been added), the value is set to 0
 # print(MapAverageFrame)
-
-# Repeat the process again, creating new dataframes for the max and min values
-# Reset the list values
-GameModeName = []
-AllMap = []
-ValveMap = []
-CommMap = []
-AllMapK = []
-ValveMapK = []
-CommMapK = []
-
-# Starting with the min values
-for x in gameModeList:
-    # gameMode = gameModeList[x]
-    # print(gameModeList[x])
-    GameModeName.append(x)
-    AllMap.append(mapSizeFrame["MapSize(kHu^2)"].loc[mapSizeFrame["GameMode"] == x].min())
-    ValveMap.append(mapSizeFrame["MapSize(kHu^2)"].loc[(mapSizeFrame["GameMode"] == x) & (
-        mapSizeFrame["Developers"].str.contains("Valve", na=False))].min())
-    CommMap.append(mapSizeFrame["MapSize(kHu^2)"].loc[(mapSizeFrame["GameMode"] == x) & (
-        ~mapSizeFrame["Developers"].str.contains("Valve", na=False))].min())
-    AllMapK.append(mapSizeFrame["MapSize(km^2)"].loc[mapSizeFrame["GameMode"] == x].min())
-    ValveMapK.append(mapSizeFrame["MapSize(km^2)"].loc[(mapSizeFrame["GameMode"] == x) & (
-        mapSizeFrame["Developers"].str.contains("Valve", na=False))].min())
-    CommMapK.append(mapSizeFrame["MapSize(km^2)"].loc[(mapSizeFrame["GameMode"] == x) & (
-        ~mapSizeFrame["Developers"].str.contains("Valve", na=False))].min())
-
-# Store the results in a dictionary, that way we can easily add them to a dataframe
-GameModeDictionary = {"GameMode": GameModeName,
-                      "AllMapsSize": AllMap,
-                      "ValveMapsSize": ValveMap,
-                      "CommunityMapsSize": CommMap,
-                      "AllMapsSizeK": AllMapK,
-                      "ValveMapsSizeK": ValveMapK,
-                      "CommunityMapsSizeK": CommMapK}
-# Create and clean the dataframe, removing all null values and replacing them with 0s
-MapMinFrame = pd.DataFrame(GameModeDictionary)
-MapMinFrame = MapMinFrame.fillna(0)
 # print(MapMinFrame)
-
-# And again for the max values
-# Reset the list values
-GameModeName = []
-AllMap = []
-ValveMap = []
-CommMap = []
-AllMapK = []
-ValveMapK = []
-CommMapK = []
-
-for x in gameModeList:
-    # gameMode = gameModeList[x]
-    # print(gameModeList[x])
-    GameModeName.append(x)
-    AllMap.append(mapSizeFrame["MapSize(kHu^2)"].loc[mapSizeFrame["GameMode"] == x].max())
-    ValveMap.append(mapSizeFrame["MapSize(kHu^2)"].loc[(mapSizeFrame["GameMode"] == x) & (
-        mapSizeFrame["Developers"].str.contains("Valve", na=False))].max())
-    CommMap.append(mapSizeFrame["MapSize(kHu^2)"].loc[(mapSizeFrame["GameMode"] == x) & (
-        ~mapSizeFrame["Developers"].str.contains("Valve", na=False))].max())
-    AllMapK.append(mapSizeFrame["MapSize(km^2)"].loc[mapSizeFrame["GameMode"] == x].max())
-    ValveMapK.append(mapSizeFrame["MapSize(km^2)"].loc[(mapSizeFrame["GameMode"] == x) & (
-        mapSizeFrame["Developers"].str.contains("Valve", na=False))].max())
-    CommMapK.append(mapSizeFrame["MapSize(km^2)"].loc[(mapSizeFrame["GameMode"] == x) & (
-        ~mapSizeFrame["Developers"].str.contains("Valve", na=False))].max())
-
-# Store the results in a dictionary, that way we can easily add them to a dataframe
-GameModeDictionary = {"GameMode": GameModeName,
-                      "AllMapsSize": AllMap,
-                      "ValveMapsSize": ValveMap,
-                      "CommunityMapsSize": CommMap,
-                      "AllMapsSizeK": AllMapK,
-                      "ValveMapsSizeK": ValveMapK,
-                      "CommunityMapsSizeK": CommMapK}
-# Create and clean the dataframe, removing all null values and replacing them with 0s
-MapMaxFrame = pd.DataFrame(GameModeDictionary)
-MapMaxFrame = MapMaxFrame.fillna(0)
 # print(MapMaxFrame)
 
 # Create the chart
@@ -505,15 +322,7 @@ MapMaxFrame = MapMaxFrame.fillna(0)
 # The idea is to create a dataframe that will join these two together based on the map name
 #   The idea is if the map name appears on the holiday sheet, the event it is linked with is added to its column
 # print(mainData.head())
-# First we need to rename the column in event data to match with the column name in the main data sheet
-eventData = eventData.rename(columns={"MapName": "Map"})
-# print(eventData)
-# Create a new frame that is a merge between the both
-EventFrame = pd.merge(mainData, eventData, how="left", on="Map")
-# Drop the columns we don't need and fill in the null values
-EventFrame.drop(["File name", "MapSize(kHu^2)", "NativeNavmesh", "OriginalMap", "Developers"], axis=1, inplace=True)
-EventFrame["Event"] = EventFrame["Event"].fillna("None")
-EventFrame = EventFrame.dropna()
+# The merge itself now happens in mapData.py, EventFrame comes straight from the cached dataset
 # print(EventFrame)
 
 # Group the results by events and get the total amount of maps made by each event type
@@ -560,12 +369,7 @@ EventFrame = EventFrame.dropna()
 # We actually have a dataframe that uses these exact columns from question 5, but it removed all null map size values, which we want to keep this time, so we will re-make it
 # print(mainData.info())
 # print(mapSizeFrame.info())
-MapComp = mainData[["Map", "Game mode", "Developers", "MapSize(kHu^2)"]].copy()
-# replace all null values in the map size list with 0
-MapComp["MapSize(kHu^2)"] = MapComp["MapSize(kHu^2)"].fillna(0)
-MapComp["Community"] = "#5885A2"
-MapComp.loc[gameModeData["Developers"].str.contains("Valve", na=False), "Community"] = "#B8383B"
-MapComp["MapSize(km^2)"] = MapComp["MapSize(kHu^2)"] / 27.5926
+# MapComp itself is built in mapData.py along with the rest of the dataset, so it can be cached
 # print(MapComp.head())
 
 # Next for the purpose of testing the chart, we will make 3 variables to mimic the drop-down options that would normally be present
@@ -616,162 +420,271 @@ testSizeType = "Kilo Hammer Units Squared"
 # chart6.show()
 
 
-layout = html.Div([
-    html.Div(
-        className="mapCountStats",
-        children=[
-            html.H3("Number Of Maps Added To TF2: " + str(len(mainData.index))),
-            html.H3("Number of Valve-Made Maps: " + str(
-                len(MapPerYearData.loc[MapPerYearData["Community"] == False].index))),
-            html.H3("Number of Community-Made Maps: " + str(
-                len(MapPerYearData.loc[MapPerYearData["Community"] == True].index)))
-        ]
-    ),
-
-    # First graph goes here
-    dcc.Graph(id="TotalMapGraph", figure=chart1),
-
-    # Third graph and all needed drop-downs go here
-    html.Div(
-        className="ChartCombiner",
-        children=[
-            dcc.Graph(id="GMPerGraph"),
-            html.Div(
-                className="DropDownContainer",
-                children=[
-                    dcc.Dropdown(
-                        id="GMPerDropDown",
-                        options=["Capture the Flag", "Control Point", "Attack/Defend", "Payload", "Arena",
-                                 "Payload Race",
-                                 "King of the Hill", "Special Delivery", "Mann vs. Machine", "Robot Destruction",
-                                 "Mannpower",
-                                 "PASS Time", "Player Destruction", "Versus Saxton Hale", "Zombie Infection"],
-                        value="Capture the Flag"
-                    )
-                ]
-            )
-        ]
-    ),
-
-    # Second graph goes here
-    html.Div(
-        className="ChartCombiner",
-        children=[
-            dcc.Graph(id="MapsPerYearGraph"),
-            html.Div(
-                className="DropDownContainer",
-                children=[
-                    dcc.Dropdown(
-                        id="MapPerYearGameMode",
-                        options=["All Game Modes", "Capture the Flag", "Control Point", "Attack/Defend", "Payload",
-                                 "Arena",
-                                 "Payload Race",
-                                 "King of the Hill", "Special Delivery", "Mann vs. Machine", "Player Destruction",
-                                 "Versus Saxton Hale", "Zombie Infection"],
-                        value="All Game Modes"
-                    )
-                ]
-            )
-        ]
-    ),
-
-    # Fifth graph and all needed drop-downs go here
-    html.Div(
-        className="ChartCombiner",
-        children=[
-            dcc.Graph(id="HolidayCount"),
-            html.Div(
-                className="DropDownContainer",
-                children=[
-                    dcc.Dropdown(
-                        id="HolidayCountYear",
-                        options=["All Years", "2009", "2010", "2011", "2012", "2013", "2014", "2015",
-                                 "2016", "2017", "2018", "2019", "2020", "2021", "2022", "2023"],
-                        value="All Years"
-                    ),
-                    dcc.Dropdown(
-                        id="HolidayCountGameMode",
-                        options=["All Game Modes", "Capture the Flag", "Control Point", "Attack/Defend", "Payload",
-                                 "Arena",
-                                 "Payload Race",
-                                 "King of the Hill", "Special Delivery", "Mann vs. Machine", "Player Destruction",
-                                 "Zombie Infection"],
-                        value="All Game Modes"
-                    )
-                ]
-            )
-        ]
-    ),
-
-    # Fourth graph and all needed drop-downs go here
-    html.Div(
-        className="ChartCombiner",
-        children=[
-            dcc.Graph(id="MapSizeGMMode"),
-            html.Div(
-                className="DropDownContainer",
-                children=[
-                    dcc.Dropdown(
-                        id="MapSizeDropDown",
-                        options=["Average Map Size", "Max Map Size", "Min Map Size"],
-                        value="Average Map Size"
-                    ),
-                    dcc.Dropdown(
-                        id="MapSizeDistanceType",
-                        options=["Kilo Hammer Units Squared", "Kilometers Squared"],
-                        value="Kilo Hammer Units Squared"
-                    ),
-                ]
-            ),
-        ]
-    ),
-
-    # Sixth graph and all needed drop-downs go here
-    html.Div(
-        className="ChartCombiner",
-        children=[
-            dcc.Graph(id="MapSizeChart2"),
-            html.Div(
-                className="DropDownContainer",
-                children=[
-                    dcc.Dropdown(
-                        id="MapSizeGameModes2",
-                        options=["Capture the Flag", "Control Point", "Attack/Defend", "Payload", "Arena",
-                                 "Payload Race",
-                                 "King of the Hill", "Special Delivery", "Mann vs. Machine", "Player Destruction",
-                                 "Versus Saxton Hale",
-                                 "Zombie Infection"],
-                        value="Capture the Flag"
-                    ),
-                    dcc.Dropdown(
-                        id="CommunityMapDropDown2",
-                        options=["All Maps", "Valve Maps", "Community Maps"],
-                        value="All Maps"
-                    ),
-                    dcc.Dropdown(
-                        id="MapSizeDistanceType2",
-                        options=["Kilo Hammer Units Squared", "Kilometers Squared"],
-                        value="Kilo Hammer Units Squared"
-                    )
-                ]
-            )
-        ]
-    )
-])
+# Drop-down options for the charts below, kept up here so the figure cache can go through every combination
+gameModeOptions = ["Capture the Flag", "Control Point", "Attack/Defend", "Payload", "Arena", "Payload Race",
+                   "King of the Hill", "Special Delivery", "Mann vs. Machine", "Robot Destruction", "Mannpower",
+                   "PASS Time", "Player Destruction", "Versus Saxton Hale", "Zombie Infection"]
+mapPerYearOptions = ["All Game Modes", "Capture the Flag", "Control Point", "Attack/Defend", "Payload", "Arena",
+                     "Payload Race", "King of the Hill", "Special Delivery", "Mann vs. Machine", "Player Destruction",
+                     "Versus Saxton Hale", "Zombie Infection"]
+holidayYearOptions = ["All Years", "2009", "2010", "2011", "2012", "2013", "2014", "2015", "2016", "2017", "2018",
+                      "2019", "2020", "2021", "2022", "2023"]
+holidayGameModeOptions = ["All Game Modes", "Capture the Flag", "Control Point", "Attack/Defend", "Payload", "Arena",
+                          "Payload Race", "King of the Hill", "Special Delivery", "Mann vs. Machine",
+                          "Player Destruction", "Zombie Infection"]
+mapSizeStatOptions = ["Average Map Size", "Max Map Size", "Min Map Size"]
+distanceTypeOptions = ["Kilo Hammer Units Squared", "Kilometers Squared"]
+mapSizeGameModeOptions = ["Capture the Flag", "Control Point", "Attack/Defend", "Payload", "Arena", "Payload Race",
+                          "King of the Hill", "Special Delivery", "Mann vs. Machine", "Player Destruction",
+                          "Versus Saxton Hale", "Zombie Infection"]
+developerOptions = ["All Maps", "Valve Maps", "Community Maps"]
+# Developer class (as used in the inverted indexes) for each of the developer options that filters
+developerClasses = {"Valve Maps": "Valve", "Community Maps": "Community"}
+
+# The page layout is a function, so Dash only builds it (and loads the data) when someone opens the page
+def layout(**kwargs):
+    data = chartData.Get()
+    children = [
+        html.Div(
+            className="mapCountStats",
+            children=[
+                html.H3("Number Of Maps Added To TF2: " + str(len(data.mainData.index))),
+                html.H3("Number of Valve-Made Maps: " + str(
+                    len(data.MapPerYearData.loc[data.MapPerYearData["Community"] == False].index))),
+                html.H3("Number of Community-Made Maps: " + str(
+                    len(data.MapPerYearData.loc[data.MapPerYearData["Community"] == True].index)))
+            ]
+        ),
+
+        # First graph goes here
+        dcc.Graph(id="TotalMapGraph", figure=TotalMapGraph()),
+
+        # Third graph and all needed drop-downs go here
+        html.Div(
+            className="ChartCombiner",
+            children=[
+                dcc.Graph(id="GMPerGraph"),
+                html.Div(
+                    className="DropDownContainer",
+                    children=[
+                        dcc.Dropdown(
+                            id="GMPerDropDown",
+                            options=gameModeOptions,
+                            value="Capture the Flag"
+                        )
+                    ]
+                )
+            ]
+        ),
+
+        # Second graph goes here
+        html.Div(
+            className="ChartCombiner",
+            children=[
+                dcc.Graph(id="MapsPerYearGraph"),
+                html.Div(
+                    className="DropDownContainer",
+                    children=[
+                        dcc.Dropdown(
+                            id="MapPerYearGameMode",
+                            options=mapPerYearOptions,
+                            value="All Game Modes"
+                        )
+                    ]
+                )
+            ]
+        ),
+
+        # Fifth graph and all needed drop-downs go here
+        html.Div(
+            className="ChartCombiner",
+            children=[
+                dcc.Graph(id="HolidayCount"),
+                html.Div(
+                    className="DropDownContainer",
+                    children=[
+                        dcc.Dropdown(
+                            id="HolidayCountYear",
+                            options=holidayYearOptions,
+                            value="All Years"
+                        ),
+                        dcc.Dropdown(
+                            id="HolidayCountGameMode",
+                            options=holidayGameModeOptions,
+                            value="All Game Modes"
+                        )
+                    ]
+                )
+            ]
+        ),
+
+        # Fourth graph and all needed drop-downs go here
+        html.Div(
+            className="ChartCombiner",
+            children=[
+                dcc.Graph(id="MapSizeGMMode"),
+                figurePatch.Store("MapSizeGMMode"),
+                html.Div(
+                    className="DropDownContainer",
+                    children=[
+                        dcc.Dropdown(
+                            id="MapSizeDropDown",
+                            options=mapSizeStatOptions,
+                            value="Average Map Size"
+                        ),
+                        dcc.Dropdown(
+                            id="MapSizeDistanceType",
+                            options=distanceTypeOptions,
+                            value="Kilo Hammer Units Squared"
+                        ),
+                    ]
+                ),
+            ]
+        ),
+
+        # Sixth graph and all needed drop-downs go here
+        html.Div(
+            className="ChartCombiner",
+            children=[
+                dcc.Graph(id="MapSizeChart2"),
+                figurePatch.Store("MapSizeChart2"),
+                html.Div(
+                    className="DropDownContainer",
+                    children=[
+                        dcc.Dropdown(
+                            id="MapSizeGameModes2",
+                            options=mapSizeGameModeOptions,
+                            value="Capture the Flag"
+                        ),
+                        dcc.Dropdown(
+                            id="CommunityMapDropDown2",
+                            options=developerOptions,
+                            value="All Maps"
+                        ),
+                        dcc.Dropdown(
+                            id="MapSizeDistanceType2",
+                            options=distanceTypeOptions,
+                            value="Kilo Hammer Units Squared"
+                        )
+                    ]
+                )
+            ]
+        )
+    ]
+    # In clientside mode the charts page carries its own copy of the data for the browser functions
+    if useClientside:
+        children.append(dcc.Store(id="ClientChartData", data=ClientChartData()))
+    return html.Div(children)
 
 # Create the callbacks so the system knows to change when the drop-down value is changed
+# Registers a chart callback on the server, or in clientside mode hooks the outputs up to the browser function instead
+def ChartCallback(clientFunction, serverFunction, output, *inputs):
+    if useClientside:
+        clientside_callback(ClientsideFunction(namespace="charts", function_name=clientFunction),
+                            output, *inputs, State("ClientChartData", "data"))
+    else:
+        callback(output, *inputs)(serverFunction)
+
+
+# Everything the browser versions of the charts need, the data goes as short columns with game modes and events as codes
+# The trace and layout skeletons are taken from figures built on the server, so both versions look exactly the same
+# It is only worked out once per dataset version, every later page view gets the same copy
+clientStores = {}
+
+
+def ClientChartData():
+    data = chartData.Get()
+    if data.version not in clientStores:
+        clientStores.clear()
+        clientStores[data.version] = BuildClientChartData(data)
+    return clientStores[data.version]
+
+
+def BuildClientChartData(data):
+    # Built here rather than taken from the figure cache, the cached figures are compacted for sending (see figurePayload.py)
+    # and their template is cut down to what that one chart needs
+    def Plain(chart, *args):
+        return json.loads(to_json_plotly(chart.Build(*args)))
+
+    def Skeleton(figure, dropKeys):
+        return {key: value for key, value in figure.items() if key not in dropKeys}
+
+    def Codes(column):
+        codes, uniques = pd.factorize(column)
+        return codes.tolist(), uniques.tolist()
+
+    perYearFigure = Plain(MapPerYearGraph, "All Game Modes")
+    perYearModes, perYearModeNames = Codes(data.MapPerYearData["Game mode"])
+    holidayFigure = Plain(HolidayCountGraph, "All Years", "All Game Modes")
+    holidayModes, holidayModeNames = Codes(data.EventFrame["Game mode"])
+    holidayEvents, holidayEventNames = Codes(data.EventFrame["Event"])
+    sizeFigures = {sizeType: Plain(MapSizeGraph2, mapSizeGameModeOptions[0], "All Maps", sizeType)
+                   for sizeType in distanceTypeOptions}
+    sizeModes, sizeModeNames = Codes(data.MapComp["Game mode"])
+    sizes = dataSchema.MapSizes(data.MapComp)
+    return {
+        "template": perYearFigure["layout"]["template"],
+        "mapsPerYear": {
+            "layout": Skeleton(perYearFigure["layout"], ["template"]),
+            "traces": {trace["offsetgroup"]: Skeleton(trace, ["x", "y"]) for trace in perYearFigure["data"]},
+            "gameModes": perYearModeNames,
+            "mode": perYearModes,
+            "year": data.MapPerYearData["Date added"].tolist(),
+            "community": data.MapPerYearData["Community"].astype(int).tolist()
+        },
+        "holiday": {
+            "layout": Skeleton(holidayFigure["layout"], ["template"]),
+            "traces": {trace["name"]: Skeleton(trace, ["x", "y", "text"]) for trace in holidayFigure["data"]},
+            "gameModes": holidayModeNames,
+            "mode": holidayModes,
+            "year": data.EventFrame["Date added"].dt.year.tolist(),
+            "events": holidayEventNames,
+            "event": holidayEvents
+        },
+        "mapSize": {
+            "layouts": {sizeType: Skeleton(figure["layout"], ["template"]) for sizeType, figure in sizeFigures.items()},
+            "traces": {sizeType: Skeleton(figure["data"][0], ["x", "y"]) for sizeType, figure in sizeFigures.items()},
+            "gameModes": sizeModeNames,
+            "mode": sizeModes,
+            "map": data.MapComp["Map"].tolist(),
+            "valve": (data.MapComp["Community"] == "#B8383B").astype(int).tolist(),
+            "kHu": sizes["MapSize(kHu^2)"].tolist(),
+            "km": sizes["MapSize(km^2)"].tolist()
+        }
+    }
+
+
+# Each callback builds its figure, Memoize puts the figure cache in front of it so a figure is only built once per dataset version
+# The data work of each one is in a metrics.Phase("pandas") block, so the metrics can tell it apart from the plotly build
 # This callback is used to make chart 2, the one that shows how many maps were made per year
-@callback(
-    Output("MapsPerYearGraph", "figure"),
-    Input("MapPerYearGameMode", "value"))
+@figures.Memoize([mapPerYearOptions])
 def MapPerYearGraph(mode):
-    GroupedData = MapPerYearData.copy()
-    if mode != "All Game Modes":
-        GroupedData = GroupedData.loc[GroupedData["Game mode"] == mode]
-    GroupedData = GroupedData.groupby(["Date added", "Community"], as_index=False).count()
-    GroupedData = GroupedData.drop(columns=["Game mode", "Developers"])
-    # print(GroupedData.head())
+    with metrics.Phase("pandas"):
+        data = chartData.Get()
+        if chartData.pushdown:
+            # Count the maps per year in SQLite, only the counts come back
+            where, params = ("", []) if mode == "All Game Modes" else (' WHERE "Game mode" = ?', [mode])
+            GroupedData = data.Query('SELECT "Date added", Community, COUNT(Map) AS Map FROM MapPerYearData' + where
+                                     + ' GROUP BY "Date added", Community ORDER BY "Date added", Community', params)
+            GroupedData["Community"] = GroupedData["Community"].astype(bool)
+        else:
+            filters = {}
+            if mode != "All Game Modes":
+                filters["mode"] = mode
+            GroupedData = data.MapPerYearQuery.Select(**filters)
+            GroupedData = GroupedData.groupby(["Date added", "Community"], as_index=False).count()
+            GroupedData = GroupedData.drop(columns=["Game mode", "Developers"])
+        # print(GroupedData.head())
 
+    legendNames = {"False": "Valve Maps", "True": "Community Maps"}
+    if figureFactory.enabled:
+        # The same figure as below without plotly express, see figureFactory.py
+        return figureFactory.Bar(GroupedData, x="Date added", y="Map", color="Community",
+                                 colors={False: "#B8383B", True: "#5885A2"}, title="Number of Maps Added Per Year",
+                                 names=legendNames,
+                                 layout={"paper_bgcolor": "rgba(0,0,0,0)", "plot_bgcolor": "rgb(51, 51, 51)",
+                                         "font": {"color": "white", "family": "TF2"}, "xaxis": {"dtick": 1},
+                                         "yaxis": {"title": {"text": "Maps Added"}}})
     fig2 = px.bar(GroupedData,
                   x="Date added",
                   y="Map",
@@ -782,7 +695,6 @@ def MapPerYearGraph(mode):
     fig2.update_layout(paper_bgcolor="rgba(0,0,0,0)", plot_bgcolor="rgb(51, 51, 51)", font=dict(color="white"),
                        font_family="TF2", xaxis={"dtick": 1})
     fig2.update_yaxes(title_text="Maps Added")
-    legendNames = {"False": "Valve Maps", "True": "Community Maps"}
     fig2.for_each_trace(lambda t: t.update(name=legendNames[t.name],
                                            legendgroup=legendNames[t.name],
                                            hovertemplate=t.hovertemplate.replace(t.name, legendNames[t.name])
@@ -791,18 +703,39 @@ def MapPerYearGraph(mode):
     return fig2
 
 
+ChartCallback("mapsPerYear", MapPerYearGraph,
+              Output("MapsPerYearGraph", "figure"),
+              Input("MapPerYearGameMode", "value"))
+
+
 # This callback is used to make chart 3, the one that shows the % of maps made by game-mode
+# The function that creates the chart itself on the site
 @callback(
     Output("GMPerGraph", "figure"),
     Input("GMPerDropDown", "value"))
-# The function that creates the chart itself on the site
+@figures.Memoize([gameModeOptions])
 def GMPerGraphChangeMode(mode):
-    # Create a dataframe to store this information properly
-    typeCountData = {"MapCount": [
-        len(gameModeData.loc[(gameModeData.Community == False) & (gameModeData.GameMode == mode)]),
-        len(gameModeData.loc[(gameModeData.Community == True) & (gameModeData.GameMode == mode)])],
-        "Type": ["Valve Maps", "Community Maps"]}
-    typeCountFrame = pd.DataFrame(data=typeCountData)
+    with metrics.Phase("pandas"):
+        data = chartData.Get()
+        if chartData.pushdown:
+            counts = data.Query("SELECT Community, COUNT(*) AS Maps FROM gameModeData WHERE GameMode = ? GROUP BY Community",
+                                [mode])
+            counts = dict(zip(counts["Community"].astype(bool), counts["Maps"].astype(int)))
+            valveCount = int(counts.get(False, 0))
+            communityCount = int(counts.get(True, 0))
+        else:
+            valveCount = data.gameModeQuery.Count(mode=mode, developers="Valve")
+            communityCount = data.gameModeQuery.Count(mode=mode, developers="Community")
+        # Create a dataframe to store this information properly
+        typeCountData = {"MapCount": [valveCount, communityCount],
+                         "Type": ["Valve Maps", "Community Maps"]}
+        typeCountFrame = pd.DataFrame(data=typeCountData)
+    if figureFactory.enabled:
+        return figureFactory.Pie(typeCountFrame, values="MapCount", names="Type",
+                                 colors={"Valve Maps": "#B8383B", "Community Maps": "#5885A2"},
+                                 title="% of Maps Made by the Community and Valve in Specific Game Modes",
+                                 traces={"textposition": "inside", "textinfo": "percent+label"},
+                                 layout={"paper_bgcolor": "rgba(0,0,0,0)", "font": {"color": "white", "family": "TF2"}})
     # Create the test chart in plotly
     fig0 = px.pie(typeCountFrame,
                   values="MapCount",
@@ -815,101 +748,102 @@ def GMPerGraphChangeMode(mode):
     return fig0
 
 
+
 # This callback is used to make chart 4, which shows various map sizes per game mode
-@callback(
-    Output("MapSizeGMMode", "figure"),
-    [Input("MapSizeDropDown", "value"), Input("MapSizeDistanceType", "value")])
+@figures.Memoize([mapSizeStatOptions, distanceTypeOptions])
 def GMSizeGraph(mode, sizeType):
+    # The size statistics are worked out when the data is loaded, so this chart has no data work of its own
+    data = chartData.Get()
     # print(mode)
     # print(sizeType)
     # First determine what chart type is used, then determine the measurement type, then create the chart
+    # The average chart also shows all maps together, the max and min charts only Valve's and the community's
     if mode == "Average Map Size":
-        if sizeType == "Kilo Hammer Units Squared":
-            # Hammer units sized chart
-            fig1 = px.bar(MapAverageFrame,
-                          x="GameMode",
-                          y=["AllMapsSize", "ValveMapsSize", "CommunityMapsSize"],
-                          color_discrete_map={"AllMapsSize": "#CF7336", "ValveMapsSize": "#B8383B",
-                                              "CommunityMapsSize": "#5885A2"},
-                          title="Average Map Size Per Game Mode")
-            fig1.update_yaxes(title_text="Map Size (kHu^2)")
-        else:
-            # Kilometers sized chart
-            fig1 = px.bar(MapAverageFrame,
-                          x="GameMode",
-                          y=["AllMapsSizeK", "ValveMapsSizeK", "CommunityMapsSizeK"],
-                          color_discrete_map={"AllMapsSizeK": "#CF7336", "ValveMapsSizeK": "#B8383B",
-                                              "CommunityMapsSizeK": "#5885A2"},
-                          title="Average Map Size Per Game Mode")
-            fig1.update_yaxes(title_text="Map Size (km^2)")
+        frame, groups, title = data.MapAverageFrame, ["AllMaps", "ValveMaps", "CommunityMaps"], "Average Map Size Per Game Mode"
+    elif mode == "Max Map Size":
+        frame, groups, title = data.MapMaxFrame, ["ValveMaps", "CommunityMaps"], "Max Map Size Per Game Mode"
     else:
-        if mode == "Max Map Size":
-            if sizeType == "Kilo Hammer Units Squared":
-                # Hammer units sized chart
-                fig1 = px.bar(MapMaxFrame,
-                              x="GameMode",
-                              y=["ValveMapsSize", "CommunityMapsSize"],
-                              color_discrete_map={"ValveMapsSize": "#B8383B",
-                                                  "CommunityMapsSize": "#5885A2"},
-                              title="Max Map Size Per Game Mode")
-                fig1.update_yaxes(title_text="Map Size (kHu^2)")
-            else:
-                # Kilometers sized chart
-                fig1 = px.bar(MapMaxFrame,
-                              x="GameMode",
-                              y=["ValveMapsSizeK", "CommunityMapsSizeK"],
-                              color_discrete_map={"ValveMapsSizeK": "#B8383B",
-                                                  "CommunityMapsSizeK": "#5885A2"},
-                              title="Max Map Size Per Game Mode")
-                fig1.update_yaxes(title_text="Map Size (km^2)")
-        else:
-            if sizeType == "Kilo Hammer Units Squared":
-                # Hammer units sized chart
-                fig1 = px.bar(MapMinFrame,
-                              x="GameMode",
-                              y=["ValveMapsSize", "CommunityMapsSize"],
-                              color_discrete_map={"ValveMapsSize": "#B8383B",
-                                                  "CommunityMapsSize": "#5885A2"},
-                              title="Min Map Size Per Game Mode")
-                fig1.update_yaxes(title_text="Map Size (kHu^2)")
-            else:
-                # Kilometers sized chart
-                fig1 = px.bar(MapMinFrame,
-                              x="GameMode",
-                              y=["ValveMapsSizeK", "CommunityMapsSizeK"],
-                              color_discrete_map={"ValveMapsSizeK": "#B8383B",
-                                                  "CommunityMapsSizeK": "#5885A2"},
-                              title="Min Map Size Per Game Mode")
-                fig1.update_yaxes(title_text="Map Size (km^2)")
+        frame, groups, title = data.MapMinFrame, ["ValveMaps", "CommunityMaps"], "Min Map Size Per Game Mode"
+    if sizeType == "Kilo Hammer Units Squared":
+        # Hammer units sized chart
+        columns, unitTitle = [group + "Size" for group in groups], "Map Size (kHu^2)"
+    else:
+        # Kilometers sized chart
+        columns, unitTitle = [group + "SizeK" for group in groups], "Map Size (km^2)"
+    groupColors = {"AllMaps": "#CF7336", "ValveMaps": "#B8383B", "CommunityMaps": "#5885A2"}
+    colors = {column: groupColors[group] for column, group in zip(columns, groups)}
+    layout = {"paper_bgcolor": "rgba(0,0,0,0)", "plot_bgcolor": "rgb(51, 51, 51)", "font": {"color": "white", "family": "TF2"},
+              "barmode": "group"}
+    if figureFactory.enabled:
+        return figureFactory.WideBar(frame, x="GameMode", columns=columns, colors=colors, title=title,
+                                     layout=dict(layout, yaxis={"title": {"text": unitTitle}}))
+    fig1 = px.bar(frame,
+                  x="GameMode",
+                  y=columns,
+                  color_discrete_map=colors,
+                  title=title)
+    fig1.update_yaxes(title_text=unitTitle)
     # Update the layout, so it matches with other charts and return it
-    fig1.update_layout(paper_bgcolor="rgba(0,0,0,0)", plot_bgcolor="rgb(51, 51, 51)", font=dict(color="white"),
-                       barmode="group", font_family="TF2")
+    fig1.update_layout(layout)
     return fig1
 
 
+# Switching the unit only changes the bar heights, the axis title and the trace names (the column names carry the unit),
+# so only those are sent, see figurePatch.py
+figurePatch.Register(figures, patches, GMSizeGraph, "MapSizeGMMode",
+                     [Input("MapSizeDropDown", "value"), Input("MapSizeDistanceType", "value")],
+                     {"MapSizeDistanceType": [
+                         ["data", "*", "y"], ["data", "*", "name"], ["data", "*", "legendgroup"],
+                         ["data", "*", "offsetgroup"], ["data", "*", "hovertemplate"],
+                         ["layout", "yaxis", "title", "text"]]})
+
+
+
 # This callback is used to make chart 5, which shows the total maps per holiday theming
-@callback(
-    Output("HolidayCount", "figure"),
-    [Input("HolidayCountYear", "value"), Input("HolidayCountGameMode", "value")])
+@figures.Memoize([holidayYearOptions, holidayGameModeOptions])
 def HolidayCountGraph(year, gmmode):
-    # Group the results by events and get the total amount of maps made by each event type
-    # We are also filtering by year and game mode on this step
-    # EventCount = EventFrame.groupby(["Event"])["Map"].count().reset_index()
-    if year != "All Years":
-        temp = EventFrame.loc[EventFrame["Date added"].dt.year == int(year)]
-    else:
-        temp = EventFrame.copy()
-        # print(temp)
-    if gmmode != "All Game Modes":
-        temp = temp.loc[temp["Game mode"] == gmmode]
-    EventCount = temp.groupby(["Event"])["Map"].count().reset_index()
-    # Get the percentage of how many maps are in each category
-    EventCount["MapPercent"] = (EventCount["Map"] / EventCount["Map"].sum()) * 100
-    EventCount = EventCount.round({"MapPercent": 2})
-    # Convert the results into a string, so we can append a % to the end of it
-    EventCount["MapPercent"].astype(object)
-    EventCount["MapPercent"] = (EventCount["MapPercent"].astype(str) + "%")
-
+    with metrics.Phase("pandas"):
+        data = chartData.Get()
+        # Group the results by events and get the total amount of maps made by each event type
+        # We are also filtering by year and game mode on this step
+        # EventCount = EventFrame.groupby(["Event"])["Map"].count().reset_index()
+        if chartData.pushdown:
+            # Filter and count in SQLite, the dates are stored as text there
+            conditions = []
+            params = []
+            if year != "All Years":
+                conditions.append("CAST(strftime('%Y', \"Date added\") AS INTEGER) = ?")
+                params.append(int(year))
+            if gmmode != "All Game Modes":
+                conditions.append('"Game mode" = ?')
+                params.append(gmmode)
+            where = " WHERE " + " AND ".join(conditions) if conditions else ""
+            EventCount = data.Query("SELECT Event, COUNT(Map) AS Map FROM EventFrame" + where + " GROUP BY Event ORDER BY Event",
+                                    params)
+        else:
+            # The rows are picked out of the shared frame (see frameQuery.py), so temp must not be changed in place
+            filters = {}
+            if year != "All Years":
+                filters["year"] = int(year)
+            if gmmode != "All Game Modes":
+                filters["mode"] = gmmode
+            temp = data.EventQuery.Select(**filters)
+            EventCount = temp.groupby(["Event"], observed=True)["Map"].count().reset_index()
+        # Get the percentage of how many maps are in each category
+        EventCount["MapPercent"] = (EventCount["Map"] / EventCount["Map"].sum()) * 100
+        EventCount = EventCount.round({"MapPercent": 2})
+        # Convert the results into a string, so we can append a % to the end of it
+        EventCount["MapPercent"].astype(object)
+        EventCount["MapPercent"] = (EventCount["MapPercent"].astype(str) + "%")
+
+    if figureFactory.enabled:
+        return figureFactory.Bar(EventCount, x="Map", y="Event", color="Event",
+                                 colors={"None": "#CF7336", "Halloween": "#85589c", "Christmas": "#4d8757"},
+                                 title="Maps Grouped By Holiday Events", orientation="h", text="MapPercent",
+                                 traces={"width": 1, "textfont": {"color": "white"}},
+                                 layout={"paper_bgcolor": "rgba(0,0,0,0)", "plot_bgcolor": "rgb(51, 51, 51)",
+                                         "font": {"color": "white", "family": "TF2"},
+                                         "xaxis": {"title": {"text": "Total Maps Per Category"}}})
     # Create the chart itself
     fig5 = px.bar(EventCount,
                   x="Map",
@@ -927,20 +861,24 @@ def HolidayCountGraph(year, gmmode):
     return fig5
 
 
+ChartCallback("holidayCount", HolidayCountGraph,
+              Output("HolidayCount", "figure"),
+              Input("HolidayCountYear", "value"), Input("HolidayCountGameMode", "value"))
+
+
 # This callback is used to make chart 6, which shows the map size of all maps per game mode
-@callback(
-    Output("MapSizeChart2", "figure"),
-    [Input("MapSizeGameModes2", "value"), Input("CommunityMapDropDown2", "value"),
-     Input("MapSizeDistanceType2", "value")]
-)
+@figures.Memoize([mapSizeGameModeOptions, developerOptions, distanceTypeOptions])
 def MapSizeGraph2(gameMode, mapDevelopers, sizeType):
-    temp = MapComp.copy()
-    temp = temp.loc[temp["Game mode"] == gameMode]
-    if mapDevelopers == "Valve Maps":
-        temp = temp.loc[temp["Developers"].str.contains("Valve", na=False)]
-    elif mapDevelopers == "Community Maps":
-        temp = temp.loc[~temp["Developers"].str.contains("Valve", na=False)]
-    temp = temp.sort_values(by=["MapSize(kHu^2)"])
+    with metrics.Phase("pandas"):
+        data = chartData.Get()
+        filters = {"mode": gameMode}
+        if mapDevelopers in developerClasses:
+            filters["developers"] = developerClasses[mapDevelopers]
+        temp = data.MapCompQuery.Select(**filters)
+        # Stable sort, so maps with the same size (mostly the ones set to 0) keep the same order everywhere, including the browser version
+        temp = temp.sort_values(by=["MapSize(kHu^2)"], kind="stable")
+        # The sizes shown are the float64 ones the sheet gives, not the float32 copies the dataset keeps
+        temp = temp.assign(**dataSchema.MapSizes(temp))
 
     # Finally we make the chart itself
     if sizeType == "Kilo Hammer Units Squared":
@@ -962,9 +900,13 @@ def MapSizeGraph2(gameMode, mapDevelopers, sizeType):
     # fig6.update_layout(yaxis={"categoryorder": "total ascending"})
     # We have to set up the colors here because if we do so, plotly will group them
     # If we then force normal grouping, it causes a bug where maps from other game modes will start appearing in the chart
+    # The colors go as a code per map (1 for Valve's) on a two color scale, a short typed array instead of a color string per bar
     fig6.update_traces(width=1,
                        textfont_color="white",
-                       marker_color=["#5885A2" if i == "#5885A2" else "#B8383B" for i in temp.Community]
+                       marker_color=(temp.Community.to_numpy() != "#5885A2").astype(np.uint8),
+                       marker_colorscale=[[0, "#5885A2"], [1, "#B8383B"]],
+                       marker_cmin=0,
+                       marker_cmax=1
                        )
     # set the legend, so it doesn't just show the hex code
     # legendNames = {"#B8383B": "Valve Maps", "#5885A2": "Community Maps"}
@@ -982,3 +924,28 @@ def MapSizeGraph2(gameMode, mapDevelopers, sizeType):
     fig6.update_layout(paper_bgcolor="rgba(0,0,0,0)", plot_bgcolor="rgb(51, 51, 51)", font=dict(color="white"),
                        font_family="TF2")
     return fig6
+
+
+# The unit only changes the sizes and their labels, the developers only which maps are shown, so only those are sent
+# (unless the chart runs in the browser), see figurePatch.py
+mapSizeInputs = [Input("MapSizeGameModes2", "value"), Input("CommunityMapDropDown2", "value"),
+                 Input("MapSizeDistanceType2", "value")]
+if useClientside:
+    ChartCallback("mapSize", MapSizeGraph2, Output("MapSizeChart2", "figure"), *mapSizeInputs)
+else:
+    figurePatch.Register(figures, patches, MapSizeGraph2, "MapSizeChart2", mapSizeInputs, {
+        "MapSizeDistanceType2": [["data", "*", "x"], ["data", "*", "hovertemplate"],
+                                 ["layout", "xaxis", "title", "text"]],
+        "CommunityMapDropDown2": [["data", "*", "x"], ["data", "*", "y"], ["data", "*", "marker", "color"]]})
+
+
+# Render every chart combination up front if asked to, so no visitor has to wait on a figure build
+if figureCache.prebuildFigures:
+    figures.Prebuild()
+    patches.Prebuild()
+    # and again for every new dataset a reload swaps in, from the refresher thread while the old figures are still served
+    chartData.OnSwap(lambda data: (figures.Prebuild(), patches.Prebuild()))
+
+# Or just load the data while starting up, so the first visitor doesn't have to wait for it
+elif chartData.warmOnStart:
+    chartData.Warm()
@@ -3,8 +3,17 @@ from dash import Dash, dcc, html, Input, Output, callback
 import plotly.graph_objects as go
 import plotly.express as px
 
+import exportData
+
 dash.register_page(__name__)
 
+# Formats the merged map list can be downloaded in, Parquet only when the pyarrow package is there to write it
+# (exportData answers 501 for it otherwise, and pyarrow isn't in the requirements)
+downloadLinks = [html.Li(html.A("CSV", href="/export/maps.csv")),
+                 html.Li(html.A("JSON Lines", href="/export/maps.jsonl"))]
+if exportData.pyarrow is not None:
+    downloadLinks.append(html.Li(html.A("Parquet", href="/export/maps.parquet")))
+
 layout = html.Div([
     html.Div(
         className="pageBody",
@@ -44,6 +53,13 @@ layout = html.Div([
                 html.Li("Deduced that the conversion method is the following (May be incorrect, will need to do additional research to verify this):"),
                 html.Ul(className="normalText", children=[html.Li("Hu^2 / 27.5926 = km^2")])
             ]),  # end of list
+            html.Br(),
+            html.H3("Download The Data"),
+            html.Ul(className="normalText", children=[
+                html.Li("The merged map list the charts are built from can be downloaded as:"),
+                html.Ul(className="normalText", children=downloadLinks),
+                html.Li("Add mode, year and developers to the link to filter it the same way as the charts, e.g. /export/maps.csv?mode=Payload&year=2015&developers=Community Maps")
+            ]),  # end of list
         ]  # end of page body
     )
 ])
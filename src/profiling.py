@@ -0,0 +1,187 @@
+# Optional profiling of the Dash callbacks, for finding where a slow chart spends its time inside pandas and plotly express
+# Off unless asked for, the callback dispatch of the Flask server is wrapped and a sampled share of callback requests
+# (TF2_PROFILE_RATE, 0 to 1) runs under a profiler, each one written to its own file in TF2_PROFILE_DIR
+# - cProfile (default): a .prof file, open it with snakeviz, or turn it into a flame graph with flameprof or gprof2dot
+# - pyinstrument (TF2_PROFILER=pyinstrument, when the package is installed): a .speedscope.json file for speedscope.app
+# The rate and profiler can be changed while the site runs, by an admin:
+#   GET  /admin/profiling                     current settings
+#   POST /admin/profiling?rate=0.05&profiler=cprofile
+# along with the X-Admin-Token header holding TF2_ADMIN_TOKEN (without a token set, none of this is reachable)
+# The change is written to settings.json in the profile folder, which every worker checks about once a second, so it
+# reaches all the workers without a restart (editing that file by hand does the same)
+# A single callback request can also be profiled on demand by sending it with the same X-Admin-Token header
+# (only ever as a header, a token in the query string would end up in access logs, proxy logs and browser history)
+# Only one request per worker is profiled at a time, a sampled request that finds the profiler busy just runs normally
+# (and a request answered from the callback response cache never reaches the callback, so there is nothing to profile)
+#
+# The import of the charts page can be profiled from the src folder too:
+#   python profiling.py --import-charts       writes an import-pages.charts profile to the profile folder
+import argparse
+import cProfile
+import hmac
+import json
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+
+from flask import abort, jsonify, request
+
+try:
+    import pyinstrument
+    from pyinstrument.renderers import SpeedscopeRenderer
+except ImportError:
+    pyinstrument = None
+
+profileFolder = os.environ.get("TF2_PROFILE_DIR", "profiles")
+adminToken = os.environ.get("TF2_ADMIN_TOKEN", "")
+settingsFile = "settings.json"
+# How often (seconds) a worker looks at the settings file for changes
+checkInterval = 1.0
+
+callbackPath = "/_dash-update-component"
+profilers = ["cprofile", "pyinstrument"]
+
+_settings = {"rate": float(os.environ.get("TF2_PROFILE_RATE", "0")), "profiler": os.environ.get("TF2_PROFILER", "cprofile")}
+_settingsState = {"checked": 0.0, "modified": None}
+_settingsLock = threading.Lock()
+_profileLock = threading.Lock()
+
+
+# The current settings, picking up changes made to the settings file since the last look
+def Settings():
+    now = time.monotonic()
+    if now - _settingsState["checked"] < checkInterval:
+        return _settings
+    with _settingsLock:
+        _settingsState["checked"] = now
+        path = os.path.join(profileFolder, settingsFile)
+        try:
+            modified = os.path.getmtime(path)
+        except OSError:
+            return _settings
+        if modified != _settingsState["modified"]:
+            try:
+                with open(path, "r", encoding="utf-8") as settings:
+                    _settings.update(_CheckSettings(json.load(settings)))
+                _settingsState["modified"] = modified
+            except (OSError, ValueError) as error:
+                print("Ignoring " + path + ": " + str(error))
+    return _settings
+
+
+# Only the settings we know, with their values checked, a ValueError says which one is wrong
+def _CheckSettings(settings):
+    checked = {}
+    if "rate" in settings:
+        rate = float(settings["rate"])
+        if not 0 <= rate <= 1:
+            raise ValueError("rate should be between 0 and 1")
+        checked["rate"] = rate
+    if "profiler" in settings:
+        if settings["profiler"] not in profilers:
+            raise ValueError("profiler should be one of " + ", ".join(profilers))
+        checked["profiler"] = settings["profiler"]
+    return checked
+
+
+# Write the settings file for every worker to pick up, through a temporary file so a worker never reads half of it
+def SaveSettings(settings):
+    settings = dict(Settings(), **settings)
+    os.makedirs(profileFolder, exist_ok=True)
+    handle, workPath = tempfile.mkstemp(prefix=".settings-", suffix=".json", dir=profileFolder)
+    with os.fdopen(handle, "w", encoding="utf-8") as workFile:
+        json.dump(settings, workFile)
+    os.replace(workPath, os.path.join(profileFolder, settingsFile))
+    _settings.update(settings)
+
+
+# Compared as bytes, compare_digest refuses strings with non-ASCII characters in them (and anyone can send the header)
+def _IsAdmin(token):
+    return (adminToken != "" and token is not None
+            and hmac.compare_digest(token.encode("utf-8"), adminToken.encode("utf-8")))
+
+
+# File name for a profile, from the time, the worker and what was profiled (the callback output)
+def _ProfilePath(label, extension):
+    label = re.sub(r"[^A-Za-z0-9_.-]+", "_", label).strip("._")[:80]
+    stamp = time.strftime("%Y%m%d-%H%M%S") + "-" + "{:03d}".format(int(time.time() * 1000) % 1000)
+    return os.path.join(profileFolder, stamp + "-" + str(os.getpid()) + "-" + label + extension)
+
+
+# Run function under the named profiler and write the profile out, gives back what function returned
+def Profile(function, label, profiler="cprofile"):
+    os.makedirs(profileFolder, exist_ok=True)
+    if profiler == "pyinstrument" and pyinstrument is not None:
+        session = pyinstrument.Profiler()
+        session.start()
+        try:
+            return function()
+        finally:
+            session.stop()
+            with open(_ProfilePath(label, ".speedscope.json"), "w", encoding="utf-8") as profileFile:
+                profileFile.write(session.output(SpeedscopeRenderer()))
+    profile = cProfile.Profile()
+    try:
+        return profile.runcall(function)
+    finally:
+        profile.dump_stats(_ProfilePath(label, ".prof"))
+
+
+# Wrap the Dash callback dispatch of the app's Flask server and add the admin route
+def Install(app):
+    server = app.server
+    endpoint = next(rule.endpoint for rule in server.url_map.iter_rules() if rule.rule == callbackPath)
+    dispatch = server.view_functions[endpoint]
+
+    def ProfiledDispatch(*args, **kwargs):
+        settings = Settings()
+        wanted = (_IsAdmin(request.headers.get("X-Admin-Token"))
+                  or (settings["rate"] > 0 and random.random() < settings["rate"]))
+        if not wanted or not _profileLock.acquire(blocking=False):
+            return dispatch(*args, **kwargs)
+        try:
+            body = request.get_json(silent=True, cache=True)
+            label = body.get("output", "callback") if isinstance(body, dict) else "callback"
+            return Profile(lambda: dispatch(*args, **kwargs), label, settings["profiler"])
+        finally:
+            _profileLock.release()
+
+    server.view_functions[endpoint] = ProfiledDispatch
+
+    @server.route("/admin/profiling", methods=["GET", "POST"])
+    def ProfilingSettings():
+        if not _IsAdmin(request.headers.get("X-Admin-Token")):
+            abort(404)
+        if request.method == "POST":
+            try:
+                SaveSettings(_CheckSettings(request.args))
+            except ValueError as error:
+                abort(400, str(error))
+        settings = dict(Settings())
+        settings["pyinstrument installed"] = pyinstrument is not None
+        settings["folder"] = os.path.abspath(profileFolder)
+        return jsonify(settings)
+
+
+# Profile importing the charts page, the way Dash imports it when the app starts
+def ProfileChartsImport():
+    import importlib
+    import dash
+    # The page registers itself with Dash, so it needs an app to exist first (without a pages folder, so Dash doesn't
+    # import the pages itself)
+    dash.Dash(__name__, use_pages=True, pages_folder="", suppress_callback_exceptions=True)
+    Profile(lambda: importlib.import_module("pages.charts"), "import-pages.charts", _settings["profiler"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Profiling tools")
+    parser.add_argument("--import-charts", action="store_true", help="Profile importing pages/charts.py")
+    args = parser.parse_args()
+    if args.import_charts:
+        ProfileChartsImport()
+        print("Profile written to " + os.path.abspath(profileFolder))
+    else:
+        parser.print_help()
@@ -0,0 +1,200 @@
+# Compression and cache headers for everything the Flask server behind Dash sends out
+# - Callback JSON, the page layout and Dash's scripts get gzip (or brotli, when the brotli package is installed)
+# - Files in assets get cache headers, for a year when the url carries a fingerprint (Dash adds ?m=<modified time> to the
+#   css and js it links, AssetUrl does the same for anything we link ourselves) and a short revalidated time otherwise
+# - Callback responses are remembered by request body and dataset version, an identical callback request is answered
+#   straight from memory with the same compressed bytes, and a client that sends the ETag back gets a 304
+import gzip
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Set TF2_CALLBACK_CACHE=0 to always run the callbacks, even for a request that was answered before
+cacheCallbacks = os.environ.get("TF2_CALLBACK_CACHE", "1") == "1"
+callbackCacheSize = int(os.environ.get("TF2_CALLBACK_CACHE_SIZE", "512"))
+# Compressed copies of fingerprinted or ETagged files (mostly Dash's own scripts, plotly.js alone is about 3.5 MB)
+staticCacheSize = 64
+
+# Anything smaller isn't worth the compression headers
+minimumSize = 1024
+compressibleTypes = {"application/json", "text/html", "text/css", "text/plain", "application/javascript",
+                     "text/javascript", "image/svg+xml", "font/ttf", "application/x-font-ttf", "font/otf"}
+# How long a browser may keep an asset whose url has no fingerprint before checking (with its ETag) if it changed
+assetMaxAge = 3600
+fingerprintMaxAge = 31536000
+
+callbackPath = "/_dash-update-component"
+
+
+def _Compress(data, encoding, static):
+    if encoding == "br":
+        return brotli.compress(data, quality=11 if static else 5)
+    return gzip.compress(data, compresslevel=9 if static else 6, mtime=0)
+
+
+# Pick the best encoding the client accepts, brotli only if the package is there
+def _ChooseEncoding():
+    accepted = {part.split(";")[0].strip() for part in request.headers.get("Accept-Encoding", "").split(",")}
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def _ETagMatches(etag):
+    return etag is not None and etag in [tag.strip() for tag in request.headers.get("If-None-Match", "").split(",")]
+
+
+class _Cache:
+    def __init__(self, maxEntries):
+        self.maxEntries = maxEntries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def Get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            return entry
+
+    def Put(self, key, entry):
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxEntries:
+                self.entries.popitem(last=False)
+
+
+# One remembered callback response, the plain body plus every compressed copy asked for so far
+class _CallbackEntry:
+    def __init__(self, etag, body, mimetype):
+        self.etag = etag
+        self.mimetype = mimetype
+        self.bodies = {None: body}
+
+    # Put the body on the response, compressed if the client can take it and it is big enough to be worth it
+    def Apply(self, response, encoding):
+        if len(self.bodies[None]) < minimumSize:
+            encoding = None
+        if encoding not in self.bodies:
+            self.bodies[encoding] = _Compress(self.bodies[None], encoding, static=False)
+        _SetBody(response, self.bodies[encoding], encoding)
+        response.headers["ETag"] = self.etag
+
+
+def _SetBody(response, body, encoding):
+    response.set_data(body)
+    if encoding is not None:
+        response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+
+
+# Hook the layer into the Dash app's Flask server
+# version() gives back the current dataset version (or None while nothing is loaded), cached callback responses are tied to it
+def Install(app, version):
+    server = app.server
+    callbackCache = _Cache(callbackCacheSize)
+    staticCache = _Cache(staticCacheSize)
+
+    def CallbackKey(body, dataVersion):
+        return '"' + hashlib.sha1(str(dataVersion).encode("utf-8") + b"\0" + body).hexdigest() + '"'
+
+    @server.before_request
+    def AnswerFromCache():
+        if not cacheCallbacks or request.method != "POST" or request.path != callbackPath:
+            return None
+        dataVersion = version()
+        key = CallbackKey(request.get_data(cache=True), dataVersion)
+        request.environ["tf2.callbackKey"] = (key, dataVersion)
+        entry = callbackCache.Get(key)
+        if entry is None:
+            return None
+        if _ETagMatches(entry.etag):
+            response = server.response_class(status=304)
+            response.headers["ETag"] = entry.etag
+        else:
+            response = server.response_class(mimetype=entry.mimetype)
+            entry.Apply(response, _ChooseEncoding())
+        response.headers["X-Callback-Cache"] = "hit"
+        request.environ["tf2.handled"] = True
+        return response
+
+    @server.after_request
+    def Finish(response):
+        if request.environ.get("tf2.handled"):
+            return response
+        path = request.path
+        assetPrefix = "/" + app.config.assets_url_path.strip("/") + "/"
+        if path.startswith(assetPrefix) and response.status_code in (200, 304):
+            # Flask sends its static files with no-cache, which would make the browser check on every single use
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            if "m" in request.args:
+                response.cache_control.max_age = fingerprintMaxAge
+                response.cache_control.immutable = True
+            else:
+                response.cache_control.max_age = assetMaxAge
+
+        if response.status_code != 200 or "Content-Encoding" in response.headers:
+            return response
+        # Generated responses (the exports) go out as they are made, reading them in to compress would hold all of it
+        if response.is_streamed and not response.direct_passthrough:
+            return response
+        if response.mimetype not in compressibleTypes:
+            return response
+
+        if request.method == "POST" and path == callbackPath and "tf2.callbackKey" in request.environ:
+            key, dataVersion = request.environ["tf2.callbackKey"]
+            currentVersion = version()
+            if dataVersion is None:
+                # This callback is what loaded the data, so its response belongs to the version that is loaded now
+                key = CallbackKey(request.get_data(cache=True), currentVersion)
+            entry = _CallbackEntry(key, response.get_data(), response.mimetype)
+            # Don't keep a response built from data that was swapped out while the callback ran
+            if currentVersion is not None and (dataVersion is None or dataVersion == currentVersion):
+                callbackCache.Put(key, entry)
+            entry.Apply(response, _ChooseEncoding())
+            response.headers["X-Callback-Cache"] = "miss"
+            return response
+
+        encoding = _ChooseEncoding()
+        if encoding is None or request.method not in ("GET", "HEAD"):
+            return response
+        # Files come back as a stream straight from disk, read them in so they can be compressed
+        response.direct_passthrough = False
+        body = response.get_data()
+        if len(body) < minimumSize:
+            return response
+        etag = response.headers.get("ETag")
+        static = etag is not None or "m" in request.args or "_dash-component-suites" in path
+        if static:
+            # The same file is asked for by every visitor, so its compressed copy is kept instead of redone each time
+            key = (request.full_path, etag, encoding)
+            compressed = staticCache.Get(key)
+            if compressed is None:
+                compressed = _Compress(body, encoding, static=True)
+                staticCache.Put(key, compressed)
+        else:
+            compressed = _Compress(body, encoding, static=False)
+        _SetBody(response, compressed, encoding)
+        if etag is not None:
+            # The compressed copy isn't byte for byte the file the ETag was made for, so it becomes a weak ETag
+            # Flask compares If-None-Match weakly, so the browser sending it back still gets its 304
+            response.set_etag(response.get_etag()[0], weak=True)
+        return response
+
+
+# Url of a file in the assets folder with its modified time attached, so the browser can keep it for a year
+def AssetUrl(app, fileName):
+    path = os.path.join(app.config.assets_folder, fileName)
+    return app.get_asset_url(fileName) + "?m=" + str(int(os.path.getmtime(path)))
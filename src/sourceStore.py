@@ -0,0 +1,136 @@
+# Where the hand-maintained map data (the MainMapData, WaterMapData and EventMapList tables) is read from
+# - excel: the workbook dataSource/TF2MapData.xlsx, as it has always been kept
+# - sqlite: dataSource/TF2MapData.sqlite, an SQLite copy of the workbook made by the importer below, which can be queried
+#   (and updated a row at a time) without parsing the whole workbook
+# Set TF2_DATA_SOURCE to pick one, by default the SQLite file is used when it exists and is at least as new as the workbook
+# (so editing the workbook without importing it again doesn't leave the site on the old data)
+# Both give back the same frames from ReadTables, so code reading the source doesn't need to know which one it has
+# (the SQL the charts run with TF2_QUERY_PUSHDOWN goes to the finished chart frames saved with the dataset cache, see
+# dataStore.QueryFrames, not to either of these)
+#
+# Usage, from the src folder:
+#   python sourceStore.py --import      (re)build dataSource/TF2MapData.sqlite from the workbook
+import argparse
+import os
+import sqlite3
+import tempfile
+
+import pandas as pd
+
+excelPath = r"dataSource/TF2MapData.xlsx"
+sqlitePath = "dataSource/TF2MapData.sqlite"
+sourceType = os.environ.get("TF2_DATA_SOURCE", "auto")
+
+tableNames = ["MainMapData", "WaterMapData", "EventMapList"]
+# Column types the importer records for every table, so the SQLite copy reads back with the types the workbook had
+# (SQLite itself keeps dates as text and has no bool)
+columnsTable = "_columns"
+
+
+# Run a query on an open connection, dates are turned back into datetimes using the recorded column types
+# (looked up by column name, so a query result keeps them as long as it keeps the names)
+def _Read(connection, sql, params=()):
+    frame = pd.read_sql_query(sql, connection, params=params)
+    kinds = dict(connection.execute("SELECT columnName, kind FROM " + columnsTable).fetchall())
+    for name in frame.columns:
+        if kinds.get(name) == "datetime":
+            frame[name] = pd.to_datetime(frame[name])
+        elif frame[name].dtype == object:
+            # Empty cells come back as None, the workbook gives NaN for those
+            frame[name] = frame[name].fillna(float("nan"))
+    return frame
+
+
+# Write the tables into an SQLite database, along with the type of every column
+def _WriteTables(connection, tables):
+    columns = []
+    for name, frame in tables.items():
+        frame.to_sql(name, connection, index=False, if_exists="replace")
+        for column in frame.columns:
+            kind = "datetime" if pd.api.types.is_datetime64_any_dtype(frame[column]) else "plain"
+            columns.append((name, column, kind))
+    pd.DataFrame(columns, columns=["tableName", "columnName", "kind"]).to_sql(columnsTable, connection, index=False,
+                                                                           if_exists="replace")
+    connection.commit()
+
+
+class ExcelSource:
+    def __init__(self, path=excelPath):
+        self.path = path
+
+    # Files the data comes from, for working out the dataset key
+    def Paths(self):
+        return [self.path]
+
+    # The workbook is opened once for all the tables asked for
+    def ReadTables(self, names):
+        with pd.ExcelFile(self.path) as workbook:
+            return {name: pd.read_excel(workbook, name) for name in names}
+
+
+class SQLiteSource:
+    def __init__(self, path=sqlitePath):
+        self.path = path
+
+    def Paths(self):
+        return [self.path]
+
+    def _Connect(self):
+        return sqlite3.connect("file:" + self.path + "?mode=ro", uri=True)
+
+    def ReadTables(self, names):
+        connection = self._Connect()
+        try:
+            return {name: _Read(connection, 'SELECT * FROM "' + name + '"') for name in names}
+        finally:
+            connection.close()
+
+
+# The source picked with TF2_DATA_SOURCE
+def Open(kind=None):
+    kind = sourceType if kind is None else kind
+    if kind == "auto":
+        upToDate = os.path.isfile(sqlitePath) and os.path.getmtime(sqlitePath) >= os.path.getmtime(excelPath)
+        kind = "sqlite" if upToDate else "excel"
+    if kind == "excel":
+        return ExcelSource()
+    if kind == "sqlite":
+        if not os.path.isfile(sqlitePath):
+            raise FileNotFoundError(sqlitePath + " doesn't exist yet, run python sourceStore.py --import first")
+        return SQLiteSource()
+    raise ValueError("Unknown data source " + repr(kind) + ", expected excel, sqlite or auto")
+
+
+# Copy every table of the workbook into a new SQLite file
+# It is written next to the target first and then renamed, so a half written database is never picked up
+def ImportWorkbook(workbookPath=excelPath, databasePath=sqlitePath):
+    tables = ExcelSource(workbookPath).ReadTables(tableNames)
+    handle, workPath = tempfile.mkstemp(prefix=".import-", suffix=".sqlite", dir=os.path.dirname(databasePath) or ".")
+    os.close(handle)
+    # mkstemp makes the file readable by its owner only, the workers may run as someone else
+    os.chmod(workPath, 0o644)
+    try:
+        connection = sqlite3.connect(workPath)
+        try:
+            _WriteTables(connection, tables)
+        finally:
+            connection.close()
+        os.replace(workPath, databasePath)
+    except BaseException:
+        if os.path.exists(workPath):
+            os.remove(workPath)
+        raise
+    return {name: len(frame.index) for name, frame in tables.items()}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Map data source tools")
+    parser.add_argument("--import", dest="importWorkbook", action="store_true",
+                        help="Build " + sqlitePath + " from " + excelPath)
+    args = parser.parse_args()
+    if args.importWorkbook:
+        counts = ImportWorkbook()
+        print("Imported " + ", ".join(name + " (" + str(count) + " rows)" for name, count in counts.items())
+              + " into " + sqlitePath)
+    else:
+        parser.print_help()
@@ -0,0 +1,274 @@
+# Export the whole site as static files, so it can be served by nginx or a CDN with no Python behind it
+# Run from the src folder: python staticExport.py --out staticSite --workers 4
+# What gets written:
+# - an index.html for every page registered with dash.register_page (the charts page at the root, findings/index.html,
+#   sources/index.html), with the header bar of the live site and the drop-downs as plain <select> elements
+# - figures/<chart>-<key>.json, the figure of every drop-down combination of every chart, the same JSON the figure cache holds
+# - manifest.json, which file belongs to which drop-down values, and chartSwitcher.js (from staticFiles) that swaps the
+#   figures when a drop-down changes, plus the assets folder and plotly.js
+# - the unfiltered map list downloads (export/maps.csv and the rest, see exportData.py)
+# The figures are rendered in parallel, over --workers processes forked after the data is loaded
+# The export is incremental: every chart has a fingerprint made from the frames it reads, its drop-down options and
+# the chart code (pages/charts.py and the modules its figures are built with, charts.figureCode), a chart whose fingerprint
+# matches the last export's (in the existing manifest) isn't rendered again
+# Files are only rewritten when their contents change, so a sync to the server or CDN only sends what is new, and
+# figure files no longer in the manifest are removed
+import argparse
+import concurrent.futures
+import hashlib
+import html as htmlText
+import itertools
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import time
+
+import pandas as pd
+
+import figurePayload
+
+staticFolder = "staticFiles"
+switcherScript = "chartSwitcher.js"
+manifestName = "manifest.json"
+
+# The frames each chart reads, its figures only need rendering again when one of these (or the chart code) changes
+chartFrames = {
+    "TotalMapGraph": ["mainData", "MapComp"],
+    "MapPerYearGraph": ["MapPerYearData"],
+    "GMPerGraphChangeMode": ["gameModeData"],
+    "GMSizeGraph": ["mapSizeFrame"],
+    "HolidayCountGraph": ["EventFrame"],
+    "MapSizeGraph2": ["MapComp"]
+}
+
+# HTML tags the Dash html components turn into are their names in lower case, these props are renamed on the way
+propNames = {"className": "class", "htmlFor": "for"}
+voidTags = {"br", "img", "hr", "input", "meta", "link"}
+
+
+# Write data to path unless the file already holds exactly that, returns whether it was written
+def WriteIfChanged(path, data):
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    if os.path.isfile(path):
+        with open(path, "rb") as existing:
+            if existing.read() == data:
+                return False
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "wb") as output:
+        output.write(data)
+    return True
+
+
+def FrameHash(frame):
+    digest = hashlib.sha1(json.dumps([str(column) for column in frame.columns]).encode("utf-8"))
+    digest.update(json.dumps([str(dtype) for dtype in frame.dtypes]).encode("utf-8"))
+    digest.update(pd.util.hash_pandas_object(frame, index=True).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def Fingerprint(name, optionLists, frameHashes, codeHash):
+    digest = hashlib.sha1((name + codeHash).encode("utf-8"))
+    digest.update(json.dumps(optionLists).encode("utf-8"))
+    for frameName in chartFrames.get(name, sorted(frameHashes)):
+        digest.update(frameHashes[frameName].encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _Style(style):
+    return "; ".join("".join("-" + letter.lower() if letter.isupper() else letter for letter in key) + ": " + str(value)
+                     for key, value in style.items())
+
+
+def _Attributes(props):
+    parts = []
+    for key, value in props.items():
+        if key == "children" or value is None or value is False:
+            continue
+        if key == "style":
+            value = _Style(value)
+        parts.append(" " + propNames.get(key, key) + '="' + htmlText.escape(str(value)) + '"')
+    return "".join(parts)
+
+
+# HTML for a Dash component tree, only the components the pages use are known
+# Graphs become an empty div for the switcher to draw into and drop-downs a <select>, everything else is skipped
+def RenderComponent(node, pathFor):
+    if node is None:
+        return ""
+    if isinstance(node, (list, tuple)):
+        return "".join(RenderComponent(child, pathFor) for child in node)
+    if isinstance(node, (str, int, float)):
+        return htmlText.escape(str(node))
+    node = node.to_plotly_json()
+    kind = node["type"]
+    props = node["props"]
+    if node["namespace"] == "dash_html_components":
+        tag = kind.lower()
+        if tag in voidTags:
+            return "<" + tag + _Attributes(props) + ">"
+        return "<" + tag + _Attributes(props) + ">" + RenderComponent(props.get("children"), pathFor) + "</" + tag + ">"
+    if kind == "Link":
+        return ('<a href="' + htmlText.escape(pathFor(props["href"])) + '">' + RenderComponent(props.get("children"), pathFor)
+                + "</a>")
+    if kind == "Graph":
+        return '<div class="staticGraph" id="' + htmlText.escape(props["id"]) + '"></div>'
+    if kind == "Dropdown":
+        options = []
+        for option in props.get("options", []):
+            value, label = (option["value"], option["label"]) if isinstance(option, dict) else (option, option)
+            selected = " selected" if value == props.get("value") else ""
+            options.append('<option value="' + htmlText.escape(str(value)) + '"' + selected + ">" + htmlText.escape(str(label))
+                           + "</option>")
+        return '<select class="staticDropdown" id="' + htmlText.escape(props["id"]) + '">' + "".join(options) + "</select>"
+    return ""
+
+
+# Folder (relative to the export) a page is written to, its index.html is what the server sends for its path
+def PageFolder(relativePath):
+    return relativePath.strip("/")
+
+
+def RenderPage(header, layout, title, depth):
+    root = "../" * depth
+
+    def PathFor(href):
+        if not href.startswith("/"):
+            return href
+        return (root + PageFolder(href) + "/") if PageFolder(href) else (root or "./")
+
+    body = RenderComponent(header, PathFor) + RenderComponent(layout, PathFor)
+    # Asset links in the live site start with /assets/, in the export they are relative so it works from any folder
+    body = body.replace('"/assets/', '"' + root + "assets/")
+    return ("<!DOCTYPE html>\n<html>\n<head>\n<meta charset=\"utf-8\">\n<title>" + htmlText.escape(title) + "</title>\n"
+            + '<link rel="icon" href="' + root + 'assets/favicon.ico">\n'
+            + '<link rel="stylesheet" href="' + root + 'assets/custom.css">\n'
+            + '<script src="' + root + 'plotly.min.js"></script>\n'
+            + '<script src="' + root + switcherScript + '"></script>\n'
+            + "</head>\n<body data-root=\"" + root + "\">\n" + body + "\n</body>\n</html>\n")
+
+
+# Render a batch of figures in a forked worker, the charts page and its data are already loaded in the parent
+def _RenderFigures(tasks):
+    figures = sys.modules["pages.charts"].figures
+    return [(name, args, figurePayload.ToJson(figures.builders[name][0](*args))) for name, args in tasks]
+
+
+def Export(outFolder, workers, force=False):
+    # Figures are built on the server in the export, the browser versions of the charts aren't needed
+    os.environ["TF2_CLIENTSIDE_CHARTS"] = "0"
+    import dash
+    import plotly.offline
+    import app as siteApp
+    import chartData
+    import exportData
+
+    charts = sys.modules["pages.charts"]
+    figures = charts.figures
+    data = chartData.Get()
+    server = siteApp.app.server
+    # Dash only fills in its callback map on the first request
+    server.test_client().get("/_dash-dependencies")
+
+    manifestPath = os.path.join(outFolder, manifestName)
+    previous = {}
+    if os.path.isfile(manifestPath) and not force:
+        with open(manifestPath, "r", encoding="utf-8") as manifestFile:
+            previous = json.load(manifestFile).get("charts", {})
+
+    # The chart code and the way figures are written out, a change to either renders everything again
+    codeDigest = hashlib.sha1()
+    for codePath in charts.figureCode:
+        with open(codePath, "rb") as codeFile:
+            codeDigest.update(codeFile.read())
+    codeHash = codeDigest.hexdigest() + str(figurePayload.compactFigures)
+    frameHashes = {name: FrameHash(getattr(data, name)) for name in sorted(set(itertools.chain(*chartFrames.values())))}
+
+    # Which graph and drop-downs every chart belongs to, from the callbacks (the total maps chart has none, its figure is
+    # part of the layout)
+    graphs = {"TotalMapGraph": ("TotalMapGraph", [])}
+    # (a chart that can be patched has more than one output, "..graph.figure...graphShown.data..", see figurePatch.py)
+    for output, entry in siteApp.app.callback_map.items():
+        name = getattr(entry.get("callback"), "__name__", None)
+        if name in figures.builders:
+            figureOutput = next(part for part in output.strip(".").split("...") if part.endswith(".figure"))
+            graphs[name] = (figureOutput.rsplit(".", 1)[0], [item["id"] for item in entry["inputs"]])
+
+    manifest = {"version": data.version, "charts": {}}
+    tasks = []
+    for name, (builder, optionLists) in figures.builders.items():
+        graph, inputs = graphs[name]
+        fingerprint = Fingerprint(name, optionLists, frameHashes, codeHash)
+        chart = {"graph": graph, "inputs": inputs, "fingerprint": fingerprint, "figures": {}}
+        for args in itertools.product(*optionLists):
+            chart["figures"][json.dumps(list(args), ensure_ascii=False, separators=(",", ":"))] = (
+                "figures/" + figures.Key(name, args) + ".json")
+        old = previous.get(name)
+        missing = [path for path in chart["figures"].values() if not os.path.isfile(os.path.join(outFolder, path))]
+        if old is None or old.get("fingerprint") != fingerprint or missing:
+            tasks.extend((name, args) for args in itertools.product(*optionLists))
+        manifest["charts"][name] = chart
+
+    startTime = time.perf_counter()
+    written = 0
+    if tasks:
+        batches = [tasks[index::workers * 4] for index in range(min(len(tasks), workers * 4))]
+        context = multiprocessing.get_context("fork")
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            for results in pool.map(_RenderFigures, batches):
+                for name, args, payload in results:
+                    written += WriteIfChanged(os.path.join(outFolder, "figures", figures.Key(name, args) + ".json"), payload)
+    print("Rendered " + str(len(tasks)) + " figures (" + str(written) + " changed) in "
+          + "{:.1f}".format(time.perf_counter() - startTime) + "s, "
+          + str(len(manifest["charts"]) - len({name for name, args in tasks})) + " charts unchanged")
+
+    # Figures of combinations (or charts) that are gone
+    known = {os.path.basename(path) for chart in manifest["charts"].values() for path in chart["figures"].values()}
+    figureFolder = os.path.join(outFolder, "figures")
+    for fileName in os.listdir(figureFolder) if os.path.isdir(figureFolder) else []:
+        if fileName not in known:
+            os.remove(os.path.join(figureFolder, fileName))
+
+    # The pages, with the same header bar as the live site
+    header = siteApp.app.layout.children[0]
+    for page in dash.page_registry.values():
+        layout = page["layout"]() if callable(page["layout"]) else page["layout"]
+        folder = PageFolder(page["relative_path"])
+        depth = len(folder.split("/")) if folder else 0
+        WriteIfChanged(os.path.join(outFolder, folder, "index.html"),
+                       RenderPage(header, layout, page["title"], depth))
+
+    # Everything the pages load
+    WriteIfChanged(os.path.join(outFolder, "plotly.min.js"), plotly.offline.get_plotlyjs())
+    with open(os.path.join(staticFolder, switcherScript), "rb") as script:
+        WriteIfChanged(os.path.join(outFolder, switcherScript), script.read())
+    assetFolder = siteApp.app.config.assets_folder
+    for fileName in os.listdir(assetFolder):
+        path = os.path.join(assetFolder, fileName)
+        if os.path.isfile(path) and not fileName.endswith(".js"):
+            with open(path, "rb") as asset:
+                WriteIfChanged(os.path.join(outFolder, "assets", fileName), asset.read())
+    # The unfiltered downloads linked from the sources page, at the same paths the live site serves them on
+    # (the filtered versions need the live site)
+    for fileType, (Serialize, mimetype) in exportData.formats.items():
+        if fileType != "parquet" or exportData.pyarrow is not None:
+            WriteIfChanged(os.path.join(outFolder, "export", "maps." + fileType),
+                           b"".join(part.encode("utf-8") if isinstance(part, str) else part
+                                    for part in Serialize(data.mainData, None)))
+    WriteIfChanged(manifestPath, json.dumps(manifest, ensure_ascii=False, indent=1))
+    return manifest
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the site as static files")
+    parser.add_argument("--out", default="staticSite", help="Folder to write the site to")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Processes rendering figures")
+    parser.add_argument("--force", action="store_true", help="Render every figure, even for charts that haven't changed")
+    parser.add_argument("--clean", action="store_true", help="Empty the folder first")
+    args = parser.parse_args()
+    if args.clean and os.path.isdir(args.out):
+        shutil.rmtree(args.out)
+    Export(args.out, max(1, args.workers), args.force)
+    print("Site written to " + os.path.abspath(args.out))
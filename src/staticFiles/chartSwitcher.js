@@ -0,0 +1,48 @@
+// Drop-down handling for the static export of the site (see staticExport.py), the only script the exported pages run
+// besides plotly.js
+// Every state of every chart was rendered ahead of time, manifest.json says which figure file belongs to which drop-down
+// values, so changing a drop-down just fetches that file and redraws the chart with it
+(function () {
+    var root = document.body.getAttribute("data-root") || "";
+    var loaded = {};
+
+    function Fetch(path) {
+        if (!(path in loaded)) {
+            loaded[path] = fetch(root + path).then(function (response) {
+                if (!response.ok) {
+                    throw new Error(path + " answered " + response.status);
+                }
+                return response.json();
+            });
+        }
+        return loaded[path];
+    }
+
+    // The figure file for the chart's drop-downs as they are now, keyed the same way the exporter wrote them
+    function Draw(chart) {
+        var values = chart.inputs.map(function (id) { return document.getElementById(id).value; });
+        var path = chart.figures[JSON.stringify(values)];
+        var graph = document.getElementById(chart.graph);
+        if (path === undefined || graph === null) {
+            return;
+        }
+        Fetch(path).then(function (figure) {
+            Plotly.react(graph, figure.data, figure.layout, {responsive: true});
+        });
+    }
+
+    document.addEventListener("DOMContentLoaded", function () {
+        Fetch("manifest.json").then(function (manifest) {
+            Object.keys(manifest.charts).forEach(function (name) {
+                var chart = manifest.charts[name];
+                if (document.getElementById(chart.graph) === null) {
+                    return;
+                }
+                chart.inputs.forEach(function (id) {
+                    document.getElementById(id).addEventListener("change", function () { Draw(chart); });
+                });
+                Draw(chart);
+            });
+        });
+    });
+})();
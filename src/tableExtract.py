@@ -0,0 +1,97 @@
+# Pulls a single table out of a saved html page in one pass
+# The old way parsed the whole page into a BeautifulSoup tree, found the table, turned it back into html text
+# and then had pd.read_html parse that text a second time
+# Here lxml streams through the page once, only the rows of the table we want are kept, and everything before it is
+# thrown away as soon as it has been read, parsing stops as soon as the table ends
+# The result matches what pd.read_html gave for the table (same column names, same cleaned up text, same missing values)
+# except that numbers are left as text, the map table has none and the caller converts what it needs
+import re
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+from lxml import etree
+
+# Same whitespace clean up pd.read_html does on every cell
+_whitespace = re.compile(r"[\r\n]+|\s{2,}")
+
+
+def _CleanText(text):
+    return _whitespace.sub(" ", text.strip())
+
+
+# Cell text that read_html (like read_csv) treats as a missing value, the map table uses N/A for maps with no game mode
+missingValues = {"", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN", "<NA>",
+                 "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null"}
+
+
+# pd.read_html leaves out anything styled display:none (the wiki hides a sortable date in front of the shown one)
+def _IsHidden(element):
+    return "display:none" in element.get("style", "").replace(" ", "")
+
+
+# Text of a cell, skipping hidden elements but keeping the text that follows them
+# A <br> counts as a line break (so names split over lines don't get glued together), same as in read_html
+def _CellText(cell):
+    parts = [cell.text or ""]
+    for child in cell:
+        if child.tag == "br":
+            parts.append("\n")
+        elif isinstance(child.tag, str) and not _IsHidden(child):
+            parts.append(_CellText(child))
+        parts.append(child.tail or "")
+    return "".join(parts)
+
+
+def _HasClasses(element, classes):
+    return classes.issubset(element.get("class", "").split())
+
+
+# Read the first table whose class attribute includes every class in className (e.g. "wikitable sortable grid")
+# Leading rows made of only <th> cells (or a <thead>) give the column names, empty names become "Unnamed: N" like read_html
+def ReadTable(pageHtml, className):
+    if isinstance(pageHtml, str):
+        pageHtml = pageHtml.encode("utf-8")
+    classes = set(className.split())
+    table = None
+    header = None
+    rows = []
+    for event, element in etree.iterparse(BytesIO(pageHtml), events=("start", "end"), html=True, encoding="utf-8",
+                                          remove_comments=True):
+        if table is None:
+            if event == "start" and element.tag == "table" and _HasClasses(element, classes):
+                table = element
+            elif event == "end":
+                # Not inside the table, nothing we need to hold on to
+                element.clear(keep_tail=True)
+            continue
+        if event != "end":
+            continue
+        if element is table:
+            break
+        if element.tag == "tr" and element.getparent() is not None:
+            # Only rows of this table, not of a table nested inside one of its cells
+            section = element.getparent()
+            if section is table or section.getparent() is table:
+                cells = [cell for cell in element if cell.tag in ("td", "th")]
+                texts = [_CleanText(_CellText(cell)) for cell in cells]
+                allHeaders = len(cells) > 0 and all(cell.tag == "th" for cell in cells)
+                if header is None and not rows and (allHeaders or section.tag == "thead"):
+                    header = texts
+                else:
+                    rows.append(texts)
+                element.clear(keep_tail=True)
+    if table is None:
+        raise ValueError("No table with class \"" + className + "\" found")
+
+    width = max([len(header or [])] + [len(row) for row in rows])
+    if header is None:
+        header = [str(position) for position in range(width)]
+    names = [name if name else "Unnamed: " + str(position)
+             for position, name in enumerate(header + [""] * (width - len(header)))]
+    columns = {}
+    for position, name in enumerate(names):
+        columns[name] = np.array([row[position] if position < len(row) and row[position] not in missingValues
+                                  else np.nan for row in rows], dtype=object)
+    # A column with nothing in it comes out as float like it does from read_html, everything else stays as text
+    return pd.DataFrame(columns, columns=names).infer_objects()
@@ -0,0 +1,231 @@
+# Keeps the saved wiki pages (and the cached dataset built from them) up to date
+# Pages are fetched with If-None-Match / If-Modified-Since, so an unchanged page costs a 304 and no parsing at all
+# When the map list did change, the rows are compared by "File name" and only the inserted / changed / removed maps
+# are applied to the cached mainData, everything the charts read is then re-derived from it and cached under the new key
+#
+# Usage, from the src folder:
+#   python wikiSync.py                                  sync against the real wiki
+#   python wikiSync.py --base-url http://127.0.0.1:8765/  sync against a local stand-in
+#   python wikiSync.py --serve someFolder --port 8765   run the local stand-in, serving someFolder/<Page>.html
+# The stand-in answers conditional requests the same way the wiki does, so the whole sync can be tried offline
+# python -m benchmarks.wikiSyncOffline does that against the fixture pages in benchmarks/wikiFixtures and checks the result
+import argparse
+import email.utils
+import hashlib
+import json
+import os
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+import requests
+
+import dataStore
+import mapData
+
+defaultBaseUrl = "https://wiki.teamfortress.com/wiki/"
+
+# Wiki page name and where its saved copy lives (the map list keeps using the original snapshot file)
+pages = {"List_of_maps": mapData.wikiPath,
+         "Halloween_map": mapData.eventPages["Halloween"],
+         "Christmas_map": mapData.eventPages["Christmas"],
+         "Water": "wikiSnapshots/Water.html"}
+eventForPage = {"Halloween_map": "Halloween", "Christmas_map": "Christmas"}
+
+# ETag and Last-Modified of each saved page, sent back on the next sync
+statePath = "wikiSnapshots/syncState.json"
+
+# The wiki columns that end up in mainData, a map counts as changed if any of these differ
+wikiColumns = ["Map", "Game mode", "Date added", "Developers"]
+
+
+def LoadState():
+    if not os.path.isfile(statePath):
+        return {}
+    with open(statePath, "r", encoding="utf-8") as stateFile:
+        return json.load(stateFile)
+
+
+def SaveState(state):
+    os.makedirs(os.path.dirname(statePath), exist_ok=True)
+    with open(statePath, "w", encoding="utf-8") as stateFile:
+        json.dump(state, stateFile, indent=2)
+
+
+# Get a page if it changed since the saved copy, gives back None when the server says it hasn't (304)
+def FetchPage(session, baseUrl, page, pageState):
+    headers = {}
+    if os.path.isfile(pages[page]):
+        if pageState.get("etag"):
+            headers["If-None-Match"] = pageState["etag"]
+        if pageState.get("lastModified"):
+            headers["If-Modified-Since"] = pageState["lastModified"]
+    response = session.get(baseUrl + page, headers=headers, timeout=30)
+    if response.status_code == 304:
+        return None
+    response.raise_for_status()
+    response.encoding = response.encoding or "utf-8"
+    pageState["etag"] = response.headers.get("ETag")
+    pageState["lastModified"] = response.headers.get("Last-Modified")
+    return response.text
+
+
+# Compare two versions of the wiki map table by file name
+# Gives back the file names that were inserted, changed and removed in the new version
+def DiffMaps(oldFrame, newFrame):
+    oldRows = oldFrame.set_index("File name")[wikiColumns]
+    newRows = newFrame.set_index("File name")[wikiColumns]
+    inserted = newRows.index.difference(oldRows.index, sort=False).tolist()
+    removed = oldRows.index.difference(newRows.index, sort=False).tolist()
+    shared = newRows.index.intersection(oldRows.index, sort=False)
+    oldShared = oldRows.loc[shared]
+    newShared = newRows.loc[shared]
+    # Two missing values count as equal, otherwise every map with a blank cell would always look changed
+    different = (oldShared != newShared) & ~(oldShared.isna() & newShared.isna())
+    changed = shared[different.any(axis=1).to_numpy()].tolist()
+    return inserted, changed, removed
+
+
+# Apply a map list diff to mainData, only the affected rows are touched
+# mainData keeps the order of the Excel sheet (that is what the merge gives), so new rows are slotted in by that order
+def ApplyMapDiff(mainData, excelData, newWiki, inserted, changed, removed):
+    newRows = newWiki.set_index("File name")
+    mainData = mainData[~mainData["File name"].isin(removed)].copy()
+    # The cached columns are categoricals (see dataSchema.py), which can't take values they haven't seen yet
+    mainData = mainData.astype({column: object for column in wikiColumns
+                                if isinstance(mainData[column].dtype, pd.CategoricalDtype)})
+    if changed:
+        changedMask = mainData["File name"].isin(changed)
+        changedNames = mainData.loc[changedMask, "File name"]
+        for column in wikiColumns:
+            mainData.loc[changedMask, column] = newRows.loc[changedNames, column].to_numpy()
+    if inserted:
+        insertedRows = mapData.MergeFrames(excelData, newWiki[newWiki["File name"].isin(inserted)])
+        mainData = pd.concat([mainData, insertedRows], ignore_index=True)
+    sheetOrder = {fileName: position for position, fileName in enumerate(excelData["MapFileName"])}
+    mainData = mainData.sort_values("File name", key=lambda names: names.map(sheetOrder), kind="stable")
+    return mainData.reset_index(drop=True)
+
+
+def WritePage(page, text):
+    path = pages[page]
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as pageFile:
+        pageFile.write(text)
+
+
+def Sync(baseUrl=defaultBaseUrl):
+    state = LoadState()
+    session = requests.Session()
+    session.headers["User-Agent"] = "TF2MapAnalysis wiki sync"
+    fetched = {}
+    for page in pages:
+        text = FetchPage(session, baseUrl, page, state.setdefault(page, {}))
+        print(page + ": " + ("not modified" if text is None else "downloaded"))
+        if text is not None:
+            fetched[page] = text
+    if not fetched:
+        SaveState(state)
+        print("Everything is up to date")
+        return
+
+    frames, oldKey = mapData.LoadFrames(mmap=False)
+    mainData = frames["mainData"]
+    wikiData = frames["wikiData"]
+    eventData = frames["eventData"]
+
+    if "List_of_maps" in fetched:
+        newWiki = mapData.ParseWikiTable(fetched["List_of_maps"])
+        inserted, changed, removed = DiffMaps(wikiData, newWiki)
+        print("Map list: " + str(len(inserted)) + " inserted, " + str(len(changed)) + " changed, "
+              + str(len(removed)) + " removed")
+        for label, names in (("inserted", inserted), ("changed", changed), ("removed", removed)):
+            if names:
+                print("  " + label + ": " + ", ".join(names))
+        mainData = ApplyMapDiff(mainData, frames["excelData"], newWiki, inserted, changed, removed)
+        wikiData = newWiki
+
+    # A new map list can hold maps an event page already listed, so then the saved event pages are read again too
+    for page, event in eventForPage.items():
+        text = fetched.get(page)
+        if text is None and "List_of_maps" in fetched and os.path.isfile(pages[page]):
+            with open(pages[page], "r", encoding="utf-8") as pageFile:
+                text = pageFile.read()
+        if text is not None:
+            eventMaps = mapData.ParseEventPage(text, wikiData["Map"])
+            before = len(eventData.index)
+            eventData = mapData.AddEventMaps(eventData, event, eventMaps)
+            print(event + " page: " + str(len(eventMaps)) + " maps listed, "
+                  + str(len(eventData.index) - before) + " new")
+
+    if "Water" in fetched:
+        # Nothing in the dataset reads the water data yet, so the page is only saved for later
+        print("Water page saved, it isn't used by the dataset yet")
+
+    # Save the pages first, the new cache key is worked out from them
+    for page, text in fetched.items():
+        WritePage(page, text)
+    SaveState(state)
+
+    newFrames = mapData.DeriveFrames(mainData, eventData)
+    newFrames.update({"excelData": frames["excelData"], "wikiData": wikiData, "eventData": eventData})
+    newKey = mapData.DatasetKey()
+    dataStore.SaveFrames(newFrames, newKey, tables=mapData.frameNames)
+    print("Dataset " + oldKey + " -> " + newKey)
+
+
+# Local stand-in for the wiki, serves <folder>/<Page>.html with an ETag and Last-Modified and answers 304 when asked
+class FixtureHandler(BaseHTTPRequestHandler):
+    folder = "."
+
+    def do_GET(self):
+        page = self.path.strip("/").split("?")[0]
+        path = os.path.join(self.folder, page + ".html")
+        if not page or not os.path.isfile(path):
+            self.send_error(404)
+            return
+        with open(path, "rb") as pageFile:
+            body = pageFile.read()
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        modified = os.path.getmtime(path)
+        lastModified = email.utils.formatdate(modified, usegmt=True)
+        notModified = False
+        if self.headers.get("If-None-Match") is not None:
+            notModified = self.headers["If-None-Match"] == etag
+        elif self.headers.get("If-Modified-Since") is not None:
+            since = email.utils.parsedate_to_datetime(self.headers["If-Modified-Since"])
+            notModified = int(modified) <= since.timestamp()
+        if notModified:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", lastModified)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def ServeFixtures(folder, port):
+    FixtureHandler.folder = folder
+    server = ThreadingHTTPServer(("127.0.0.1", port), FixtureHandler)
+    print("Serving " + folder + " on http://127.0.0.1:" + str(port) + "/")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sync the saved wiki pages and the cached dataset")
+    parser.add_argument("--base-url", default=defaultBaseUrl, help="Where to fetch the wiki pages from")
+    parser.add_argument("--serve", metavar="FOLDER", help="Run the local wiki stand-in instead of syncing")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+    if args.serve:
+        ServeFixtures(args.serve, args.port)
+    else:
+        startTime = time.perf_counter()
+        Sync(args.base_url if args.base_url.endswith("/") else args.base_url + "/")
+        print("Done in " + "{:.2f}".format(time.perf_counter() - startTime) + "s")